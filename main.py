@@ -69,16 +69,8 @@ if __name__ == "__main__":
     else:
         experiment = sota_search.Experiment(args.prompt, EMBEDDINGS, args.k)
     experiment.run()
-    results = experiment.select_results(range(args.k))
-    if len(results)<args.k:
-        results = experiment.select_results(range(10*args.k))
-
-    results.drop_duplicates(subset=['Title'],
-                            keep='first',
-                            inplace=True,
-                            ignore_index=True
-                            )
+    results = experiment.top_results(args.k, key='Title')
     if not args.output:
-        sota_search.results2console(results.iloc[:args.k])
+        sota_search.results2console(results)
     else:
-        sota_search.results2csv(results.iloc[:args.k], args.output, args.prompt, args.title)
+        sota_search.results2csv(results, args.output, args.prompt, args.title)
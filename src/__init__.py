@@ -25,6 +25,11 @@ try:
 except ImportError:
     pass
 
+try:
+    from .result_cache import LocalResultCache, RedisResultCache
+except ImportError:
+    pass
+
 # Import data classes
 try:
     from . import data
@@ -35,6 +40,8 @@ __all__ = [
     "Experiment",
     "EmbeddingsComputer",
     "IndexBuilder",
+    "LocalResultCache",
+    "RedisResultCache",
     "data",
     "results2console",
     "results2csv",
@@ -0,0 +1,139 @@
+"""
+Naming of the auxiliary structures stored next to an embeddings index.
+
+Besides the embeddings table itself, the index builder writes artifacts
+such as the metadata bitmaps.  In Redis an artifact lives under
+``<embedding_name>:<artifact>``; on disk it sits next to the embeddings
+pickle as ``<stem>.<artifact>.pkl``.
+
+Reading needs only pickle and redis, so processes that serve a part of the
+index do not import the sentence-transformers stack.
+"""
+import pickle
+from os.path import exists
+from typing import Optional
+
+
+def artifact_path(embeddings_file: str, name: str) -> str:
+    """Path of an auxiliary index artifact stored next to an embeddings pickle.
+
+    Args:
+        embeddings_file (str): e.g. 'index/embeddings.pkl'
+        name (str): Artifact name, e.g. 'bitmaps'
+
+    Returns:
+        str: e.g. 'index/embeddings.bitmaps.pkl'
+    """
+    stem = embeddings_file[:-len('.pkl')] if embeddings_file.endswith('.pkl') else embeddings_file
+    return f'{stem}.{name}.pkl'
+
+
+def docstore_path(embeddings_file: str) -> str:
+    """Path of the SQLite document store written next to an embeddings pickle.
+
+    The document store is always a local file, also for indexes kept in Redis.
+
+    Args:
+        embeddings_file (str): e.g. 'index/embeddings.pkl'
+
+    Returns:
+        str: e.g. 'index/embeddings.docstore.sqlite'
+    """
+    return artifact_path(embeddings_file, 'docstore')[:-len('.pkl')] + '.sqlite'
+
+
+def summaries_path(embeddings_file: str) -> str:
+    """Path of the SQLite summary cache filled next to an embeddings pickle.
+
+    Args:
+        embeddings_file (str): e.g. 'index/embeddings.pkl'
+
+    Returns:
+        str: e.g. 'index/embeddings.summaries.sqlite'
+    """
+    return artifact_path(embeddings_file, 'summaries')[:-len('.pkl')] + '.sqlite'
+
+
+def artifact_key(embedding_name: str, name: str) -> str:
+    """Redis key of an auxiliary index artifact.
+
+    Args:
+        embedding_name (str): e.g. 'skol:embeddings:v0.1'
+        name (str): Artifact name, e.g. 'bitmaps'
+
+    Returns:
+        str: e.g. 'skol:embeddings:v0.1:bitmaps'
+    """
+    return f'{embedding_name}:{name}'
+
+
+def redis_client(redis_url: str,
+                 redis_username: Optional[str] = None,
+                 redis_password: Optional[str] = None,
+                 redis_db: int = 0):
+    """ Connect to Redis
+
+    Args:
+        redis_url (str): Redis URL (use rediss:// for TLS)
+        redis_username (str, optional): Redis username
+        redis_password (str, optional): Redis password
+        redis_db (int): Redis database number (default: 0)
+
+    Returns:
+        redis.Redis: The client
+
+    Note:
+        For TLS connections, use a rediss:// URL. The system CA certificates
+        will be used for verification.
+    """
+    import redis
+
+    kwargs = {'db': redis_db}
+
+    # Add authentication if configured
+    if redis_username:
+        kwargs['username'] = redis_username
+    if redis_password:
+        kwargs['password'] = redis_password
+
+    # Configure TLS if using rediss:// URL
+    if redis_url and redis_url.startswith('rediss://'):
+        kwargs['ssl_ca_certs'] = '/etc/ssl/certs/ca-certificates.crt'
+        # Don't verify hostname (cert is for synoptickeyof.life but we connect to localhost)
+        kwargs['ssl_check_hostname'] = False
+
+    return redis.from_url(redis_url, **kwargs)
+
+
+def read_artifact(name: str, embeddingsFN: Optional[str] = None,
+                  redis_url: Optional[str] = None,
+                  embedding_name: Optional[str] = None,
+                  redis_username: Optional[str] = None,
+                  redis_password: Optional[str] = None,
+                  redis_db: int = 0,
+                  cache=None):
+    """ Read an auxiliary index artifact written by EmbeddingsComputer
+
+    Args:
+        name (str): Artifact name, e.g. 'bitmaps'
+        embeddingsFN (str, optional): Local embeddings pickle the artifact sits next to
+        redis_url (str, optional): Redis URL, used when embeddingsFN is None
+        embedding_name (str, optional): Name of the embedding in Redis
+        cache (index_cache.IndexCache, optional): Local copies of a
+            versioned Redis index to read through
+
+    Returns:
+        The artifact, or None if the index was built without it
+    """
+    if embeddingsFN or (cache is not None and cache.version is not None):
+        if embeddingsFN:
+            path = artifact_path(embeddingsFN, name)
+        else:
+            path = cache.local_copy(artifact_key(embedding_name, name))
+        if path is None or not exists(path):
+            return None
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+    r = redis_client(redis_url, redis_username, redis_password, redis_db)
+    data = r.get(artifact_key(embedding_name, name))
+    return None if data is None else pickle.loads(data)
@@ -0,0 +1,181 @@
+"""
+Per-value row bitmaps over the categorical metadata of the embeddings table.
+
+The index builder precomputes, for every facet value (e.g. source=SKOL_TAXA),
+a packed bitmap of the rows carrying that value.  At query time filter
+expressions are answered by AND-ing / OR-ing bitmaps, and only the selected
+rows are scored against the prompt.
+
+Filter expressions have the form ``facet=value[,value...]`` (any of the
+values) or ``facet!=value[,value...]`` (none of the values).  Expressions on
+different facets are AND-ed together.
+"""
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Facets with more distinct values than this are answered by scanning the
+# column instead: one bitmap per value would outgrow the embeddings.
+MAX_BITMAP_CARDINALITY = 1024
+BITMAP_FACETS = ['source', 'feed', 'database', 'owner', 'filename', 'treatment']
+
+
+def _feed(filename) -> str:
+    """Feed name from a split filename, as shown by show_data_stats."""
+    if pd.isna(filename) or not isinstance(filename, str):
+        return 'unknown'
+    return filename.split('_')[0].split('/')[-1]
+
+
+def _database(ingest, filename) -> Optional[str]:
+    """CouchDB database a SKOL_TAXA / SKOL_COLLECTIONS row was read from."""
+    if isinstance(ingest, dict) and ingest.get('db_name'):
+        return ingest['db_name']
+    if isinstance(filename, str) and filename.startswith('couchdb://'):
+        return filename[len('couchdb://'):]
+    return None
+
+
+def _owner(owner) -> Optional[str]:
+    """Username of the owner of a user collection."""
+    if isinstance(owner, dict):
+        return owner.get('username')
+    return owner if isinstance(owner, str) else None
+
+
+def facet_values(df: pd.DataFrame, facet: str) -> pd.Series:
+    """Return the value of ``facet`` for every row of the embeddings table.
+
+    Args:
+        df (pd.DataFrame): The embeddings table (metadata columns are enough)
+        facet (str): A derived facet (feed, database, owner) or a column name
+
+    Returns:
+        pd.Series: String values (None where the row has no value)
+    """
+    if facet == 'feed':
+        return df['filename'].map(_feed)
+    if facet == 'database':
+        ingest = df['ingest'] if 'ingest' in df.columns else pd.Series(None, index=df.index)
+        return pd.Series([_database(i, f) for i, f in zip(ingest, df['filename'])],
+                         index=df.index, dtype=object)
+    if facet == 'owner':
+        if 'owner' not in df.columns:
+            return pd.Series(None, index=df.index, dtype=object)
+        return df['owner'].map(_owner)
+    if facet not in df.columns:
+        raise KeyError(f"Unknown filter facet '{facet}'")
+    return df[facet].map(lambda v: v if isinstance(v, str) or pd.isna(v) else str(v))
+
+
+def parse_filters(expressions: Iterable[str]) -> Dict[str, Tuple[bool, List[str]]]:
+    """Parse filter expressions into {facet: (negated, [values])}.
+
+    Args:
+        expressions (Iterable[str]): e.g. ['source=SKOL_TAXA', 'database=skol_dev']
+
+    Returns:
+        dict: Facet to (negated, values); repeated facets are merged
+    """
+    filters: Dict[str, Tuple[bool, List[str]]] = {}
+    for expression in expressions:
+        if '=' not in expression:
+            raise ValueError(f"Filter '{expression}' is not of the form facet=value[,value]")
+        facet, values = expression.split('=', 1)
+        negated = facet.endswith('!')
+        facet = facet.rstrip('!').strip()
+        values = [v.strip() for v in values.split(',') if v.strip()]
+        if not facet or not values:
+            raise ValueError(f"Filter '{expression}' is not of the form facet=value[,value]")
+        if facet in filters and filters[facet][0] != negated:
+            raise ValueError(f"Filter facet '{facet}' is both required and excluded")
+        filters.setdefault(facet, (negated, []))[1].extend(values)
+    return filters
+
+
+class BitmapIndex:
+    """Packed per-value row bitmaps for the categorical facets of an index.
+
+    Args:
+        n_rows (int): Number of rows in the embeddings table
+        bitmaps (dict): {facet: {value: np.packbits(row mask)}}
+    """
+
+    def __init__(self, n_rows: int, bitmaps: Dict[str, Dict[str, np.ndarray]]):
+        self.n_rows = n_rows
+        self.bitmaps = bitmaps
+
+    @classmethod
+    def build(cls, df: pd.DataFrame, facets: Optional[List[str]] = None,
+              max_cardinality: int = MAX_BITMAP_CARDINALITY) -> 'BitmapIndex':
+        """Build bitmaps for every low-cardinality facet of ``df``.
+
+        Args:
+            df (pd.DataFrame): The embeddings table
+            facets (List[str], optional): Facets to index (default: BITMAP_FACETS)
+            max_cardinality (int): Skip facets with more distinct values
+
+        Returns:
+            BitmapIndex: Bitmaps keyed by facet and value
+        """
+        bitmaps = {}
+        for facet in facets or BITMAP_FACETS:
+            try:
+                values = facet_values(df, facet)
+            except KeyError:
+                continue
+            codes, uniques = pd.factorize(values, use_na_sentinel=True)
+            if len(uniques) > max_cardinality:
+                continue
+            # Group row positions by code once instead of one scan per value.
+            order = np.argsort(codes, kind='stable')
+            bounds = np.searchsorted(codes[order], np.arange(len(uniques) + 1))
+            bitmaps[facet] = {}
+            for code, value in enumerate(uniques):
+                mask = np.zeros(len(df), dtype=bool)
+                mask[order[bounds[code]:bounds[code + 1]]] = True
+                bitmaps[facet][value] = np.packbits(mask)
+        return cls(len(df), bitmaps)
+
+    def counts(self, facet: str) -> Dict[str, int]:
+        """Number of rows carrying each value of ``facet``."""
+        return {value: int(np.unpackbits(bits, count=self.n_rows).sum())
+                for value, bits in self.bitmaps.get(facet, {}).items()}
+
+    def facet_bitmap(self, facet: str, values: List[str]) -> np.ndarray:
+        """Packed bitmap of the rows carrying any of ``values`` for ``facet``."""
+        bits = np.zeros((self.n_rows + 7) // 8, dtype=np.uint8)
+        for value in values:
+            if value in self.bitmaps[facet]:
+                np.bitwise_or(bits, self.bitmaps[facet][value], out=bits)
+        return bits
+
+
+def filter_mask(df: pd.DataFrame, filters: Dict[str, Tuple[bool, List[str]]],
+                bitmaps: Optional[BitmapIndex] = None) -> np.ndarray:
+    """Boolean mask of the rows of ``df`` that satisfy every filter.
+
+    Facets with precomputed bitmaps are answered by bitmap intersection;
+    any other facet falls back to a scan of its column.
+
+    Args:
+        df (pd.DataFrame): The embeddings table
+        filters (dict): Parsed filters, see ``parse_filters``
+        bitmaps (BitmapIndex, optional): Bitmaps built for this table
+
+    Returns:
+        np.ndarray: Boolean mask of length len(df)
+    """
+    if bitmaps is not None and bitmaps.n_rows != len(df):
+        bitmaps = None  # stale bitmaps from another build: ignore them
+    selected = np.full((len(df) + 7) // 8, 0xFF, dtype=np.uint8)
+    for facet, (negated, values) in filters.items():
+        if bitmaps is not None and facet in bitmaps.bitmaps:
+            bits = bitmaps.facet_bitmap(facet, values)
+        else:
+            bits = np.packbits(facet_values(df, facet).isin(values).to_numpy())
+        if negated:
+            bits = np.invert(bits)
+        np.bitwise_and(selected, bits, out=selected)
+    return np.unpackbits(selected, count=len(df)).astype(bool)
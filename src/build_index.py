@@ -4,12 +4,21 @@ Build index for Dr. Draft's Proposal Test-O-Meter.
 This module handles data preparation and embeddings computation.
 Can write embeddings to local filesystem or Redis.
 """
+import json
 import os
-import subprocess
-from glob import glob
-from typing import Optional
+import sys
+from glob import escape as glob_escape, glob
+from typing import List, Optional, Tuple
 from argparse import ArgumentParser
-from compute_embeddings import EmbeddingsComputer
+from .artifacts import docstore_path
+from .build_shards import find_manifests, parse_build_shard
+from .build_state import STATE_FILE, BuildState, frame_hash, walk_files
+from .cascade import DEFAULT_MODEL as FIRST_STAGE_MODEL
+from .compute_embeddings import EmbeddingsComputer
+from .index_cache import version_key
+from .memory import MemoryBudgetExceeded, MemoryTracker, parse_size
+from .prep_scripts import run_scripts
+from .wire_format import FORMATS
 
 
 class IndexBuilder:
@@ -25,7 +34,22 @@ class IndexBuilder:
                  redis_username: Optional[str] = None,
                  redis_password: Optional[str] = None,
                  redis_db: int = 0,
-                 embedding_name: Optional[str] = None):
+                 embedding_name: Optional[str] = None,
+                 memory_tracker: Optional[MemoryTracker] = None,
+                 near_duplicate_threshold: Optional[float] = None,
+                 docstore_file: Optional[str] = None,
+                 write_docstore: bool = True,
+                 shards: int = 1,
+                 storage_format: str = 'pickle',
+                 pca_dims: Optional[int] = None,
+                 first_stage_model: Optional[str] = None,
+                 summary_processes: int = 0,
+                 passages: bool = False,
+                 passage_tokens: Optional[int] = None,
+                 prep_workers: int = 4,
+                 prep_timeout: Optional[float] = None,
+                 force: bool = False,
+                 build_shard: Optional[Tuple[int, int]] = None):
         """Initialize the IndexBuilder.
 
         Args:
@@ -39,6 +63,33 @@ class IndexBuilder:
             redis_password (str, optional): Redis password
             redis_db (int): Redis database number (default: 0)
             embedding_name (str, optional): Name for embedding in Redis
+            memory_tracker (MemoryTracker, optional): Records RSS per build
+                stage and enforces the memory budget
+            near_duplicate_threshold (float, optional): Embed one representative
+                per group of near-identical descriptions (see EmbeddingsComputer)
+            docstore_file (str, optional): SQLite document store of rendered
+                results (default: next to the embeddings file)
+            write_docstore (bool): Write the document store (default: True)
+            shards (int): Also split the embeddings into this many shards for
+                scatter-gather search (default: 1, no shards)
+            storage_format (str): "pickle" (default), "binary", the
+                zero-copy wire format, or "compressed", float16 zstd chunks
+            pca_dims (int, optional): Also store a PCA projection to this
+                many dimensions for a reduced first-stage search
+            first_stage_model (str, optional): Also store vectors of this
+                small model for a two-model search cascade
+            summary_processes (int): When positive, precompute DRGIST
+                summaries of the corpus with this many processes
+            passages (bool): Also encode token-bounded passages of every
+                description for passage-level search
+            passage_tokens (int, optional): Tokens per passage (default:
+                the model's max_seq_length)
+            prep_workers (int): Data preparation scripts run at once
+            prep_timeout (float, optional): Seconds before a data
+                preparation script is killed
+            force (bool): Rebuild every stage, ignoring the build state
+            build_shard (Tuple[int, int], optional): (i, N) to encode only
+                the i-th of N slices of the descriptions into a build shard
         """
         self.idir = idir
         self.rdir = rdir
@@ -50,6 +101,21 @@ class IndexBuilder:
         self.redis_password = redis_password
         self.redis_db = redis_db
         self.embedding_name = embedding_name
+        self.memory = memory_tracker if memory_tracker is not None else MemoryTracker()
+        self.near_duplicate_threshold = near_duplicate_threshold
+        self.docstore_file = docstore_file
+        self.write_docstore = write_docstore
+        self.shards = shards
+        self.storage_format = storage_format
+        self.pca_dims = pca_dims
+        self.first_stage_model = first_stage_model
+        self.summary_processes = summary_processes
+        self.passages = passages
+        self.passage_tokens = passage_tokens
+        self.prep_workers = prep_workers
+        self.prep_timeout = prep_timeout
+        self.force = force
+        self.build_shard = build_shard
         self.result = None
 
     def create_directories(self):
@@ -59,42 +125,47 @@ class IndexBuilder:
         print(f"Created directories: {self.idir}, {self.rdir}")
 
     def run_data_prep_scripts(self):
-        """Run all get_*.sh scripts for data preparation.
+        """Run all get_* scripts for data preparation.
+
+        Scripts run concurrently, ``prep_workers`` at a time, except that a
+        script declaring ``# depends: <script> ...`` waits for those.
 
         Returns:
-            list: List of (script_path, return_code) tuples
+            list: List of (script_path, return_code, seconds) tuples
         """
         pattern = os.path.join(self.sdir, 'get_*')
-        scripts = glob(pattern)
+        scripts = sorted(glob(pattern))
 
         if not scripts:
             print(f"Warning: No data preparation scripts found matching {pattern}")
             return []
 
-        results = []
-        for script in scripts:
-            print(f"Running: {script}")
-            try:
-                result = subprocess.run(
-                    [script, self.idir, self.rdir, self.sdir, str(self.maxlines)],
-                    check=True,
-                    capture_output=True,
-                    text=True
-                )
-                print(result.stdout)
-                if result.stderr:
-                    print(f"Stderr: {result.stderr}")
-                results.append((script, 0))
-            except subprocess.CalledProcessError as e:
-                print(f"Error running {script}: {e}")
-                print(f"Stdout: {e.stdout}")
-                print(f"Stderr: {e.stderr}")
-                results.append((script, e.returncode))
-            except Exception as e:
-                print(f"Unexpected error running {script}: {e}")
-                results.append((script, -1))
-
-        return results
+        return run_scripts(scripts, [self.idir, self.rdir, self.sdir, str(self.maxlines)],
+                           self.prep_workers, self.prep_timeout)
+
+    def embeddings_computer(self) -> EmbeddingsComputer:
+        """The EmbeddingsComputer configured by this builder's options."""
+        return EmbeddingsComputer(
+            idir=self.idir,
+            pickle_file=self.pickle_file,
+            redis_url=self.redis_url,
+            redis_username=self.redis_username,
+            redis_password=self.redis_password,
+            redis_db=self.redis_db,
+            embedding_name=self.embedding_name,
+            memory_tracker=self.memory,
+            near_duplicate_threshold=self.near_duplicate_threshold,
+            docstore_file=self.docstore_file,
+            write_docstore=self.write_docstore,
+            shards=self.shards,
+            storage_format=self.storage_format,
+            pca_dims=self.pca_dims,
+            first_stage_model=self.first_stage_model,
+            summary_processes=self.summary_processes,
+            passages=self.passages,
+            passage_tokens=self.passage_tokens,
+            build_shard=self.build_shard
+        )
 
     def compute_embeddings(self):
         """Compute embeddings using EmbeddingsComputer.
@@ -103,37 +174,171 @@ class IndexBuilder:
             pandas.DataFrame: The computed embeddings
         """
         print('Building index for Dr. Drafts Proposal Test-O-Meter')
+        self.result = self.embeddings_computer().run_local()
+        return self.result
 
-        computer = EmbeddingsComputer(
-            idir=self.idir,
-            pickle_file=self.pickle_file,
-            redis_url=self.redis_url,
-            redis_username=self.redis_username,
-            redis_password=self.redis_password,
-            redis_db=self.redis_db,
-            embedding_name=self.embedding_name
-        )
+    def split_files(self):
+        """The split files the data preparation scripts wrote."""
+        return sorted(glob(f'{self.idir}/*_S*'))
+
+    def prep_inputs(self, state: BuildState) -> dict:
+        """Fingerprint of the data preparation scripts and raw files."""
+        scripts = glob(os.path.join(self.sdir, 'get_*'))
+        return state.fingerprint(scripts + walk_files(self.rdir), maxlines=self.maxlines)
+
+    def embedding_inputs(self, state: BuildState, computer: EmbeddingsComputer,
+                         descriptions: str) -> dict:
+        """Fingerprint of the description table and the options that shape the index."""
+        options = {name: getattr(computer, name) for name in (
+            'model_name', 'precision', 'pickle_file', 'redis_url', 'redis_db',
+            'embedding_name', 'near_duplicate_threshold', 'docstore_file',
+            'write_docstore', 'shards', 'storage_format', 'pca_dims',
+            'first_stage_model', 'passages', 'passage_tokens', 'build_shard')}
+        options['summaries'] = computer.summary_processes > 0
+        # As recorded in JSON, where tuples become lists
+        options = json.loads(json.dumps(options))
+        return state.fingerprint(descriptions=descriptions, options=options)
+
+    def embedding_outputs(self, state: BuildState, computer: EmbeddingsComputer) -> dict:
+        """Fingerprint of the local embeddings file, artifacts, build shard
+        manifests and document store, and of an index written to Redis: its
+        version counter and whether its embeddings key exists, so a flushed
+        or expired Redis index is rebuilt."""
+        path = computer.embeddings_file()
+        stem = path[:-len('.pkl')] if path.endswith('.pkl') else path
+        files = glob(f'{glob_escape(stem)}.*.pkl') + glob(f'{glob_escape(stem)}.*.json')
+        for candidate in (path, computer.docstore_file or docstore_path(path)):
+            if os.path.exists(candidate):
+                files.append(candidate)
+        if not computer.embedding_name:
+            return state.fingerprint(files)
+        r = computer.redis_client()
+        version = r.get(version_key(computer.embedding_name))
+        return state.fingerprint(files, redis={
+            'version': None if version is None else int(version),
+            'exists': bool(r.exists(computer.embedding_name))})
+
+    def merge(self, manifests: Optional[List[str]] = None):
+        """Merge build shards into one index, written like a full build.
 
-        self.result = computer.run_local()
+        Args:
+            manifests (List[str], optional): The shard manifests; those next
+                to the embeddings file when empty
+
+        Returns:
+            pandas.DataFrame: The merged embeddings
+        """
+        computer = self.embeddings_computer()
+        manifests = manifests or find_manifests(computer.embeddings_file())
+        sources = None
+        if self.write_docstore:
+            if self.split_files():
+                with self.memory.stage('load sources'):
+                    sources = computer.glob2objects(f'{self.idir}/*_S*')
+            else:
+                print('No split files in the index directory; not writing the document store')
+        self.result = computer.merge(manifests, sources)
         return self.result
 
+    def state(self) -> BuildState:
+        """The build state of the index directory; empty with ``force``."""
+        state = BuildState(os.path.join(self.idir, STATE_FILE))
+        if self.force:
+            state.stages = {}
+        return state
+
+    def plan(self) -> List[Tuple[str, Optional[str]]]:
+        """What a build would redo, without running anything.
+
+        Returns:
+            List[Tuple[str, Optional[str]]]: Each stage and why it would be
+            rebuilt, or None if it is up to date
+        """
+        state = self.state()
+        prep = state.reason('prep', self.prep_inputs(state),
+                            state.fingerprint(self.split_files()))
+        if prep:
+            descriptions = 'if the split files change'
+        else:
+            descriptions = state.reason('descriptions', state.fingerprint(self.split_files()))
+        if 'embeddings' not in state.stages:
+            embeddings = 'never built'
+        elif prep or descriptions:
+            embeddings = 'if the description table changes'
+        else:
+            computer = self.embeddings_computer()
+            recorded = state.stages['descriptions']['outputs']['sha256']
+            embeddings = state.reason('embeddings',
+                                      self.embedding_inputs(state, computer, recorded),
+                                      self.embedding_outputs(state, computer))
+        return [('prep', prep), ('descriptions', descriptions), ('embeddings', embeddings)]
+
     def run(self):
-        """Run the full index building pipeline.
+        """Run the index building pipeline, redoing only stages whose inputs changed.
 
         Returns:
-            pandas.DataFrame: The computed embeddings
+            pandas.DataFrame: The computed embeddings, or None if they were
+            up to date
         """
         self.create_directories()
-        self.run_data_prep_scripts()
-        return self.compute_embeddings()
+        state = self.state()
 
+        reason = state.reason('prep', self.prep_inputs(state),
+                              state.fingerprint(self.split_files()))
+        if reason:
+            print(f'Stage prep: rebuilding, {reason}')
+            with self.memory.stage('data prep scripts'):
+                results = self.run_data_prep_scripts()
+            if all(returncode == 0 for _, returncode, _ in results):
+                # Scripts may download raw files, so inputs are taken afterwards
+                state.record('prep', self.prep_inputs(state),
+                             state.fingerprint(self.split_files()))
+        else:
+            print('Stage prep: up to date')
 
-def main():
-    """Main entry point for the build-index CLI command."""
-    parser = ArgumentParser(
-        prog='dr-drafts-build-index',
-        description='Build index for Dr. Drafts Proposal Test-O-Meter'
-    )
+        computer = self.embeddings_computer()
+        splits = state.fingerprint(self.split_files())
+        df = objects = None
+        reason = state.reason('descriptions', splits)
+        if reason:
+            print(f'Stage descriptions: rebuilding, {reason}')
+            df, objects = computer.load_descriptions()
+            table = state.fingerprint(sha256=frame_hash(df), rows=len(df))
+            state.record('descriptions', splits, table)
+        else:
+            print('Stage descriptions: up to date')
+            table = state.stages['descriptions']['outputs']
+
+        inputs = self.embedding_inputs(state, computer, table['sha256'])
+        reason = state.reason('embeddings', inputs, self.embedding_outputs(state, computer))
+        if not reason:
+            print('Stage embeddings: up to date')
+            return None
+        print(f'Stage embeddings: rebuilding, {reason}')
+        print('Building index for Dr. Drafts Proposal Test-O-Meter')
+        with self.memory.stage('compute embeddings'):
+            if df is None:
+                df, objects = computer.load_descriptions()
+            self.result = computer.run_local(df, objects)
+        state.record('embeddings', inputs, self.embedding_outputs(state, computer))
+        return self.result
+
+def create_parser(merge: bool = False) -> ArgumentParser:
+    """Parser of the build-index command, or of its merge subcommand."""
+    if merge:
+        parser = ArgumentParser(
+            prog='dr-drafts-build-index merge',
+            description='Merge build shards written with --shard i/N into one index'
+        )
+        parser.add_argument('manifests', nargs='*',
+                           help='Build shard manifests (default: the IDIR/embeddings.shard*of*.json '
+                                'next to the embeddings file)')
+    else:
+        parser = ArgumentParser(
+            prog='dr-drafts-build-index',
+            description='Build index for Dr. Drafts Proposal Test-O-Meter. '
+                        'Run "dr-drafts-build-index merge" to merge build shards.'
+        )
     parser.add_argument('--idir', default='./index',
                        help='Index directory (default: ./index)')
     parser.add_argument('--rdir', default='./raw',
@@ -142,6 +347,10 @@ def main():
                        help='Source directory (default: ./src)')
     parser.add_argument('--maxlines', type=int, default=10000,
                        help='Maximum lines per split file (default: 10000)')
+    parser.add_argument('--prep-workers', type=int, default=4,
+                       help='Data preparation scripts run at once (default: 4)')
+    parser.add_argument('--prep-timeout', type=float, default=None, metavar='SECONDS',
+                       help='Kill a data preparation script after this long (default: none)')
     parser.add_argument('--pickle-file', default=None,
                        help='Path to output pickle file (default: IDIR/embeddings.pkl)')
     parser.add_argument('--redis-url', default='redis://localhost:6379',
@@ -154,7 +363,57 @@ def main():
                        help='Redis database number (default: 0)')
     parser.add_argument('--embedding-name', default=None,
                        help='Name for embedding in Redis')
-    args = parser.parse_args()
+    parser.add_argument('--near-duplicates', type=float, default=None, metavar='THRESHOLD',
+                       help='Collapse near-identical descriptions (estimated Jaccard '
+                            '>= THRESHOLD, e.g. 0.9) into one embedded representative')
+    parser.add_argument('--docstore', default=None,
+                       help='SQLite document store of rendered results, used to hydrate '
+                            'search results without the raw sources '
+                            '(default: next to the embeddings file)')
+    parser.add_argument('--no-docstore', action='store_true',
+                       help='Do not write the document store')
+    parser.add_argument('--shards', type=int, default=1,
+                       help='Also write the embeddings as N shards, searched in parallel '
+                            'with dr-drafts --shards or --shard-worker (default: 1)')
+    parser.add_argument('--storage-format', choices=FORMATS, default='pickle',
+                       help='Store the embeddings as a pickled DataFrame, in the binary '
+                            'wire format that searches map without copying, or compressed '
+                            'as float16 zstd chunks (default: pickle)')
+    parser.add_argument('--pca-dims', type=int, default=None,
+                       help='Also store a PCA projection to N dimensions, searched first '
+                            'by dr-drafts --pca-candidates (e.g. 128)')
+    parser.add_argument('--precompute-summaries', type=int, default=0, metavar='PROCESSES',
+                       help='Summarize every long description ahead of search (dr-drafts '
+                            '--summarize), using this many processes (default: 0, none)')
+    parser.add_argument('--passages', action='store_true',
+                       help='Also encode token-bounded passages of every description, so '
+                            'dr-drafts --passages scores a row by its best passage')
+    parser.add_argument('--passage-tokens', type=int, default=None,
+                       help="Tokens per passage (default: the model's max_seq_length)")
+    parser.add_argument('--first-stage-model', nargs='?', const=FIRST_STAGE_MODEL, default=None,
+                       help='Also encode the corpus with a small model, which dr-drafts '
+                            '--cascade-candidates ranks with before reranking with the full '
+                            f'model (default model: {FIRST_STAGE_MODEL})')
+    parser.add_argument('--dry-run', action='store_true',
+                       help='Print which stages would be rebuilt, and why, without building')
+    parser.add_argument('--force', action='store_true',
+                       help=f'Rebuild every stage, ignoring IDIR/{STATE_FILE}')
+    parser.add_argument('--memory-budget', type=parse_size, default=None,
+                       help='Abort once RSS exceeds this size, e.g. 24G (default: no limit)')
+    parser.add_argument('--trace-allocations', action='store_true',
+                       help='Report the top allocating call sites per stage (slower)')
+    parser.add_argument('--shard', type=parse_build_shard, default=None, metavar='i/N',
+                       help='Encode only the i-th of N slices of the deduplicated descriptions '
+                            'into a build shard next to the embeddings file, for '
+                            '"dr-drafts-build-index merge" (not the search --shards)')
+    return parser
+
+
+def main(argv: Optional[List[str]] = None):
+    """Main entry point for the build-index CLI command."""
+    argv = sys.argv[1:] if argv is None else argv
+    merge = argv[:1] == ['merge']
+    args = create_parser(merge).parse_args(argv[1:] if merge else argv)
 
     # Create IndexBuilder and run
     builder = IndexBuilder(
@@ -167,12 +426,48 @@ def main():
         redis_username=args.redis_username,
         redis_password=args.redis_password,
         redis_db=args.redis_db,
-        embedding_name=args.embedding_name
+        embedding_name=args.embedding_name,
+        memory_tracker=MemoryTracker(budget_bytes=args.memory_budget,
+                                     trace_allocations=args.trace_allocations),
+        near_duplicate_threshold=args.near_duplicates,
+        docstore_file=args.docstore,
+        write_docstore=not args.no_docstore,
+        shards=args.shards,
+        storage_format=args.storage_format,
+        pca_dims=args.pca_dims,
+        first_stage_model=args.first_stage_model,
+        summary_processes=args.precompute_summaries,
+        passages=args.passages,
+        passage_tokens=args.passage_tokens,
+        prep_workers=args.prep_workers,
+        prep_timeout=args.prep_timeout,
+        force=args.force,
+        build_shard=args.shard
     )
-    builder.run()
+    if merge:
+        builder.memory.install_signal_handler()
+        try:
+            builder.merge(args.manifests)
+        except (MemoryBudgetExceeded, ValueError) as e:
+            builder.memory.report()
+            print(f"Error: {e}")
+            return 1
+        builder.memory.report()
+        return 0
+    if args.dry_run:
+        for stage, reason in builder.plan():
+            print(f'{stage}: {"rebuild, " + reason if reason else "up to date"}')
+        return 0
+    builder.memory.install_signal_handler()
+    try:
+        builder.run()
+    except MemoryBudgetExceeded as e:
+        builder.memory.report()
+        print(f"Error: {e}")
+        return 1
+    builder.memory.report()
     return 0
 
 
 if __name__ == "__main__":
-    import sys
     sys.exit(main())
@@ -0,0 +1,114 @@
+"""
+Encoding the corpus on several hosts.
+
+``dr-drafts-build-index --shard i/N`` reads and deduplicates the
+descriptions like a full build, then encodes only the i-th of N contiguous
+slices of that table and writes it, with a JSON manifest, to
+``<stem>.shard<i>of<N>.pkl`` and ``.json`` next to the embeddings file.
+The slices depend only on the table, so hosts that read the same split
+files agree on them.  ``dr-drafts-build-index merge`` checks that the
+manifests of all N shards agree on the model, dims, precision and
+description table, and that their slices tile it, then combines the
+shards in order into one index and writes its artifacts.
+
+These are build shards, not the search shards of ``shards``, which split
+a finished index for scatter-gather search.
+"""
+import json
+import os
+import re
+import time
+from glob import escape as glob_escape, glob
+from typing import List, Tuple
+
+from .artifacts import artifact_path
+
+SHARD_SPEC = re.compile(r'^(\d+)/(\d+)$')
+# Manifest fields every build shard of an index shares
+AGREE = ('n_shards', 'model_name', 'dims', 'precision', 'descriptions', 'total_rows')
+
+
+def parse_build_shard(spec: str) -> Tuple[int, int]:
+    """'i/N' as (i, N), with 0 <= i < N."""
+    match = SHARD_SPEC.match(spec.strip())
+    if not match:
+        raise ValueError(f"Build shard must look like i/N, e.g. 0/8, not '{spec}'")
+    shard, n_shards = int(match.group(1)), int(match.group(2))
+    if not 0 <= shard < n_shards:
+        raise ValueError(f'Build shard {shard}/{n_shards} must have 0 <= i < N')
+    return shard, n_shards
+
+
+def shard_bounds(n_rows: int, shard: int, n_shards: int) -> Tuple[int, int]:
+    """First and past-the-end row of the shard's contiguous slice."""
+    return shard * n_rows // n_shards, (shard + 1) * n_rows // n_shards
+
+
+def shard_path(embeddings_file: str, shard: int, n_shards: int) -> str:
+    """The embeddings file of one build shard."""
+    return artifact_path(embeddings_file, f'shard{shard}of{n_shards}')
+
+
+def manifest_path(path: str) -> str:
+    """The manifest next to a build shard's embeddings file."""
+    return path[:-len('.pkl')] + '.json' if path.endswith('.pkl') else path + '.json'
+
+
+def find_manifests(embeddings_file: str) -> List[str]:
+    """The build shard manifests next to an embeddings file."""
+    stem = artifact_path(embeddings_file, 'x')[:-len('x.pkl')]
+    return sorted(glob(f'{glob_escape(stem)}shard*of*.json'))
+
+
+def write_manifest(path: str, manifest: dict):
+    """Write a build shard's manifest next to its embeddings file."""
+    manifest = dict(manifest, created=time.time(), file=os.path.basename(path))
+    with open(manifest_path(path), 'w') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+
+
+def read_manifests(paths: List[str]) -> List[dict]:
+    """Read build shard manifests, adding the path of each shard's embeddings."""
+    manifests = []
+    for path in paths:
+        with open(path) as f:
+            manifest = json.load(f)
+        manifest['path'] = os.path.join(os.path.dirname(path), manifest['file'])
+        manifests.append(manifest)
+    return manifests
+
+
+def check_manifests(manifests: List[dict]) -> List[dict]:
+    """Check that build shards make up one index, and order them.
+
+    Raises:
+        ValueError: If the shards disagree, a shard is missing or repeated,
+            or their slices do not tile the description table
+
+    Returns:
+        List[dict]: The manifests in shard order
+    """
+    if not manifests:
+        raise ValueError('No build shards to merge')
+    first = manifests[0]
+    for manifest in manifests[1:]:
+        for key in AGREE:
+            if manifest[key] != first[key]:
+                raise ValueError(f"Build shards disagree on {key}: {first['file']} has "
+                                 f"{first[key]!r}, {manifest['file']} has {manifest[key]!r}")
+    shards = sorted(manifest['shard'] for manifest in manifests)
+    if shards != list(range(first['n_shards'])):
+        missing = sorted(set(range(first['n_shards'])) - set(shards))
+        repeated = sorted({s for s in shards if shards.count(s) > 1})
+        raise ValueError(f"Build shards of {first['n_shards']} are incomplete: "
+                         f"missing {missing}, repeated {repeated}")
+    ordered = sorted(manifests, key=lambda manifest: manifest['shard'])
+    expected = 0
+    for manifest in ordered:
+        if manifest['start'] != expected:
+            raise ValueError(f"Build shard {manifest['file']} starts at row {manifest['start']}, "
+                             f"not {expected}")
+        expected = manifest['stop']
+    if expected != first['total_rows']:
+        raise ValueError(f"Build shards cover {expected} of {first['total_rows']} rows")
+    return ordered
@@ -0,0 +1,174 @@
+"""
+Incremental index builds.
+
+An index build has three stages, each a function of the previous one's
+output:
+
+- 'prep': the get_* scripts and the raw files turn into split files
+- 'descriptions': the split files turn into the deduplicated description table
+- 'embeddings': the description table and the build options turn into the
+  embeddings and their artifacts
+
+``build_state.json`` in the index directory records the fingerprints of
+each stage's inputs and outputs: size, mtime and SHA-256 of every file, a
+content hash of the description table, and the options.  A stage is redone
+only when an input changed or an output changed or went missing since it
+ran.  A file whose size and mtime are unchanged keeps its recorded hash, so
+the multi-gigabyte raw extracts are not read again on every build.
+"""
+import hashlib
+import json
+import os
+import time
+from typing import Dict, Iterable, List, Optional
+
+import pandas as pd
+
+STATE_FILE = 'build_state.json'
+STAGES = ('prep', 'descriptions', 'embeddings')
+HASH_CHUNK = 1 << 20
+
+
+def file_hash(path: str) -> str:
+    """SHA-256 of a file's contents."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def walk_files(directory: str) -> List[str]:
+    """Every file under a directory, sorted."""
+    files = []
+    for root, _, names in os.walk(directory):
+        files.extend(os.path.join(root, name) for name in names)
+    return sorted(files)
+
+
+def frame_hash(df: pd.DataFrame) -> str:
+    """SHA-256 of the contents of a DataFrame, row order included."""
+    rows = pd.util.hash_pandas_object(df.astype(str), index=False)
+    digest = hashlib.sha256(rows.to_numpy().tobytes())
+    digest.update(json.dumps([str(col) for col in df.columns]).encode())
+    return digest.hexdigest()
+
+
+class BuildState:
+    """Fingerprints of the inputs and outputs of each build stage.
+
+    Args:
+        path (str): The JSON state file; missing means nothing was built
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.stages: Dict[str, dict] = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                self.stages = json.load(f).get('stages', {})
+
+    def known_files(self) -> Dict[str, dict]:
+        """Every file fingerprint recorded by any stage, by path."""
+        known = {}
+        for stage in self.stages.values():
+            for side in ('inputs', 'outputs'):
+                known.update(stage.get(side, {}).get('files', {}))
+        return known
+
+    def fingerprint_files(self, paths: Iterable[str]) -> Dict[str, dict]:
+        """Size, mtime and SHA-256 of files, reusing recorded hashes when
+        size and mtime are unchanged.  Missing files (e.g. dangling links)
+        are left out."""
+        known = self.known_files()
+        files = {}
+        for path in sorted(set(paths)):
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entry = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+            previous = known.get(path)
+            if (previous and previous['size'] == entry['size']
+                    and previous['mtime_ns'] == entry['mtime_ns']):
+                entry['sha256'] = previous['sha256']
+            else:
+                entry['sha256'] = file_hash(path)
+            files[path] = entry
+        return files
+
+    def fingerprint(self, files: Iterable[str] = (), **values) -> dict:
+        """A stage's inputs or outputs: file fingerprints and other values.
+
+        Args:
+            files (Iterable[str]): File paths
+            **values: JSON-serializable values, e.g. options or content hashes
+        """
+        return {'files': self.fingerprint_files(files), **values}
+
+    @staticmethod
+    def _same(recorded: dict, current: dict) -> bool:
+        """Whether two fingerprints agree, ignoring mtimes of identical files."""
+        if recorded.keys() != current.keys():
+            return False
+        for key, value in current.items():
+            if key == 'files':
+                old = recorded['files']
+                if old.keys() != value.keys() or any(
+                        old[path]['sha256'] != entry['sha256'] for path, entry in value.items()):
+                    return False
+            elif recorded[key] != value:
+                return False
+        return True
+
+    def reason(self, stage: str, inputs: dict, outputs: Optional[dict] = None) -> Optional[str]:
+        """Why a stage must be redone, or None if it is up to date.
+
+        Args:
+            stage (str): One of ``STAGES``
+            inputs (dict): Its current input fingerprint
+            outputs (dict, optional): Its current output fingerprint; not
+                compared when None
+        """
+        recorded = self.stages.get(stage)
+        if recorded is None:
+            return 'never built'
+        if not self._same(recorded['inputs'], inputs):
+            changed = self.changes(recorded['inputs'], inputs)
+            return f'inputs changed ({changed})' if changed else 'inputs changed'
+        if outputs is not None and not self._same(recorded['outputs'], outputs):
+            changed = self.changes(recorded['outputs'], outputs)
+            return f'outputs changed ({changed})' if changed else 'outputs changed'
+        return None
+
+    @staticmethod
+    def changes(recorded: dict, current: dict, limit: int = 3) -> str:
+        """A short list of what differs between two fingerprints."""
+        names = []
+        old_files, new_files = recorded.get('files', {}), current.get('files', {})
+        for path in sorted(old_files.keys() | new_files.keys()):
+            if path not in new_files:
+                names.append(f'{os.path.basename(path)} removed')
+            elif path not in old_files:
+                names.append(f'{os.path.basename(path)} added')
+            elif old_files[path]['sha256'] != new_files[path]['sha256']:
+                names.append(os.path.basename(path))
+        names.extend(key for key in sorted(recorded.keys() | current.keys())
+                     if key != 'files' and recorded.get(key) != current.get(key))
+        if len(names) > limit:
+            return ', '.join(names[:limit]) + f' and {len(names) - limit} more'
+        return ', '.join(names)
+
+    def record(self, stage: str, inputs: dict, outputs: dict):
+        """Record that a stage ran, and save the state file."""
+        self.stages[stage] = {'inputs': inputs, 'outputs': outputs, 'built': time.time()}
+        self.save()
+
+    def save(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp = f'{self.path}.tmp{os.getpid()}'
+        with open(tmp, 'w') as f:
+            json.dump({'stages': self.stages}, f, indent=1, sort_keys=True)
+        os.replace(tmp, self.path)
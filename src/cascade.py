@@ -0,0 +1,58 @@
+"""
+First stage of a two-model search cascade.
+
+An index can also carry vectors of a small MiniLM-class model, stored as
+the 'first_stage' artifact.  A search then encodes the prompt with the
+small model, ranks the whole corpus with those vectors, and rescores only
+the top candidates against the DRDRAFT vectors.
+
+The cascade cuts the cost of scanning the index, not of encoding: the
+prompt is still encoded with all-mpnet-base-v2 for the rescoring, so each
+query pays for both encoders, and a build encodes the corpus with both.
+"""
+import numpy as np
+
+from .reduction import normalize_rows, top_positions
+
+DEFAULT_MODEL = 'sentence-transformers/all-MiniLM-L6-v2'
+
+
+class FirstStage:
+    """Unit-length vectors of the corpus from a smaller encoder.
+
+    Args:
+        model_name (str): SentenceTransformer model the vectors come from;
+            prompts must be encoded with the same model
+        vectors (np.ndarray): float32, one unit-length row per embeddings row
+    """
+
+    def __init__(self, model_name: str, vectors: np.ndarray):
+        self.model_name = model_name
+        self.vectors = vectors
+
+    def __len__(self) -> int:
+        return len(self.vectors)
+
+    @property
+    def dims(self) -> int:
+        return self.vectors.shape[1]
+
+    @classmethod
+    def build(cls, model_name: str, vectors: np.ndarray) -> 'FirstStage':
+        """Keep normalized float32 copies of the small model's corpus vectors."""
+        return cls(model_name, normalize_rows(np.asarray(vectors, dtype=np.float32)))
+
+    def candidates(self, vector: np.ndarray, n: int, rows=None) -> np.ndarray:
+        """Positions of the ``n`` rows most similar to a prompt vector of this model.
+
+        Args:
+            vector (np.ndarray): The prompt, encoded with ``model_name``
+            n (int): Number of candidates
+            rows (np.ndarray, optional): Boolean mask or positions of the
+                rows to consider; all rows when None
+
+        Returns:
+            np.ndarray: Candidate positions, best first
+        """
+        query = normalize_rows(np.asarray(vector, dtype=np.float32).reshape(1, -1))[0]
+        return top_positions(self.vectors, query, n, rows)
@@ -14,6 +14,11 @@ from warnings import filterwarnings
 sys.path.append(os.path.join(os.path.dirname(__file__), '../../skol'))
 
 from . import sota_search
+from .index_cache import default_cache_dir
+from .manifest import check_model, show_manifest
+from .memory import MemoryBudgetExceeded, MemoryTracker, parse_size
+from .result_cache import DEFAULT_SIZE, DEFAULT_TTL, LocalResultCache, RedisResultCache
+from .result_writers import FORMATS, open_result_writer
 
 
 def create_parser():
@@ -38,7 +43,22 @@ def create_parser():
 
     parser.add_argument(
         '-o', '--output',
-        help='CSV file to store output'
+        help='File to store output (CSV unless --format or the extension says otherwise)'
+    )
+
+    parser.add_argument(
+        '--format',
+        choices=FORMATS,
+        default=None,
+        help='Output format: csv appends, jsonl appends, parquet replaces the file '
+             '(default: from the --output extension, else csv)'
+    )
+
+    parser.add_argument(
+        '--queries',
+        default=None,
+        help="File of queries to run against one loaded index, one per line as "
+             "'title<TAB>prompt' or 'prompt'; all results go to --output"
     )
 
     parser.add_argument(
@@ -79,6 +99,23 @@ def create_parser():
         help='Name of embedding in Redis (default: skol:embeddings:v0.1)'
     )
 
+    parser.add_argument(
+        '--index-cache',
+        nargs='?',
+        const=default_cache_dir(),
+        default=None,
+        metavar='DIR',
+        help='Keep a full local copy of a Redis index in DIR (default: '
+             f'{default_cache_dir()}) and download it again only when its version '
+             'changes; uses as much disk as the index, per index name'
+    )
+
+    parser.add_argument(
+        '--no-index-cache',
+        action='store_true',
+        help='Always read the index from Redis (the default)'
+    )
+
     # Legacy support for local pickle files
     parser.add_argument(
         '--embeddings-file',
@@ -86,9 +123,239 @@ def create_parser():
         help='Path to local embeddings pickle file (alternative to Redis)'
     )
 
+    parser.add_argument(
+        '-f', '--filter',
+        action='append',
+        default=[],
+        metavar='FACET=VALUE[,VALUE]',
+        help='Only search rows whose FACET (source, feed, database, owner, '
+             'filename, treatment, or any index column) has one of the VALUEs; '
+             'use FACET!=VALUE to exclude. Repeat to AND several filters.'
+    )
+
+    parser.add_argument(
+        '--dedup-key',
+        default='Title',
+        help="Show only the best result per value of this field (default: Title; '' keeps duplicates)"
+    )
+
+    parser.add_argument(
+        '--search-mode',
+        choices=sota_search.SEARCH_MODES,
+        default='dense',
+        help='Rank by embedding similarity (dense), BM25 over descriptions '
+             '(lexical), or both fused by reciprocal rank (hybrid) (default: dense)'
+    )
+
+    parser.add_argument(
+        '--lexical-candidates',
+        type=int,
+        default=None,
+        help='In hybrid mode, only score the top N BM25 matches densely '
+             'instead of scanning every embedding'
+    )
+
+    parser.add_argument(
+        '--pca-candidates',
+        type=int,
+        default=None,
+        help='Scan the PCA-reduced vectors of an index built with --pca-dims and '
+             'rescore only the top N against the full embeddings'
+    )
+
+    parser.add_argument(
+        '--scan-block-rows',
+        type=int,
+        default=None,
+        metavar='N',
+        help='Score the embeddings N rows at a time, keeping only the best candidates, '
+             'so memory does not grow with the index (best with --storage-format binary '
+             'indexes, which are memory-mapped)'
+    )
+
+    parser.add_argument(
+        '--verify',
+        action='store_true',
+        help='Check the checksum of a binary embeddings file when loading it; this reads '
+             'the whole memory-mapped matrix, so it is off by default'
+    )
+
+    parser.add_argument(
+        '--scan-workers',
+        type=int,
+        default=None,
+        metavar='N',
+        help='Scan the embeddings as N row ranges on N threads and merge their best '
+             'candidates (implies a blocked scan)'
+    )
+
+    parser.add_argument(
+        '--blas-threads',
+        type=int,
+        default=sota_search.BLAS_THREADS,
+        metavar='N',
+        help='BLAS threads per scan thread with --scan-workers, so a search uses '
+             f'about N x workers cores; 0 leaves the BLAS default; needs threadpoolctl '
+             f'(default: {sota_search.BLAS_THREADS})'
+    )
+
+    parser.add_argument(
+        '--cascade-candidates',
+        type=int,
+        default=None,
+        help='Rank with the small first-stage model of an index built with '
+             '--first-stage-model and rerank only the top N with the full model; '
+             'cuts scan time, but each prompt is encoded with both models'
+    )
+
+    parser.add_argument(
+        '--passages',
+        action='store_true',
+        help='Score each result by its best passage, for an index built with --passages'
+    )
+
+    parser.add_argument(
+        '--summarize',
+        action='store_true',
+        help=f'Summarize the results with {sota_search.DRGIST} (cached per description)'
+    )
+
+    parser.add_argument(
+        '--summary-cache',
+        default=None,
+        metavar='PATH',
+        help='SQLite summary cache (default: the one built next to --embeddings-file, '
+             'else one in the index cache directory)'
+    )
+
+    parser.add_argument(
+        '--docstore',
+        default=None,
+        help='SQLite document store written by dr-drafts-build-index; results are '
+             'hydrated from it instead of the raw sources (default: next to '
+             '--embeddings-file, if present)'
+    )
+
+    parser.add_argument(
+        '--shards',
+        action='store_true',
+        help='Search an index built with --shards N: one worker process per shard '
+             'holds its part of the embeddings'
+    )
+
+    parser.add_argument(
+        '--shard-worker',
+        action='append',
+        default=[],
+        metavar='HOST:PORT',
+        help='Search shards served by dr-drafts-shard-worker on other machines '
+             '(repeat per shard; authenticates with $DR_DRAFTS_SHARD_KEY)'
+    )
+
+    parser.add_argument(
+        '--shard-timeout',
+        type=float,
+        default=sota_search.DEFAULT_TIMEOUT,
+        help='Seconds to wait for each shard; slower shards are left out of the '
+             f'results and reported (default: {sota_search.DEFAULT_TIMEOUT})'
+    )
+
+    parser.add_argument(
+        '--result-cache',
+        choices=['off', 'local', 'redis'],
+        default='off',
+        help='Reuse the results of repeated searches of the same index version: '
+             'local keeps the most recent in this process, redis shares them through '
+             '--redis-url with a TTL (default: off)'
+    )
+
+    parser.add_argument(
+        '--result-cache-size',
+        type=int,
+        default=DEFAULT_SIZE,
+        metavar='N',
+        help=f'Searches kept by --result-cache local (default: {DEFAULT_SIZE})'
+    )
+
+    parser.add_argument(
+        '--result-cache-ttl',
+        type=int,
+        default=DEFAULT_TTL,
+        metavar='SECONDS',
+        help=f'Lifetime of --result-cache redis entries (default: {DEFAULT_TTL})'
+    )
+
+    parser.add_argument(
+        '--stats',
+        action='store_true',
+        help="Print the index's statistics from its manifest and check that it was "
+             'encoded with the search model, without loading any rows, then exit'
+    )
+
+    # Memory accounting
+    parser.add_argument(
+        '--memory-report',
+        action='store_true',
+        help='Print RSS per search stage when done'
+    )
+
+    parser.add_argument(
+        '--memory-budget',
+        type=parse_size,
+        default=None,
+        help='Abort once RSS exceeds this size, e.g. 4G (default: no limit)'
+    )
+
+    parser.add_argument(
+        '--trace-allocations',
+        action='store_true',
+        help='Include the top allocating call sites in the memory report'
+    )
+
     return parser
 
 
+def read_queries(path: str, default_title: str):
+    """Read a batch of queries, one per line as 'title<TAB>prompt' or just 'prompt'.
+
+    Blank lines and lines starting with '#' are skipped.
+
+    Returns:
+        list: (title, prompt) tuples
+    """
+    queries = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.rstrip('\n')
+            if not line.strip() or line.startswith('#'):
+                continue
+            title, _, prompt = line.rpartition('\t')
+            queries.append((title or default_title, prompt))
+    return queries
+
+
+def show_stats(experiment) -> int:
+    """Print an index's manifest and check its model, without loading rows.
+
+    Returns:
+        int: Exit status; 1 if the index has no manifest or another model
+    """
+    manifest = experiment.read_artifact('manifest')
+    if manifest is None:
+        print("Error: Index has no manifest; rebuild it with dr-drafts-build-index")
+        return 1
+    show_manifest(manifest)
+    print(f"   sources: {', '.join(f'{s}: {n}' for s, n in manifest['sources'].items())}")
+    print(f"   storage: {manifest['storage_format']}, precision: {manifest['precision']}")
+    print(f"   embeddings sha256: {manifest['hashes']['embeddings']}")
+    try:
+        check_model(manifest, sota_search.DRDRAFT)
+    except ValueError as e:
+        print(f"Error: {e}")
+        return 1
+    return 0
+
+
 def main():
     """Main entry point for the CLI."""
     faulthandler.enable()
@@ -99,6 +366,41 @@ def main():
 
     # Show configuration
     sota_search.show_flags(args.k, args.prompt, args.output, args.title)
+    memory = MemoryTracker(budget_bytes=args.memory_budget,
+                           trace_allocations=args.trace_allocations)
+
+    result_cache = None
+    if args.result_cache == 'local':
+        result_cache = LocalResultCache(args.result_cache_size)
+    elif args.result_cache == 'redis':
+        result_cache = RedisResultCache(
+            sota_search.redis_client(args.redis_url, args.redis_username,
+                                     args.redis_password, args.redis_db),
+            args.result_cache_ttl)
+
+    # Options shared by every embeddings source
+    options = dict(
+        k=args.k,
+        memory_tracker=memory,
+        filters=args.filter,
+        search_mode=args.search_mode,
+        lexical_candidates=args.lexical_candidates,
+        docstoreFN=args.docstore,
+        sharded=args.shards,
+        shard_workers=args.shard_worker,
+        shard_timeout=args.shard_timeout,
+        pca_candidates=args.pca_candidates,
+        index_cache_dir=None if args.no_index_cache else args.index_cache,
+        cascade_candidates=args.cascade_candidates,
+        summarize=args.summarize,
+        summary_cache=args.summary_cache,
+        passages=args.passages,
+        scan_block_rows=args.scan_block_rows,
+        scan_workers=args.scan_workers,
+        blas_threads=args.blas_threads or None,
+        result_cache=result_cache,
+        verify_index=args.verify
+    )
 
     # Determine embeddings source
     if args.embeddings_file:
@@ -106,19 +408,19 @@ def main():
         experiment = sota_search.Experiment(
             args.prompt,
             embeddingsFN=args.embeddings_file,
-            k=args.k
+            **options
         )
     elif args.embedding_name:
         # Use Redis (default)
         experiment = sota_search.Experiment(
             args.prompt,
             embeddingsFN=None,
-            k=args.k,
             redis_url=args.redis_url,
             redis_username=args.redis_username,
             redis_password=args.redis_password,
             redis_db=args.redis_db,
-            embedding_name=args.embedding_name
+            embedding_name=args.embedding_name,
+            **options
         )
     else:
         # Fallback to default local file
@@ -130,34 +432,35 @@ def main():
             print(f"  3. Specify --embeddings-file for a custom pickle file")
             sys.exit(1)
 
-        experiment = sota_search.Experiment(args.prompt, embeddings_file, args.k)
+        experiment = sota_search.Experiment(args.prompt, embeddings_file, **options)
 
-    # Run the search
-    experiment.run()
-    results = experiment.select_results(range(args.k))
+    if args.stats:
+        return show_stats(experiment)
 
-    # Expand results if we didn't get enough
-    if len(results) < args.k:
-        results = experiment.select_results(range(10 * args.k))
+    queries = read_queries(args.queries, args.title) if args.queries else [(args.title, args.prompt)]
+    writer = open_result_writer(args.output, args.format) if args.output else None
 
-    # Remove duplicates
-    results.drop_duplicates(
-        subset=['Title'],
-        keep='first',
-        inplace=True,
-        ignore_index=True
-    )
+    # Run the searches; the index is loaded once and reused for every query
+    try:
+        for title, prompt in queries:
+            results = experiment.search(prompt, args.k, key=args.dedup_key or None)
 
-    # Output results
-    if not args.output:
-        sota_search.results2console(results.iloc[:args.k])
-    else:
-        sota_search.results2csv(
-            results.iloc[:args.k],
-            args.output,
-            args.prompt,
-            args.title
-        )
+            # Output results
+            if writer is None:
+                sota_search.results2console(results, print_summary=args.summarize)
+            else:
+                sota_search.results2file(results, writer, prompt, title)
+    except MemoryBudgetExceeded as e:
+        memory.report()
+        print(f"Error: {e}")
+        return 1
+    finally:
+        if writer is not None:
+            writer.close()
+        experiment.close()
+
+    if args.memory_report or args.trace_allocations:
+        memory.report()
 
     return 0
 
@@ -8,19 +8,39 @@ Returns:
     index_directory/embeddings.pkl
 """
 import sys
+import os
 sys.path.append('../skol')
-from typing import Iterable, Optional
+from typing import Iterable, List, Optional, Tuple
 from glob import glob
 from sentence_transformers import SentenceTransformer
+import numpy
 import pandas
 import torch
 from . import data as DATA_CLASSES
+from .artifacts import (artifact_key, artifact_path, docstore_path, redis_client,
+                        summaries_path)
+from .bitmaps import BitmapIndex
+from .build_shards import (check_manifests, parse_build_shard, read_manifests,
+                           shard_bounds, shard_path, write_manifest)
+from .build_state import frame_hash
+from .cascade import DEFAULT_MODEL as FIRST_STAGE_MODEL, FirstStage
+from .docstore import DocStore, render_records
+from .lexical import BM25Index
+from .manifest import build_manifest
+from .near_duplicates import near_duplicate_representatives
+from .passages import SPECIAL_TOKENS, PassageIndex, split_passages
+from .reduction import PCAProjection, embedding_matrix
+from .shards import shard_name, split_shards
+from .summarize import DRGIST, SummaryCache, precompute
+from . import wire_format
+from .memory import MemoryTracker, parse_size
 import pickle
 from argparse import ArgumentParser
 
-import redis
 
 MODEL_NAME = 'all-mpnet-base-v2'
+# Encoder batches between memory budget checks
+BUDGET_CHECK_BATCHES = 16
 DESCRIPTION_ATTR = {
                     'SKOL': 'description',
                     'SKOL_TAXA': 'description'
@@ -70,7 +90,19 @@ class EmbeddingsComputer:
                  model_name: str = MODEL_NAME,
                  precision: str = "float32",
                  backend: str = "torch",
-                 batch_size: Optional[int] = None):
+                 batch_size: Optional[int] = None,
+                 memory_tracker: Optional[MemoryTracker] = None,
+                 near_duplicate_threshold: Optional[float] = None,
+                 docstore_file: Optional[str] = None,
+                 write_docstore: bool = True,
+                 shards: int = 1,
+                 storage_format: str = 'pickle',
+                 pca_dims: Optional[int] = None,
+                 first_stage_model: Optional[str] = None,
+                 summary_processes: int = 0,
+                 passages: bool = False,
+                 passage_tokens: Optional[int] = None,
+                 build_shard: Optional[Tuple[int, int]] = None):
         """Initialize the EmbeddingsComputer.
 
         Args:
@@ -93,7 +125,49 @@ class EmbeddingsComputer:
              total GPU memory via ``recommend_batch_size_from_gpu_memory``.
              Pass an explicit value to override for large models or to
              leave headroom for other CUDA workloads.
+            memory_tracker (MemoryTracker, optional): Records RSS per build
+             stage and enforces the memory budget.  A tracker without a
+             budget is created when None.
+            near_duplicate_threshold (float, optional): When set, descriptions
+             whose estimated shingle Jaccard similarity reaches this value are
+             grouped by ``run_local``; only one representative per group is
+             embedded and the rest are stored in the 'aliases' artifact.
+            docstore_file (str, optional): SQLite document store of rendered
+             results (default: next to the embeddings file, also when the
+             embeddings go to Redis)
+            write_docstore (bool): Render every row's result record into the
+             document store when the raw sources are at hand (default: True)
+            shards (int): Also split the embeddings into this many shard
+             artifacts for scatter-gather search (default: 1, no shards)
+            storage_format (str): How the embeddings are stored - "pickle"
+             (default), a pickled DataFrame; "binary", the wire format of
+             ``wire_format`` that readers map without copying the matrix;
+             or "compressed", that format with float16 zstd chunks
+            pca_dims (int, optional): Also fit a PCA projection to this many
+             dimensions and store it with the projected corpus as the 'pca'
+             artifact, for a reduced first-stage search
+            first_stage_model (str, optional): Also encode every description
+             with this smaller model and store the vectors as the
+             'first_stage' artifact, for a two-model search cascade
+            summary_processes (int): When positive, fill the summary cache
+             next to the embeddings file with DRGIST summaries of every long
+             description, using this many processes (default: 0, none)
+            passages (bool): Also split every description into token-bounded
+             passages, encode each, and store them as the 'passages'
+             artifact for passage-level search
+            passage_tokens (int, optional): Tokens per passage (default: the
+             model's max_seq_length less its special tokens)
+            build_shard (Tuple[int, int], optional): (i, N) to encode only the
+             i-th of N slices of the descriptions into a build shard file,
+             for ``merge`` to combine
         """
+        if storage_format not in wire_format.FORMATS:
+            raise ValueError(f"storage_format must be one of {wire_format.FORMATS}")
+        if build_shard is not None and (embedding_name or near_duplicate_threshold
+                                        or first_stage_model or passages):
+            raise ValueError("A build shard is written to a local file and holds only the "
+                             "embeddings; collapse near duplicates, add first-stage vectors "
+                             "or passages in a full build")
         self.idir = idir
         self.pickle_file = pickle_file
         self.redis_url = redis_url
@@ -106,34 +180,69 @@ class EmbeddingsComputer:
         self.precision = precision
         self.backend = backend
         self.batch_size = batch_size
+        self.memory = memory_tracker if memory_tracker is not None else MemoryTracker()
         self.result = None
+        self.near_duplicate_threshold = near_duplicate_threshold
+        self.aliases = None
+        self.bitmaps = None
+        self.bm25 = None
+        self.docstore_file = docstore_file
+        self.write_docstore = write_docstore
+        self.shards = shards
+        self.storage_format = storage_format
+        self.pca_dims = pca_dims
+        self.pca = None
+        self.manifest = None
+        self.first_stage_model = first_stage_model
+        self.first_stage = None
+        self.summary_processes = summary_processes
+        self.passages = passages
+        self.passage_tokens = passage_tokens
+        self.passage_index = None
+        self.transformers = {}
+        self.build_shard = build_shard
+
+    def load_transformer(self, model_name: Optional[str] = None) -> SentenceTransformer:
+        """Load a SentenceTransformer once per model.
 
-    def encode_narratives(self, N: Iterable[str]) -> pandas.DataFrame:
+        Args:
+            model_name (str, optional): Another model than ``self.model_name``
+
+        Returns:
+            SentenceTransformer: The model
+        """
+        model_name = model_name or self.model_name
+        if model_name not in self.transformers:
+            model_kwargs: dict = {}
+            if self.backend == "onnx":
+                if torch.cuda.is_available():
+                    model_kwargs["providers"] = [
+                        "TensorrtExecutionProvider",
+                        "CUDAExecutionProvider",
+                        "CPUExecutionProvider",
+                    ]
+                print("Using ONNX backend")
+            self.transformers[model_name] = SentenceTransformer(
+                model_name,
+                backend=self.backend,
+                model_kwargs=model_kwargs or None,
+            )
+        return self.transformers[model_name]
+
+    def encode_narratives(self, N: Iterable[str],
+                          model_name: Optional[str] = None) -> pandas.DataFrame:
         """Encode narratives using SentenceTransformer. Multi-GPU support.
 
         Model is set to all-mpnet-base-v2.
 
         Args:
             N (List[str]): List of narratives to encode. Descriptions of CFPs/FOAs.
+            model_name (str, optional): Another model than ``self.model_name``
 
         Returns:
             pandas.DataFrame: DataFrame with #narratives x #dims.
         """
-        # Initialize model
-        model_kwargs: dict = {}
-        if self.backend == "onnx":
-            if torch.cuda.is_available():
-                model_kwargs["providers"] = [
-                    "TensorrtExecutionProvider",
-                    "CUDAExecutionProvider",
-                    "CPUExecutionProvider",
-                ]
-            print("Using ONNX backend")
-        transformer = SentenceTransformer(
-            self.model_name,
-            backend=self.backend,
-            model_kwargs=model_kwargs or None,
-        )
+        transformer = self.load_transformer(model_name)
 
         # Determine device and report it
         if torch.cuda.is_available():
@@ -167,17 +276,53 @@ class EmbeddingsComputer:
             else:
                 batch_size = 32  # CPU default — keep modest
             print(f'  Encoding with batch_size={batch_size}')
-            embs = transformer.encode(N,
-                                      show_progress_bar=True,
-                                      batch_size=batch_size,
-                                      precision=self.precision,
-                                      device=device_str,
-                                      )
+            N = list(N)
+            # Under a memory budget, encode a few batches at a time and check
+            # the budget in between, as one encode() call cannot be interrupted
+            step = batch_size * BUDGET_CHECK_BATCHES if self.memory.budget_bytes else len(N)
+            chunks = []
+            for start in range(0, len(N), max(step, 1)):
+                self.memory.check()
+                chunks.append(transformer.encode(N[start:start + step],
+                                                 show_progress_bar=True,
+                                                 batch_size=batch_size,
+                                                 precision=self.precision,
+                                                 device=device_str,
+                                                 ))
+            embs = numpy.concatenate(chunks) if len(chunks) > 1 else chunks[0]
         ncols = len(embs[0])
         attnames = [f'F{i}' for i in range(ncols)]
         return pandas.DataFrame(embs, columns=attnames)
 
 
+    def encode_passages(self, df: pandas.DataFrame) -> PassageIndex:
+        """Split the descriptions into token-bounded passages and encode them.
+
+        Passages end at the paragraphs of ``description_spans`` where a
+        row has them.  Tokens are counted with the model's tokenizer.
+
+        Args:
+            df (pandas.DataFrame): DataFrame with 'description' column
+
+        Returns:
+            PassageIndex: The passage vectors and the row of each
+        """
+        transformer = self.load_transformer()
+        tokenizer = transformer.tokenizer
+
+        def count_tokens(words):
+            if not words:
+                return []
+            return [len(ids) for ids in
+                    tokenizer(words, add_special_tokens=False)['input_ids']]
+
+        max_tokens = self.passage_tokens or transformer.max_seq_length - SPECIAL_TOKENS
+        spans = df['description_spans'] if 'description_spans' in df.columns else None
+        texts, parents = split_passages(df.description.astype(str), spans,
+                                        count_tokens, max_tokens)
+        vectors = self.encode_narratives(texts)
+        return PassageIndex.build(self.model_name, vectors.to_numpy(), parents)
+
     def glob2objects(self, glob_pattern: str):
         """Convert globbed files to objects.
 
@@ -187,11 +332,14 @@ class EmbeddingsComputer:
         Returns:
             List[obj]: A list of class objects for reading each raw data files
         """
-        files = list(glob(glob_pattern))
+        files = sorted(glob(glob_pattern))
         classes = [f.split('/')[-1].split('_')[0] for f in files]
         zset = zip(files, classes)
         print('zset', zset)
-        objs = [getattr(DATA_CLASSES, c)(f, DESCRIPTION_ATTR[c]) for f, c in zset]
+        objs = []
+        for f, c in zset:
+            self.memory.check()
+            objs.append(getattr(DATA_CLASSES, c)(f, DESCRIPTION_ATTR[c]))
         print('obj', objs)
         return objs
 
@@ -208,45 +356,141 @@ class EmbeddingsComputer:
                              ignore_index=True)
 
 
-    def write_embeddings_to_redis(self):
-        """Write embeddings to Redis using instance configuration.
+    def redis_client(self):
+        """Connect to Redis using instance configuration.
 
-        Supports TLS connections via rediss:// URLs. When using TLS,
-        the system CA certificates are used for verification.
+        Supports TLS connections via rediss:// URLs, see
+        ``artifacts.redis_client``.
         """
-        kwargs = {'db': self.redis_db}
-
-        # Add authentication if configured
-        if self.redis_username:
-            kwargs['username'] = self.redis_username
-        if self.redis_password:
-            kwargs['password'] = self.redis_password
-
-        # Configure TLS if using rediss:// URL
-        if self.redis_url and self.redis_url.startswith('rediss://'):
-            kwargs['ssl_ca_certs'] = '/etc/ssl/certs/ca-certificates.crt'
-            # Don't verify hostname (cert is for synoptickeyof.life but we connect to localhost)
-            kwargs['ssl_check_hostname'] = False
+        return redis_client(self.redis_url, self.redis_username,
+                            self.redis_password, self.redis_db)
+
+    def bump_version(self):
+        """Increment the index version, so readers' local copies of it go stale."""
+        r = self.redis_client()
+        key = artifact_key(self.embedding_name, 'version')
+        version = r.incr(key)
+        if self.redist_expire is not None and self.redist_expire > 0:
+            r.expire(key, self.redist_expire)
+        print(f'Index version in Redis (db={self.redis_db}) is now {version}: {key}')
 
-        r = redis.from_url(self.redis_url, **kwargs)
+    def write_embeddings_to_redis(self):
+        """Write embeddings to Redis using instance configuration."""
+        r = self.redis_client()
 
-        pickled_data = pickle.dumps(self.result)
-        r.set(self.embedding_name, pickled_data)
+        if self.storage_format == 'pickle':
+            data = pickle.dumps(self.result)
+        else:
+            data = wire_format.dumps(self.result, wire_format.CODECS[self.storage_format])
+        r.set(self.embedding_name, data)
         if self.redist_expire is not None and self.redist_expire > 0:
             r.expire(self.embedding_name, self.redist_expire)
         print(f'Embeddings written to Redis (db={self.redis_db}) with key: {self.embedding_name}')
 
+    def embeddings_file(self) -> str:
+        """Path of the local embeddings pickle."""
+        return self.pickle_file if self.pickle_file else f'{self.idir}/embeddings.pkl'
+
     def write_embeddings_to_file(self):
         """Write embeddings to local filesystem using instance configuration."""
-        output_file = self.pickle_file if self.pickle_file else f'{self.idir}/embeddings.pkl'
-        self.result.to_pickle(output_file)
+        output_file = self.embeddings_file()
+        if self.storage_format == 'pickle':
+            self.result.to_pickle(output_file)
+        else:
+            with open(output_file, 'wb') as f:
+                wire_format.write(self.result, f, wire_format.CODECS[self.storage_format])
         print(f'Embeddings written to: {output_file}')
 
-    def run(self, df: pandas.DataFrame) -> pandas.DataFrame:
+    def write_documents(self, df: pandas.DataFrame, sources: list):
+        """Render the result record of every indexed row into the document store.
+
+        Args:
+            df (pandas.DataFrame): The indexed rows, in embeddings order
+            sources (list): The raw data objects the rows were read from
+        """
+        path = self.docstore_file or docstore_path(self.embeddings_file())
+        n = DocStore.build(path, render_records(df, sources),
+                           metadata_hash=self.manifest['hashes']['metadata'])
+        print(f'Document store with {n} records written to: {path}')
+
+    def delete_documents(self):
+        """Remove the document store of an earlier build, which searches would
+        otherwise open and hydrate the new rows from."""
+        path = self.docstore_file or docstore_path(self.embeddings_file())
+        if os.path.exists(path):
+            os.remove(path)
+            print(f'Stale document store removed: {path}')
+
+    def write_summaries(self, df: pandas.DataFrame):
+        """Fill the summary cache next to the embeddings file for the whole corpus.
+
+        Args:
+            df (pandas.DataFrame): The indexed rows, with a 'description' column
+        """
+        path = summaries_path(self.embeddings_file())
+        cache = SummaryCache(path)
+        n = precompute(df.description, cache, DRGIST, self.summary_processes)
+        print(f'{n} summaries added; {len(cache)} in: {path}')
+        cache.close()
+
+    def write_shards(self):
+        """Write the embeddings as ``self.shards`` contiguous shard artifacts.
+
+        The 'shards' artifact records the number of rows in each shard.
+        """
+        sizes = []
+        for shard, part in enumerate(split_shards(self.result, self.shards)):
+            self.write_artifact(shard_name(shard), part)
+            sizes.append(len(part))
+        self.write_artifact('shards', {'n_shards': self.shards, 'rows': sizes})
+
+    def write_artifact(self, name: str, obj):
+        """Store an auxiliary index structure next to the embeddings.
+
+        Artifacts go to Redis key ``<embedding_name>:<name>`` when writing to
+        Redis, and to ``<embeddings file stem>.<name>.pkl`` otherwise.
+
+        Args:
+            name (str): Artifact name, e.g. 'bitmaps'
+            obj: Picklable object to store
+        """
+        if self.embedding_name:
+            key = artifact_key(self.embedding_name, name)
+            r = self.redis_client()
+            r.set(key, pickle.dumps(obj))
+            if self.redist_expire is not None and self.redist_expire > 0:
+                r.expire(key, self.redist_expire)
+            print(f'{name} written to Redis (db={self.redis_db}) with key: {key}')
+        else:
+            path = artifact_path(self.embeddings_file(), name)
+            with open(path, 'wb') as f:
+                pickle.dump(obj, f)
+            print(f'{name} written to: {path}')
+
+    def delete_artifact(self, name: str):
+        """Remove an auxiliary index structure an earlier build stored, if any.
+
+        Args:
+            name (str): Artifact name, e.g. 'aliases'
+        """
+        if self.embedding_name:
+            key = artifact_key(self.embedding_name, name)
+            if self.redis_client().delete(key):
+                print(f'Stale {name} removed from Redis (db={self.redis_db}): {key}')
+        else:
+            path = artifact_path(self.embeddings_file(), name)
+            if os.path.exists(path):
+                os.remove(path)
+                print(f'Stale {name} removed: {path}')
+
+    def run(self, df: pandas.DataFrame, sources: Optional[list] = None) -> pandas.DataFrame:
         """Run embeddings computation on a pandas DataFrame.
 
         Args:
             df (pandas.DataFrame): DataFrame with 'description' column
+            sources (list, optional): The raw data objects ``df`` was read
+             from; when given, their rendered records are written to the
+             document store
 
         Returns:
             pandas.DataFrame: Original data concatenated with embeddings
@@ -254,34 +498,218 @@ class EmbeddingsComputer:
         if not torch.cuda.is_available():
             print('Warning: No GPU detected. Using CPU.')
 
-        embeddings = self.encode_narratives(df.description.astype(str))
-        self.result = pandas.concat([df, embeddings], axis=1)
+        with self.memory.stage('encode narratives'):
+            embeddings = self.encode_narratives(df.description.astype(str))
+        if self.first_stage_model:
+            with self.memory.stage('encode first stage'):
+                vectors = self.encode_narratives(df.description.astype(str),
+                                                 self.first_stage_model)
+                self.first_stage = FirstStage.build(self.first_stage_model, vectors.to_numpy())
+            print(f'First stage: {self.first_stage.dims}-dim vectors from {self.first_stage_model}')
+        if self.passages:
+            with self.memory.stage('encode passages'):
+                self.passage_index = self.encode_passages(df)
+            print(f'Passages: {self.passage_index.n_passages} passages of '
+                  f'{len(df)} descriptions')
+        with self.memory.stage('concat embeddings'):
+            self.result = pandas.concat([df, embeddings], axis=1)
+        return self.write_index(df, sources)
+
+    def write_index(self, df: pandas.DataFrame, sources: Optional[list] = None) -> pandas.DataFrame:
+        """Build the artifacts of ``self.result`` and write the index.
+
+        Args:
+            df (pandas.DataFrame): The rows of ``self.result``, without embeddings
+            sources (list, optional): The raw data objects ``df`` was read
+             from, for the document store
+
+        Returns:
+            pandas.DataFrame: ``self.result``
+        """
+        with self.memory.stage('bitmap index'):
+            self.bitmaps = BitmapIndex.build(self.result)
+        with self.memory.stage('bm25 index'):
+            self.bm25 = BM25Index.build(df.description.astype(str))
+        if self.pca_dims:
+            with self.memory.stage('pca projection'):
+                self.pca = PCAProjection.fit(embedding_matrix(self.result), self.pca_dims)
+            print(f'PCA: {self.pca.dims} dimensions keep '
+                  f'{self.pca.explained_variance_ratio.sum():.1%} of the variance')
         # Write to Redis if embedding name is specified
+        with self.memory.stage('write embeddings'):
+            if self.embedding_name:
+                if not self.redis_url:
+                    raise ValueError("redis_url must be provided when embedding_name is specified")
+                self.write_embeddings_to_redis()
+            else:
+                # Write to local filesystem
+                self.write_embeddings_to_file()
+            self.write_artifact('bitmaps', self.bitmaps)
+            self.write_artifact('bm25', self.bm25)
+            # Optional artifacts an earlier build wrote would describe other rows
+            for name, artifact in (('aliases', self.aliases), ('pca', self.pca),
+                                   ('first_stage', self.first_stage),
+                                   ('passages', self.passage_index)):
+                if artifact is not None:
+                    self.write_artifact(name, artifact)
+                else:
+                    self.delete_artifact(name)
+        with self.memory.stage('manifest'):
+            self.manifest = build_manifest(self.result, self.model_name, self.precision,
+                                           self.storage_format, shards=self.shards)
+            self.write_artifact('manifest', self.manifest)
+        if self.shards > 1:
+            with self.memory.stage('write shards'):
+                self.write_shards()
+        else:
+            # Without it, the shards of an earlier build are never read
+            self.delete_artifact('shards')
         if self.embedding_name:
-            if not self.redis_url:
-                raise ValueError("redis_url must be provided when embedding_name is specified")
-            self.write_embeddings_to_redis()
+            # Only once every key is written, so a reader never caches a mix
+            self.bump_version()
+        if sources is not None and self.write_docstore:
+            with self.memory.stage('document store'):
+                self.write_documents(df, sources)
         else:
-            # Write to local filesystem
-            self.write_embeddings_to_file()
+            self.delete_documents()
+        if self.summary_processes > 0:
+            with self.memory.stage('summaries'):
+                self.write_summaries(df)
 
         return self.result
 
-    def run_local(self):
+    def load_descriptions(self):
+        """Read and deduplicate the descriptions of the split files in ``idir``.
+
+        Returns:
+            (pandas.DataFrame, list): The unique descriptions and the raw
+            data objects they were read from
+        """
+        with self.memory.stage('load sources'):
+            objects = self.glob2objects(f'{self.idir}/*_S*')
+        with self.memory.stage('concat descriptions'):
+            descriptions = self.objects2descriptions(objects)
+        with self.memory.stage('drop duplicates'):
+            df = descriptions.drop_duplicates(
+                subset=['description'],
+                keep='last',
+                ignore_index=True
+            )
+        return df, objects
+
+    def run_local(self, df: Optional[pandas.DataFrame] = None, objects: Optional[list] = None):
         """Run embeddings computation from local filesystem.
 
+        Args:
+            df (pandas.DataFrame, optional): Descriptions already read by
+             ``load_descriptions``, with ``objects``; read when None
+            objects (list, optional): The raw data objects of ``df``
+
         Returns:
             pandas.DataFrame: The computed embeddings
         """
-        objects = self.glob2objects(f'{self.idir}/*_S*')
-        descriptions = self.objects2descriptions(objects)
-        df = descriptions.drop_duplicates(
-            subset=['description'],
-            keep='last',
-            ignore_index=True
-        )
+        if df is None:
+            df, objects = self.load_descriptions()
+        if self.build_shard is not None:
+            return self.run_shard(df)
+        if self.near_duplicate_threshold:
+            with self.memory.stage('near duplicates'):
+                df, self.aliases = self.collapse_near_duplicates(df)
+
+        return self.run(df, objects)
+
+    def run_shard(self, df: pandas.DataFrame) -> pandas.DataFrame:
+        """Encode this host's slice of the descriptions as a build shard.
+
+        The shard's embeddings go next to the embeddings file, with a
+        manifest that ``merge`` checks.
+
+        Args:
+            df (pandas.DataFrame): The whole deduplicated description table
+
+        Returns:
+            pandas.DataFrame: The shard's rows concatenated with embeddings
+        """
+        shard, n_shards = self.build_shard
+        start, stop = shard_bounds(len(df), shard, n_shards)
+        part = df.iloc[start:stop].reset_index(drop=True)
+        print(f'Build shard {shard}/{n_shards}: rows {start} to {stop} of {len(df)}')
+        with self.memory.stage('encode narratives'):
+            embeddings = self.encode_narratives(part.description.astype(str))
+        with self.memory.stage('concat embeddings'):
+            self.result = pandas.concat([part, embeddings], axis=1)
+        path = shard_path(self.embeddings_file(), shard, n_shards)
+        with self.memory.stage('write embeddings'):
+            with open(path, 'wb') as f:
+                if self.storage_format == 'pickle':
+                    pickle.dump(self.result, f)
+                else:
+                    wire_format.write(self.result, f, wire_format.CODECS[self.storage_format])
+            write_manifest(path, {
+                'shard': shard, 'n_shards': n_shards, 'start': start, 'stop': stop,
+                'total_rows': len(df), 'descriptions': frame_hash(df),
+                'model_name': self.model_name, 'precision': self.precision,
+                'dims': embeddings.shape[1]})
+        print(f'Build shard written to: {path}')
+        return self.result
+
+    def merge(self, manifests: List[str], sources: Optional[list] = None) -> pandas.DataFrame:
+        """Combine build shards into one index and write it with its artifacts.
+
+        Args:
+            manifests (List[str]): The manifests of all the build shards
+            sources (list, optional): The raw data objects the descriptions
+             were read from, for the document store
+
+        Returns:
+            pandas.DataFrame: The merged embeddings
+        """
+        with self.memory.stage('merge shards'):
+            ordered = check_manifests(read_manifests(manifests))
+            first = ordered[0]
+            if first['model_name'] != self.model_name:
+                raise ValueError(f"Build shards were encoded with {first['model_name']}, "
+                                 f"not {self.model_name}")
+            frames = []
+            for manifest in ordered:
+                path = manifest['path']
+                frame = (wire_format.load(path) if wire_format.sniff(path)
+                         else pandas.read_pickle(path))
+                if len(frame) != manifest['stop'] - manifest['start']:
+                    raise ValueError(f"Build shard {path} holds {len(frame)} rows, its "
+                                     f"manifest {manifest['stop'] - manifest['start']}")
+                frames.append(frame)
+            self.result = pandas.concat(frames, ignore_index=True)
+        print(f"Merged {len(ordered)} build shards: {len(self.result)} rows of "
+              f"{first['dims']}-dim {first['model_name']} embeddings")
+        columns = wire_format.embedding_columns(self.result)
+        return self.write_index(self.result.drop(columns=columns), sources)
+
+    def collapse_near_duplicates(self, df: pandas.DataFrame):
+        """Keep one representative per group of near-identical descriptions.
+
+        Args:
+            df (pandas.DataFrame): Descriptions with a RangeIndex
+
+        Returns:
+            (pandas.DataFrame, pandas.DataFrame): The representatives, with an
+            'n_aliases' column, and the aliases (source, filename, row and the
+            position of their representative in the first frame)
+        """
+        representative = near_duplicate_representatives(
+            df.description.astype(str).tolist(), self.near_duplicate_threshold)
+        is_representative = representative == numpy.arange(len(df))
+        new_position = numpy.cumsum(is_representative) - 1
+
+        aliases = df.loc[~is_representative, ['source', 'filename', 'row']].reset_index(drop=True)
+        aliases['representative'] = new_position[representative[~is_representative]]
 
-        return self.run(df)
+        kept = df[is_representative].reset_index(drop=True)
+        kept['n_aliases'] = numpy.bincount(aliases['representative'],
+                                           minlength=len(kept))
+        print(f'Near duplicates: embedding {len(kept)} of {len(df)} descriptions, '
+              f'{len(aliases)} kept as aliases')
+        return kept, aliases
 
 
 if __name__ == "__main__":
@@ -299,6 +727,41 @@ if __name__ == "__main__":
                        help='Redis database number (default: 0)')
     parser.add_argument('--embedding-name', default=None,
                        help='Name for embedding in Redis')
+    parser.add_argument('--near-duplicates', type=float, default=None, metavar='THRESHOLD',
+                       help='Embed one representative per group of descriptions with '
+                            'estimated Jaccard similarity >= THRESHOLD, e.g. 0.9')
+    parser.add_argument('--docstore', default=None,
+                       help='SQLite document store of rendered results '
+                            '(default: next to the embeddings file)')
+    parser.add_argument('--no-docstore', action='store_true',
+                       help='Do not write the document store')
+    parser.add_argument('--shards', type=int, default=1,
+                       help='Also write the embeddings as N shards for scatter-gather search')
+    parser.add_argument('--storage-format', choices=wire_format.FORMATS, default='pickle',
+                       help='Store the embeddings as a pickled DataFrame, in the binary '
+                            'wire format, or compressed as float16 zstd chunks '
+                            '(default: pickle)')
+    parser.add_argument('--pca-dims', type=int, default=None,
+                       help='Also store a PCA projection to N dimensions for a reduced '
+                            'first-stage search')
+    parser.add_argument('--precompute-summaries', type=int, default=0, metavar='PROCESSES',
+                       help=f'Summarize every long description with {DRGIST} ahead of '
+                            'search, using this many processes')
+    parser.add_argument('--first-stage-model', nargs='?', const=FIRST_STAGE_MODEL, default=None,
+                       help='Also store vectors of a small model for a two-model cascade '
+                            f'(default model: {FIRST_STAGE_MODEL})')
+    parser.add_argument('--passages', action='store_true',
+                       help='Also encode token-bounded passages of every description '
+                            'for passage-level search')
+    parser.add_argument('--passage-tokens', type=int, default=None,
+                       help="Tokens per passage (default: the model's max_seq_length)")
+    parser.add_argument('--shard', type=parse_build_shard, default=None, metavar='i/N',
+                       help='Encode only the i-th of N slices of the descriptions into a '
+                            'build shard, for dr-drafts-build-index merge')
+    parser.add_argument('--memory-budget', type=parse_size, default=None,
+                       help='Abort once RSS exceeds this size, e.g. 24G')
+    parser.add_argument('--trace-allocations', action='store_true',
+                       help='Report the top allocating call sites per stage')
     args = parser.parse_args()
 
     # Create EmbeddingsComputer instance and run
@@ -309,6 +772,21 @@ if __name__ == "__main__":
         redis_username=args.redis_username,
         redis_password=args.redis_password,
         redis_db=args.redis_db,
-        embedding_name=args.embedding_name
+        embedding_name=args.embedding_name,
+        memory_tracker=MemoryTracker(budget_bytes=args.memory_budget,
+                                     trace_allocations=args.trace_allocations),
+        near_duplicate_threshold=args.near_duplicates,
+        docstore_file=args.docstore,
+        write_docstore=not args.no_docstore,
+        shards=args.shards,
+        storage_format=args.storage_format,
+        pca_dims=args.pca_dims,
+        first_stage_model=args.first_stage_model,
+        summary_processes=args.precompute_summaries,
+        passages=args.passages,
+        passage_tokens=args.passage_tokens,
+        build_shard=args.shard
     )
+    computer.memory.install_signal_handler()
     computer.run_local()
+    computer.memory.report()
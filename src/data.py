@@ -84,10 +84,84 @@ class Raw_Data_Index():
         '''
             Print only the title to stdout if saving output to csv
         '''
+    # Date columns parsed once by normalize_dates() at load time; to_dict()
+    # looks the MM/DD/YYYY strings up with normalized_date().
+    DATE_COLUMNS = []
+    # Formats tried in order; a value keeps the first format that parses it.
+    DATE_FORMATS = ['%Y-%m-%d']
+    # Returned for missing dates.  Unparseable dates become None.
+    MISSING_DATE = ''
+
+    def prepare_dates(self, dates: pd.Series):
+        '''
+            Vectorized clean-up of raw date values before parsing, e.g.
+            stripping weekdays or fractional seconds.  Missing values stay NaN.
+        '''
+        text = dates.astype(str).str.strip().astype(object)
+        return text.where(dates.notna(), None)
+
+    def date_series(self):
+        '''
+            The raw date columns to normalize, by name
+        '''
+        return {c: self.df[c] for c in self.DATE_COLUMNS if c in self.df.columns}
+
+    def parse_dates(self, dates: pd.Series):
+        '''
+            Parse a column of raw dates with DATE_FORMATS
+
+            Returns the MM/DD/YYYY strings in row order, the number of values
+            each format matched, and the number of unparseable values.
+        '''
+        text = self.prepare_dates(dates.reset_index(drop=True))
+        parsed = pd.Series(pd.NaT, index=text.index, dtype='datetime64[us]')
+        remaining = text.notna() & (text != '')
+        formats = {}
+        for f in self.DATE_FORMATS:
+            if not remaining.any():
+                break
+            attempt = pd.to_datetime(text[remaining], format=f, errors='coerce')
+            matched = attempt.index[attempt.notna()]
+            if len(matched):
+                parsed[matched] = attempt[matched]
+                remaining[matched] = False
+                formats[f] = len(matched)
+        normalized = [d.strftime('%m/%d/%Y') if d is not pd.NaT else None for d in parsed]
+        for i in (text.isna() | (text == '')).to_numpy().nonzero()[0]:
+            normalized[i] = self.MISSING_DATE
+        return normalized, formats, int(remaining.sum())
+
+    def normalize_dates(self):
+        '''
+            Parse every date column once, remembering which format matched.
+            Unparseable dates are counted and reported in a single line.
+        '''
+        self.normalized_dates = {}
+        self.date_formats = {}
+        self.unparsed_dates = {}
+        for column, dates in self.date_series().items():
+            normalized, formats, unparsed = self.parse_dates(dates)
+            self.normalized_dates[column] = normalized
+            self.date_formats[column] = formats
+            if unparsed:
+                self.unparsed_dates[column] = unparsed
+        if self.unparsed_dates:
+            counts = ', '.join(f'{c}: {n}' for c, n in self.unparsed_dates.items())
+            print(f'{self.__class__.__name__} {self.filename}: unparseable dates ({counts})')
+
+    def normalized_date(self, idx: int, column: str):
+        '''
+            The date in ``column`` of row ``idx`` as normalized at load time
+        '''
+        return self.normalized_dates[column][idx]
+
     def date2MMDDYYYY(self, date: str):
         '''
-            Each raw data source may have its own data format
+            Normalize a single date with this source's formats; to_dict()
+            uses the columns normalized at load time instead
         '''
+        return self.parse_dates(pd.Series([date], dtype=object))[0][0]
+
     def mk_empty_row(self):
         return {k: None for k in ATTRIBUTES}
 
@@ -109,12 +183,15 @@ class Raw_Data_Index():
 
 
 class NSF(Raw_Data_Index):
+    DATE_COLUMNS = ['Posted_date', 'Next_due_date']
+
     def __init__(self, filename: str, desc_att: str):
         super().__init__(filename, desc_att)
         self.load_data()
 
     def load_data(self):
         self.df = pd.read_csv(self.filename)
+        self.normalize_dates()
 
     def get_descriptions(self):
         return pd.DataFrame({'source': self.__class__.__name__,
@@ -123,12 +200,11 @@ class NSF(Raw_Data_Index):
                              'description': self.df[self.description_attribute]
                              })
 
-    def date2MMDDYYYY(self, date: str):
-        if isinstance(date, float):
-            return ''
-        if ' ' in date:
-            date = date.split(',')[1].strip()
-        return datetime.strptime(date, '%Y-%m-%d').strftime('%m/%d/%Y')
+    def prepare_dates(self, dates: pd.Series):
+        dates = super().prepare_dates(dates)
+        weekday = dates.str.contains(' ', na=False)
+        dates[weekday] = dates[weekday].str.split(',').str[1].str.strip()
+        return dates
 
     def to_dict(self, idx: int, similarity: float):
         row = self.df.iloc[idx]
@@ -136,11 +212,11 @@ class NSF(Raw_Data_Index):
         result['Similarity'] = similarity
         result['Feed'] = 'NSF'
         result['Title'] = row.Title
-        result['Posted'] = self.date2MMDDYYYY(row.Posted_date)
+        result['Posted'] = self.normalized_date(idx, 'Posted_date')
         result['Description'] = row.Synopsis
         result['AwardType'] = row.Award_Type
         result['DueDates'] = [row['Next_due_date']]# double check
-        result['CloseDate'] = self.date2MMDDYYYY(row['Next_due_date'])
+        result['CloseDate'] = self.normalized_date(idx, 'Next_due_date')
         result['RollingDecision'] = row['Proposals_accepted_anytime']
         result['ProgramID'] = row.Program_ID
         result['FeedID'] = row.NSF_PD_Num
@@ -154,12 +230,17 @@ class NSF(Raw_Data_Index):
 
 
 class SCS(Raw_Data_Index):
+    DATE_COLUMNS = ['Post Date', 'Due Date']
+    DATE_FORMATS = ['%m/%d/%y', '%Y-%m-%d']
+    MISSING_DATE = None
+
     def __init__(self, filename: str, desc_att: str):
         super().__init__(filename, desc_att)
         self.load_data()
 
     def load_data(self):
         self.df = pd.read_csv(self.filename, lineterminator='\n')  # ^M in data
+        self.normalize_dates()
 
     def get_descriptions(self):
         return pd.DataFrame({'source': self.__class__.__name__,
@@ -168,21 +249,6 @@ class SCS(Raw_Data_Index):
                              'description': self.df[self.description_attribute]
                              })
 
-    def date2MMDDYYYY(self, date: str):
-        if isinstance(date, float):
-            return None
-        formats = ['%m/%d/%y', '%Y-%m-%d']
-        dt = None
-        for f in formats:
-            try:
-                dt = datetime.strptime(date.strip(), f).strftime('%m/%d/%Y')
-                break
-            except:
-                pass
-        if not dt:
-            print('scs not a DT', date)
-        return dt
-
     def to_dict(self, idx: int, similarity: float):
         row = self.df.iloc[idx]
         result = self.mk_empty_row()
@@ -191,8 +257,8 @@ class SCS(Raw_Data_Index):
         result['Title'] = row['Title']
         result['Sponsor'] = row['Agency/Organization']
         result['SponsorType'] = row['Type']
-        result['Posted'] = self.date2MMDDYYYY(row['Post Date'])
-        result['CloseDate'] = self.date2MMDDYYYY(row['Due Date'])
+        result['Posted'] = self.normalized_date(idx, 'Post Date')
+        result['CloseDate'] = self.normalized_date(idx, 'Due Date')
         result['URL'] = 'https://docs.google.com/spreadsheets/d/19vQMmH0Vsg0tvf4ia3SBqWTQ8lowQCPhyTOt3hQSVHk/edit?usp=sharing'
         result['Amount'] = row['Amount/Duration']
         result['Description'] = row['Brief Description']
@@ -201,12 +267,19 @@ class SCS(Raw_Data_Index):
 
 
 class CMU(Raw_Data_Index):
+    DATE_COLUMNS = ['Internal Letter of Intent Deadline',
+                    'Internal Pre-Proposal Deadline',
+                    'Final Sponsor Deadline']
+    DATE_FORMATS = ['%m/%d/%Y', '%Y-%m-%d', '%B %d, %Y']
+    MISSING_DATE = None
+
     def __init__(self, filename: str, desc_att: str):
         super().__init__(filename, desc_att)
         self.load_data()
 
     def load_data(self):
         self.df = pd.read_csv(self.filename)
+        self.normalize_dates()
 
     def get_descriptions(self):
         return pd.DataFrame({'source': self.__class__.__name__,
@@ -215,11 +288,6 @@ class CMU(Raw_Data_Index):
                              'description': self.df[self.description_attribute]
                              })
 
-    def date2MMDDYYYY(self, date: str):
-        if isinstance(date, float):
-            return None
-        return datetime.strptime(date)
-
     def to_dict(self, idx: int, similarity: float):
         row = self.df.iloc[idx]
         result = self.mk_empty_row()
@@ -231,10 +299,10 @@ class CMU(Raw_Data_Index):
         result['Posted'] = 'NA'
         result['ProgramID'] = row['Solicitation Number']
         result['SponsorType'] = 'NA'  # row['Federal/Non-Federal']
-        result['DueDates'] = {'InternalLOI': self.date2MMDDYYYY(row['Internal Letter of Intent Deadline']),
-                              'InternalPPD': self.date2MMDDYYYY(row['Internal Pre-Proposal Deadline']),
+        result['DueDates'] = {'InternalLOI': self.normalized_date(idx, 'Internal Letter of Intent Deadline'),
+                              'InternalPPD': self.normalized_date(idx, 'Internal Pre-Proposal Deadline'),
                               #'NextDueDate':self.date2MMDDYYYY(row['1st Sponsor Deadline']),
-                              'FinalDueDate': self.date2MMDDYYYY(row['Final Sponsor Deadline'])
+                              'FinalDueDate': self.normalized_date(idx, 'Final Sponsor Deadline')
                              }
         result['CloseDate'] = ''
         result['LimitedSubmissionInfo'] = row['CMU Limit']
@@ -248,12 +316,17 @@ class CMU(Raw_Data_Index):
 
 
 class EXTERNAL(Raw_Data_Index):
+    DATE_COLUMNS = ['Deadline']
+    DATE_FORMATS = ['%m/%d/%Y']
+    MISSING_DATE = None
+
     def __init__(self, filename: str, desc_att: str):
         super().__init__(filename, desc_att)
         self.load_data()
 
     def load_data(self):
         self.df = pd.read_csv(self.filename)
+        self.normalize_dates()
 
     def get_descriptions(self):
         return pd.DataFrame({'source': self.__class__.__name__,
@@ -262,11 +335,6 @@ class EXTERNAL(Raw_Data_Index):
                              'description': self.df[self.description_attribute]
                             })
 
-    def date2MMDDYYYY(self, date: str):
-        if isinstance(date, float):
-            return None
-        return datetime.strptime(date, '%m/%d/%Y').strftime('%m/%d/%Y')
-
     def to_dict(self, idx: int, similarity:float):
         # Opportunity Name,Organization,Deadline,Early Career,Description,URL,$ Amount of Award,Duration of Award
         row = self.df.iloc[idx]
@@ -279,8 +347,8 @@ class EXTERNAL(Raw_Data_Index):
         result['Posted'] = 'NA'
         # result['ProgramID'] = row['Solicitation Number']
         result['SponsorType'] = 'External Foundation'#row['Federal/Non-Federal']
-        result['DueDates'] = {'Deadline':self.date2MMDDYYYY(row['Deadline'])}
-        result['CloseDate'] = self.date2MMDDYYYY(row['Deadline'])
+        result['DueDates'] = {'Deadline': self.normalized_date(idx, 'Deadline')}
+        result['CloseDate'] = self.normalized_date(idx, 'Deadline')
         # result['LimitedSubmissionInfo'] = row['CMU Limit']
         # result['SubmissionRequirements'] = row['Proposal Requirements (internal, external nominations)']
         result['URL'] = 'https://www.cmu.edu/engage/partner/foundations/faculty-staff/index.html'
@@ -294,12 +362,28 @@ class EXTERNAL(Raw_Data_Index):
 
 
 class GFORWARD(Raw_Data_Index):
+    DATE_COLUMNS = ['Submit Date', 'Modified Date']
+    DATE_FORMATS = ['%Y-%m-%d', '%B %d, %Y']
+    # Deadlines lines carrying the close and posted dates
+    DEADLINE_MARKERS = {'Submission:': 'CloseDate', 'Submit Date:': 'Posted'}
+
     def __init__(self, filename: str, desc_att: str):
         super().__init__(filename, desc_att)
         self.load_data()
 
     def load_data(self):
         self.df = pd.read_csv(self.filename)
+        self.normalize_dates()
+
+    def date_series(self):
+        series = super().date_series()
+        lines = self.df['Deadlines'].str.split('\n').explode()
+        for marker, name in self.DEADLINE_MARKERS.items():
+            # The last matching line wins, as when iterating over DueDates.
+            found = lines[lines.str.contains(marker, na=False, regex=False)]
+            last = found.str.split(marker, n=1).str[1].groupby(level=0).last()
+            series[name] = last.reindex(self.df.index)
+        return series
 
     def get_descriptions(self):
         return pd.DataFrame({'source': self.__class__.__name__,
@@ -308,20 +392,11 @@ class GFORWARD(Raw_Data_Index):
                              'description': self.df[self.description_attribute]
                             })
 
-    def date2MMDDYYYY(self, date: str):
-        if ':' in date:
-            date = date.split(':')[1].strip()
-        formats = ['%Y-%m-%d', '%B %d, %Y']
-        dt = None
-        for f in formats:
-            try:
-                dt = datetime.strptime(date.strip(), f).strftime('%m/%d/%Y')
-                break
-            except:
-                continue
-        if not dt:
-            print('gforward not a DT', date)
-        return dt
+    def prepare_dates(self, dates: pd.Series):
+        dates = super().prepare_dates(dates)
+        labelled = dates.str.contains(':', na=False, regex=False)
+        dates[labelled] = dates[labelled].str.split(':').str[1].str.strip()
+        return dates
 
     def to_dict(self, idx: int, similarity: float):
         row = self.df.iloc[idx]
@@ -337,16 +412,8 @@ class GFORWARD(Raw_Data_Index):
             result['DueDates'] = {f'Deadline_{i}':e for i,e in enumerate(row['Deadlines'].split('\n'))}
         else:
             result['DueDates'] = {'Closed':''}
-        for k,v in result['DueDates'].items():
-            # if isnan(v): continue
-            if 'Submission:' in v:
-                result['CloseDate'] = self.date2MMDDYYYY(v.split('Submission:')[1])
-            if 'Submit Date:' in v:
-                result['Posted'] = self.date2MMDDYYYY(v.split('Submit Date:')[1])
-        if 'Posted' not in result:
-            result['Posted'] = ''
-        if 'CloseDate' not in result:
-            result['CloseDate'] = ''
+        result['CloseDate'] = self.normalized_date(idx, 'CloseDate')
+        result['Posted'] = self.normalized_date(idx, 'Posted')
         # result['Amount'] = 'Unknown'#row['Amount Info']
         result['MaxAmount'] = row['Maximum Amount']
         result['MinAmount'] = row['Minimum Amount']
@@ -358,8 +425,8 @@ class GFORWARD(Raw_Data_Index):
         result['ApplicantType'] = row['Applicant Types']
         result['Categories'] = row['Categories']
         result['Contacts'] = row['Contacts']
-        result['DueDates']['Submit Date'] = self.date2MMDDYYYY(row['Submit Date'])
-        result['ModifiedDate'] = self.date2MMDDYYYY(row['Modified Date'])
+        result['DueDates']['Submit Date'] = self.normalized_date(idx, 'Submit Date')
+        result['ModifiedDate'] = self.normalized_date(idx, 'Modified Date')
         result['URL'] = row['GrantForward URL']
         result['CitizenshipReq'] = row['Citizenships']
         result['MaxNumAwards'] = row['Maximum Number of Awards']
@@ -372,12 +439,16 @@ class GFORWARD(Raw_Data_Index):
 
 
 class GRANTS(Raw_Data_Index):
+    DATE_COLUMNS = ['PostDate', 'CloseDate', 'LastUpdatedDate']
+    DATE_FORMATS = ['%m%d%Y', '%Y-%m-%d', '%Y-%m-%d %H:%M:%S']
+
     def __init__(self, filename: str, desc_att: str):
         super().__init__(filename, desc_att)
         self.load_data()
 
     def load_data(self):
         self.df = pd.read_csv(self.filename)
+        self.normalize_dates()
 
     def get_descriptions(self):
         return pd.DataFrame({'source': self.__class__.__name__,
@@ -386,23 +457,13 @@ class GRANTS(Raw_Data_Index):
                              'description': self.df[self.description_attribute]
                             })
 
-    def date2MMDDYYYY(self, date: str):
-        if isinstance(date, datetime):
-            return date.strftime('%m/%d/%Y')
-        if isinstance(date, float):
-            if isnan(date):
-                return ''
-            else:
-                date = str(int(date))
-        dt = None
-        for f in ['%m%d%Y', '%Y-%m-%d']:
-            try:
-                dt = datetime.strptime(date, f).strftime('%m/%d/%Y')
-            except:
-                pass
-        if not dt:
-            print('stumped!', date)
-        return dt
+    def prepare_dates(self, dates: pd.Series):
+        # MMDDYYYY dates are read as numbers and lose their leading zero.
+        numbers = pd.to_numeric(dates, errors='coerce')
+        dates = super().prepare_dates(dates)
+        numeric = numbers.notna()
+        dates[numeric] = numbers[numeric].astype('int64').astype(str).str.zfill(8)
+        return dates
 
     def to_dict(self, idx: int, similarity: float):
         # https://apply07.grants.gov/help/html/help/index.htm#t=XMLExtract%2FXMLExtract.htm
@@ -434,16 +495,10 @@ class GRANTS(Raw_Data_Index):
         result['Eligibility'] = row['AdditionalInformationOnEligibility']
         # AgencyCode
         result['Sponsor'] = row['AgencyName']
-        if isnan(row['PostDate']):
-            result['Posted'] = ''
-        else:
-            result['Posted'] = self.date2MMDDYYYY(str(int(row['PostDate'])))
+        result['Posted'] = self.normalized_date(idx, 'PostDate')
         result['DueDates'] = {}
-        result['CloseDate'] = self.date2MMDDYYYY(row['CloseDate'])
-        if isnan(row['LastUpdatedDate']):
-            result['ModifiedDate'] = ''
-        else:
-            result['ModifiedDate'] = self.date2MMDDYYYY(row['CloseDate'])
+        result['CloseDate'] = self.normalized_date(idx, 'CloseDate')
+        result['ModifiedDate'] = self.normalized_date(idx, 'LastUpdatedDate')
         result['MaxAmount'] = row['AwardCeiling']
         result['MinAmount'] = row['AwardFloor']
         result['Amount'] = row['EstimatedTotalProgramFunding']
@@ -468,12 +523,25 @@ class GRANTS(Raw_Data_Index):
 
 
 class PIVOT(Raw_Data_Index):
+    DATE_FORMATS = ['%d %b %Y']
+
     def __init__(self, filename: str, desc_att: str):
         super().__init__(filename, desc_att)
         self.load_data()
 
     def load_data(self):
         self.df = pd.read_csv(self.filename)
+        self.normalize_dates()
+
+    def date_series(self):
+        # The close date is the last "<date> - sponsor deadline" line and
+        # the posted date the first.
+        lines = self.df['Upcoming deadlines'].str.split('\n').explode()
+        found = lines[lines.str.contains('sponsor', na=False, regex=False)]
+        dates = found.str.split(' - ').str[0].groupby(level=0)
+        return {'CloseDate': dates.last().reindex(self.df.index),
+                'Posted': dates.first().reindex(self.df.index)}
+
     def get_descriptions(self):
         return pd.DataFrame({'source': self.__class__.__name__,
                              'filename': self.filename,
@@ -481,11 +549,6 @@ class PIVOT(Raw_Data_Index):
                              'description': self.df[self.description_attribute]
                              })
 
-    def date2MMDDYYYY(self, date: str):
-        if 'sponsor' in date:
-            return ''
-        return datetime.strptime(date.strip(), '%d %b %Y').strftime('%m/%d/%Y')
-
     def to_dict(self, idx: int, similarity: float):
         row = self.df.iloc[idx]
         result = self.mk_empty_row()
@@ -506,11 +569,9 @@ class PIVOT(Raw_Data_Index):
         else:
             result['DueDates'] = {}
             # Note
-        for k,v in result['DueDates'].items():
-            if 'sponsor' in str(v):
-                result['CloseDate'] = self.date2MMDDYYYY(v.split(' - ')[0])
-                if 'Posted' not in result:
-                    result['Posted'] = self.date2MMDDYYYY(v.split(' - ')[0])
+        if result['DueDates']:
+            result['CloseDate'] = self.normalized_date(idx, 'CloseDate')
+            result['Posted'] = self.normalized_date(idx, 'Posted')
         result['Eligibility'] = row['Eligibility']
         result['ApplicantLocation'] = row['Applicant/Institution Location']
         result['CitizenshipReq'] = row['Citizenship']
@@ -534,12 +595,20 @@ class PIVOT(Raw_Data_Index):
 
 
 class SAM(Raw_Data_Index):
+    DATE_COLUMNS = ['PostedDate', 'ArchiveDate', 'ResponseDeadLine', 'AwardDate']
+    DATE_FORMATS = ['%Y-%m-%d %H:%M:%S',
+                    '%Y-%m-%d',
+                    '%Y-%m-%dT%H:%M:%S',
+                    '%Y-%m-%dT%H:%M'
+                    ]
+
     def __init__(self, filename: str, desc_att: str):
         super().__init__(filename, desc_att)
         self.load_data()
 
     def load_data(self):
         self.df = pd.read_csv(self.filename)
+        self.normalize_dates()
 
     def get_descriptions(self):
         return pd.DataFrame({'source': self.__class__.__name__,
@@ -548,32 +617,11 @@ class SAM(Raw_Data_Index):
                              'description': self.df[self.description_attribute]
                              })
 
-    def date2MMDDYYYY(self, date: str):
-        if isinstance(date, float):
-            if isnan(date):
-                return ''
-            else: print('stumped', date)
-        if '.' in date:
-            date = date.split('.')[0].strip()
-        formats = ['%Y-%m-%d %H:%M:%S-%U',
-                   '%Y-%m-%d',
-                   '%Y-%m-%dT%H:%M:%S-%U:%W',
-                   '%Y-%m-%d %H:%M:%S',
-                   '%Y-%m-%dT%H:%M:%S',
-                   '%Y-%m-%dT%H:%M+%S:%U',
-                   '%Y-%m-%dT%H:%M%:%S+%U:%W',
-                   '%Y-%m-%dT%H:%M:%S+%U:%W'
-                   ]
-        dt = None
-        for f in formats:
-            try:
-                dt = datetime.strptime(date, f).strftime('%m/%d/%Y')
-                break
-            except:
-                pass
-        if not dt:
-            print('stumped!', date)
-        return dt
+    def prepare_dates(self, dates: pd.Series):
+        # Drop fractional seconds and the UTC offset; the date is kept as
+        # written, in the notice's own time zone.
+        dates = super().prepare_dates(dates).str.split('.').str[0].str.strip()
+        return dates.str.replace(r'(?<=:\d\d)\s*(?:[+-]\d\d(?::?\d\d)?|Z)$', '', regex=True)
 
     def to_dict(self, idx: int, similarity: float):
         row = self.df.iloc[idx]
@@ -589,15 +637,15 @@ class SAM(Raw_Data_Index):
         # FPDS Code
         # Office
         # AAC Code
-        result['Posted'] = self.date2MMDDYYYY(row['PostedDate'])
+        result['Posted'] = self.normalized_date(idx, 'PostedDate')
         result['AwardType'] = row['Type']
         # BaseType
         # ArchiveType
-        result['DueDates'] = {'ArchiveDate': self.date2MMDDYYYY(row['ArchiveDate']),
-                              'ResponseDeadLine': self.date2MMDDYYYY(row['ResponseDeadLine']),
-                              'AwardDate': self.date2MMDDYYYY(row['AwardDate'])
+        result['DueDates'] = {'ArchiveDate': self.normalized_date(idx, 'ArchiveDate'),
+                              'ResponseDeadLine': self.normalized_date(idx, 'ResponseDeadLine'),
+                              'AwardDate': self.normalized_date(idx, 'AwardDate')
                               }
-        result['CloseDate'] = self.date2MMDDYYYY(row['ResponseDeadLine'])
+        result['CloseDate'] = self.normalized_date(idx, 'ResponseDeadLine')
         # SetASideCode
         # SetASide
         # NaicsCode
@@ -627,12 +675,18 @@ class SAM(Raw_Data_Index):
 
 
 class ARXIV(Raw_Data_Index):
+    DATE_COLUMNS = ['version_created', 'last_update']
+    DATE_FORMATS = ['%a, %d %b %Y %H:%M:%S',
+                    '%Y-%m-%d'
+                    ]
+
     def __init__(self, filename: str, desc_att: str):
         super().__init__(filename, desc_att)
         self.load_data()
 
     def load_data(self):
         self.df = pd.read_csv(self.filename, quotechar='"')
+        self.normalize_dates()
 
     def get_descriptions(self):
         return pd.DataFrame({'source': self.__class__.__name__,
@@ -641,26 +695,10 @@ class ARXIV(Raw_Data_Index):
                              'description': self.df[self.description_attribute]
                              })
 
-    def date2MMDDYYYY(self, date: str):
-        if isinstance(date, float):
-            if isnan(date):
-                return ''
-            else: print('stumped', date)
-        if '.' in date:
-            date = date.split('.')[0].strip()
-        formats = ['%a, %d %b %Y %H:%M:%S %Z',
-                   '%Y-%m-%d'
-                   ]
-        dt = None
-        for f in formats:
-            try:
-                dt = datetime.strptime(date, f).strftime('%m/%d/%Y')
-                break
-            except:
-                pass
-        if not dt:
-            print('stumped!', date)
-        return dt
+    def prepare_dates(self, dates: pd.Series):
+        # "Mon, 2 Apr 2007 19:18:42 GMT": drop the zone name
+        dates = super().prepare_dates(dates).str.split('.').str[0].str.strip()
+        return dates.str.replace(r'\s+[A-Z]{2,5}$', '', regex=True)
 
     def to_dict(self, idx: int, similarity: float):
         row = self.df.iloc[idx]
@@ -676,7 +714,7 @@ class ARXIV(Raw_Data_Index):
         # FPDS Code
         # Office
         # AAC Code
-        result['Posted'] = self.date2MMDDYYYY(row['version_created'])
+        result['Posted'] = self.normalized_date(idx, 'version_created')
         result['AwardType'] = 'NA'  # row['Type']
         # BaseType
         # ArchiveType
@@ -684,7 +722,7 @@ class ARXIV(Raw_Data_Index):
                               #'ResponseDeadLine': self.date2MMDDYYYY(row['ResponseDeadLine']),
                               #'AwardDate': self.date2MMDDYYYY(row['AwardDate'])
                               #}
-        result['CloseDate'] = self.date2MMDDYYYY(row['last_update'])
+        result['CloseDate'] = self.normalized_date(idx, 'last_update')
         # SetASideCode
         # SetASide
         # NaicsCode
@@ -745,27 +783,6 @@ class SKOL(Raw_Data_Index):
                              'description': self.df[self.description_attribute]
                              })
 
-    def date2MMDDYYYY(self, date: str):
-        if isinstance(date, float):
-            if isnan(date):
-                return ''
-            else: print('stumped', date)
-        if '.' in date:
-            date = date.split('.')[0].strip()
-        formats = ['%a, %d %b %Y %H:%M:%S %Z',
-                   '%Y-%m-%d'
-                   ]
-        dt = None
-        for f in formats:
-            try:
-                dt = datetime.strptime(date, f).strftime('%m/%d/%Y')
-                break
-            except:
-                pass
-        if not dt:
-            print('stumped!', date)
-        return dt
-
     def to_dict(self, idx: int, similarity: float):
         row = self.df.iloc[idx]
         result = self.mk_empty_row()
@@ -0,0 +1,146 @@
+"""
+SQLite document store of rendered search results.
+
+Hydrating a neighbor from its raw source means re-reading the CSV split,
+re-parsing the ``.ann`` file or querying CouchDB, so query latency follows
+the slowest upstream and breaks when a raw file moves.  The index builder
+therefore renders every row's ``to_dict`` record once and stores it, pickled,
+in an SQLite table keyed by the row id of the embeddings index.  Search
+fetches the k records it needs by primary key.
+
+The similarity is per query, so it is filled in at search time.  The
+store records the metadata hash of the index manifest it was built with, so
+a search can refuse a store left behind by another build.
+"""
+import os
+import pickle
+import sqlite3
+from typing import Dict, Iterable, Optional, Tuple
+
+import pandas as pd
+
+BATCH_SIZE = 1000
+# SQLite's default limit on host parameters per statement
+MAX_VARIABLES = 999
+
+
+def render_records(descriptions: pd.DataFrame, sources: Iterable) -> Iterable[Tuple[int, dict]]:
+    """Render the ``to_dict`` record of every indexed row.
+
+    Args:
+        descriptions (pd.DataFrame): The indexed rows, with 'source',
+            'filename' and 'row' columns; their index is the row id
+        sources (Iterable[data.Raw_Data_Index]): The loaded raw sources
+
+    Yields:
+        (int, dict): Row id and record, with 'Similarity' None.  Rows whose
+            source is not among ``sources`` or cannot render are skipped and
+            are hydrated from the raw source at search time.
+    """
+    by_name = {(obj.__class__.__name__, obj.filename): obj for obj in sources}
+    skipped = 0
+    for row_id, source, filename, row in zip(descriptions.index, descriptions.source,
+                                             descriptions.filename, descriptions.row):
+        obj = by_name.get((source, filename))
+        if obj is None:
+            skipped += 1
+            continue
+        try:
+            record = obj.to_dict(row, None)
+        except (KeyError, IndexError, AttributeError, TypeError, ValueError):
+            skipped += 1
+            continue
+        record['Similarity'] = None
+        yield int(row_id), record
+    if skipped:
+        print(f'Document store: {skipped} rows left to raw-source hydration')
+
+
+class DocStore:
+    """Rendered result records keyed by row id.
+
+    Args:
+        path (str): SQLite file
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.connection = sqlite3.connect(f'file:{path}?mode=ro', uri=True,
+                                          check_same_thread=False)
+
+    @classmethod
+    def build(cls, path: str, records: Iterable[Tuple[int, dict]],
+              batch_size: int = BATCH_SIZE, metadata_hash: Optional[str] = None) -> int:
+        """Write a new document store, replacing any existing one.
+
+        The store is written to a temporary file and renamed into place, so
+        readers never see a half-written store.
+
+        Args:
+            path (str): SQLite file
+            records (Iterable[(int, dict)]): Row ids and records
+            batch_size (int): Rows per insert
+            metadata_hash (str, optional): The manifest's metadata hash of the
+                index the row ids belong to
+
+        Returns:
+            int: Number of records written
+        """
+        tmp = f'{path}.tmp'
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        connection = sqlite3.connect(tmp)
+        connection.execute('CREATE TABLE documents (id INTEGER PRIMARY KEY, record BLOB NOT NULL)')
+        connection.execute('CREATE TABLE info (key TEXT PRIMARY KEY, value TEXT)')
+        if metadata_hash is not None:
+            connection.execute('INSERT INTO info VALUES (?, ?)', ('metadata_hash', metadata_hash))
+        n = 0
+        batch = []
+        for row_id, record in records:
+            batch.append((row_id, pickle.dumps(record, protocol=pickle.HIGHEST_PROTOCOL)))
+            if len(batch) >= batch_size:
+                connection.executemany('INSERT INTO documents VALUES (?, ?)', batch)
+                n += len(batch)
+                batch = []
+        if batch:
+            connection.executemany('INSERT INTO documents VALUES (?, ?)', batch)
+            n += len(batch)
+        connection.commit()
+        connection.close()
+        os.replace(tmp, path)
+        return n
+
+    @property
+    def metadata_hash(self) -> Optional[str]:
+        """The metadata hash the store was built for, or None if unknown."""
+        try:
+            found = self.connection.execute(
+                "SELECT value FROM info WHERE key = 'metadata_hash'").fetchone()
+        except sqlite3.OperationalError:
+            # Stores written before the info table
+            return None
+        return None if found is None else found[0]
+
+    def __len__(self) -> int:
+        return self.connection.execute('SELECT COUNT(*) FROM documents').fetchone()[0]
+
+    def get(self, row_id: int) -> Optional[dict]:
+        """The record of one row, or None if the store does not have it."""
+        found = self.connection.execute('SELECT record FROM documents WHERE id = ?',
+                                        (int(row_id),)).fetchone()
+        return None if found is None else pickle.loads(found[0])
+
+    def get_many(self, row_ids: Iterable[int]) -> Dict[int, dict]:
+        """The records of several rows; rows the store lacks are left out."""
+        row_ids = [int(i) for i in row_ids]
+        records = {}
+        for start in range(0, len(row_ids), MAX_VARIABLES):
+            chunk = row_ids[start:start + MAX_VARIABLES]
+            marks = ','.join('?' * len(chunk))
+            for row_id, record in self.connection.execute(
+                    f'SELECT id, record FROM documents WHERE id IN ({marks})', chunk):
+                records[row_id] = pickle.loads(record)
+        return records
+
+    def close(self):
+        self.connection.close()
@@ -0,0 +1,105 @@
+"""
+Local read-through cache of a Redis-hosted index.
+
+Every search against Redis would otherwise download the whole embeddings
+blob, even when the index has not changed since the last run on the host.
+The index builder bumps ``<embedding_name>:version`` with INCR after each
+write.  A reader GETs that small key first and keeps a copy of every index
+key it reads under ``<cache dir>/<server>/<key>.v<version>``.  While the
+version is unchanged, the local copies are used (embeddings in the binary
+wire format are memory-mapped).  Otherwise the keys are downloaded again
+and older copies are removed.
+
+Indexes written before versioning have no version key and are read
+straight from Redis.
+"""
+import hashlib
+import os
+from glob import glob
+from typing import Optional
+from urllib.parse import quote
+
+from .artifacts import artifact_key
+
+
+def default_cache_dir() -> str:
+    """$XDG_CACHE_HOME/dr-drafts, or ~/.cache/dr-drafts."""
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'dr-drafts')
+
+
+def version_key(embedding_name: str) -> str:
+    """Redis key of the version counter of an index."""
+    return artifact_key(embedding_name, 'version')
+
+
+class IndexCache:
+    """Local copies of the Redis keys of one index, valid for one version.
+
+    Args:
+        r (redis.Redis): Client of the server holding the index
+        embedding_name (str): Name of the embedding in Redis
+        cache_dir (str, optional): Cache root (default: ``default_cache_dir()``)
+        server (str): Identifies the Redis server and database, so indexes
+            of the same name on different servers do not share copies
+    """
+
+    def __init__(self, r, embedding_name: str, cache_dir: Optional[str] = None,
+                 server: str = ''):
+        self.r = r
+        self.embedding_name = embedding_name
+        digest = hashlib.sha1(server.encode()).hexdigest()[:12]
+        self.directory = os.path.join(cache_dir or default_cache_dir(), digest)
+        self._version = None
+        self._checked = False
+
+    @property
+    def version(self) -> Optional[int]:
+        """The index version in Redis, read once; None for unversioned indexes."""
+        if not self._checked:
+            value = self.r.get(version_key(self.embedding_name))
+            self._version = None if value is None else int(value)
+            self._checked = True
+        return self._version
+
+    def path(self, key: str, version: int) -> str:
+        """Local copy of a Redis key at an index version."""
+        return os.path.join(self.directory, f'{quote(key, safe="")}.v{version}')
+
+    def local_copy(self, key: str) -> Optional[str]:
+        """Path of an up-to-date local copy of a Redis key of this index.
+
+        The key is downloaded on a miss.  Only call this for versioned
+        indexes (``version`` is not None).
+
+        Returns:
+            str: The local copy, or None if Redis has no such key
+        """
+        path = self.path(key, self.version)
+        if os.path.exists(path):
+            print(f' - Using cached {key} (version {self.version}): {path}')
+            return path
+        # Read the version with the value, so the copy is labelled with
+        # the version it belongs to even if the index was just rebuilt.
+        pipe = self.r.pipeline(transaction=True)
+        pipe.get(version_key(self.embedding_name))
+        pipe.get(key)
+        version, data = pipe.execute()
+        if data is None:
+            return None
+        version = self.version if version is None else int(version)
+        path = self.path(key, version)
+        os.makedirs(self.directory, exist_ok=True)
+        tmp = f'{path}.tmp{os.getpid()}'
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+        for stale in glob(os.path.join(self.directory, f'{quote(key, safe="")}.v*')):
+            # Other versions, not the downloads of concurrent readers
+            if stale != path and stale.rpartition('.v')[2].isdigit():
+                try:
+                    os.remove(stale)
+                except OSError:
+                    pass
+        print(f' - Cached {key} (version {version}, {len(data) / 1e6:.1f} MB): {path}')
+        return path
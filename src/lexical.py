@@ -0,0 +1,170 @@
+"""
+BM25 inverted index over the description column of the embeddings table.
+
+Dense mpnet vectors blur exact morphological terms ("ellipsoid
+basidiospores", "clamp connections") and Latin binomials; a lexical index
+catches them.  The index is stored next to the embeddings as the 'bm25'
+artifact.  Postings are kept in compressed-sparse-row form: one array of
+document ids (the narrowest unsigned dtype that fits the corpus) and one
+array of term frequencies per posting, sliced by a per-term offsets array.
+"""
+from collections import Counter
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+import regex
+
+TOKEN_RE = regex.compile(r"\p{L}[\p{L}\p{M}'-]*\p{L}|\p{L}|\d+(?:\.\d+)?")
+RRF_K = 60
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word and number tokens of a description or query."""
+    if not isinstance(text, str):
+        return []
+    return TOKEN_RE.findall(text.lower())
+
+
+def _doc_id_dtype(n_docs: int):
+    for dtype in (np.uint16, np.uint32):
+        if n_docs <= np.iinfo(dtype).max:
+            return dtype
+    return np.uint64
+
+
+class BM25Index:
+    """Okapi BM25 over a fixed corpus with CSR-compressed postings.
+
+    Args:
+        vocabulary (dict): Term to term id
+        offsets (np.ndarray): Postings of term t are [offsets[t], offsets[t+1])
+        doc_ids (np.ndarray): Document (row position) of each posting
+        term_freqs (np.ndarray): Term frequency of each posting (uint8, clipped)
+        doc_lengths (np.ndarray): Number of tokens in each document
+        k1 (float): Term-frequency saturation
+        b (float): Document-length normalisation
+    """
+
+    def __init__(self, vocabulary: Dict[str, int], offsets: np.ndarray,
+                 doc_ids: np.ndarray, term_freqs: np.ndarray,
+                 doc_lengths: np.ndarray, k1: float = 1.2, b: float = 0.75):
+        self.vocabulary = vocabulary
+        self.offsets = offsets
+        self.doc_ids = doc_ids
+        self.term_freqs = term_freqs
+        self.doc_lengths = doc_lengths
+        self.k1 = k1
+        self.b = b
+
+    @property
+    def n_docs(self) -> int:
+        return len(self.doc_lengths)
+
+    @classmethod
+    def build(cls, descriptions: Iterable[str], k1: float = 1.2, b: float = 0.75) -> 'BM25Index':
+        """Build the index; document ids are positions in ``descriptions``.
+
+        Args:
+            descriptions (Iterable[str]): One description per embeddings row
+
+        Returns:
+            BM25Index: The index
+        """
+        vocabulary: Dict[str, int] = {}
+        term_ids: List[int] = []
+        doc_ids: List[int] = []
+        term_freqs: List[int] = []
+        doc_lengths: List[int] = []
+        for doc, text in enumerate(descriptions):
+            tokens = tokenize(text)
+            doc_lengths.append(len(tokens))
+            for term, tf in Counter(tokens).items():
+                term_ids.append(vocabulary.setdefault(term, len(vocabulary)))
+                doc_ids.append(doc)
+                term_freqs.append(tf)
+        terms = np.asarray(term_ids, dtype=np.int64)
+        docs = np.asarray(doc_ids, dtype=_doc_id_dtype(len(doc_lengths)))
+        # Documents were visited in order, so a stable sort by term keeps
+        # each posting list sorted by document.
+        order = np.argsort(terms, kind='stable')
+        offsets = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(terms, minlength=len(vocabulary)), out=offsets[1:])
+        return cls(vocabulary,
+                   offsets,
+                   docs[order],
+                   np.minimum(np.asarray(term_freqs, dtype=np.int64)[order], 255).astype(np.uint8),
+                   np.asarray(doc_lengths, dtype=np.uint32),
+                   k1, b)
+
+    def postings(self, term: str) -> Tuple[np.ndarray, np.ndarray]:
+        """(document ids, term frequencies) of ``term``; empty if unknown."""
+        t = self.vocabulary.get(term)
+        if t is None:
+            return self.doc_ids[:0], self.term_freqs[:0]
+        start, end = self.offsets[t], self.offsets[t + 1]
+        return self.doc_ids[start:end], self.term_freqs[start:end]
+
+    def scores(self, query: str) -> np.ndarray:
+        """BM25 score of every document for ``query`` (0 where no term matches)."""
+        n_docs = self.n_docs
+        lengths = self.doc_lengths.astype(np.float32)
+        avgdl = max(float(lengths.mean()), 1.0) if n_docs else 1.0
+        docs_parts, weight_parts = [], []
+        for term in set(tokenize(query)):
+            docs, tfs = self.postings(term)
+            if len(docs) == 0:
+                continue
+            idf = np.log1p((n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+            tf = tfs.astype(np.float32)
+            norm = self.k1 * (1.0 - self.b + self.b * lengths[docs] / avgdl)
+            docs_parts.append(docs)
+            weight_parts.append(idf * tf * (self.k1 + 1.0) / (tf + norm))
+        if not docs_parts:
+            return np.zeros(n_docs, dtype=np.float32)
+        return np.bincount(np.concatenate(docs_parts).astype(np.int64),
+                           weights=np.concatenate(weight_parts),
+                           minlength=n_docs).astype(np.float32)
+
+    def top_k(self, query: str, k: int, rows: np.ndarray = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Best ``k`` matching documents for ``query``, best first.
+
+        Args:
+            query (str): The prompt
+            k (int): Maximum number of documents to return
+            rows (np.ndarray, optional): Boolean mask of eligible documents
+
+        Returns:
+            (np.ndarray, np.ndarray): Document positions and their BM25 scores;
+            documents matching no query term are never returned
+        """
+        scores = self.scores(query)
+        if rows is not None:
+            scores[~rows] = 0.0
+        matched = np.flatnonzero(scores > 0)
+        if len(matched) > k:
+            matched = matched[np.argpartition(-scores[matched], k - 1)[:k]]
+        matched = matched[np.argsort(-scores[matched], kind='stable')]
+        return matched, scores[matched]
+
+
+def reciprocal_rank_fusion(*rankings: np.ndarray, k: int = RRF_K) -> Tuple[np.ndarray, np.ndarray]:
+    """Fuse several rankings of document positions with reciprocal-rank fusion.
+
+    Each document scores sum(1 / (k + rank)) over the rankings it appears in
+    (rank starting at 1).
+
+    Args:
+        rankings (np.ndarray): Document positions, best first
+        k (int): RRF damping constant
+
+    Returns:
+        (np.ndarray, np.ndarray): Fused document positions, best first, and scores
+    """
+    rankings = [np.asarray(r, dtype=np.int64) for r in rankings]
+    docs = np.concatenate(rankings) if rankings else np.zeros(0, dtype=np.int64)
+    weights = np.concatenate([1.0 / (k + np.arange(1, len(r) + 1)) for r in rankings]) \
+        if rankings else np.zeros(0)
+    unique, inverse = np.unique(docs, return_inverse=True)
+    fused = np.bincount(inverse, weights=weights, minlength=len(unique))
+    order = np.argsort(-fused, kind='stable')
+    return unique[order], fused[order]
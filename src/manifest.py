@@ -0,0 +1,99 @@
+"""
+Manifest of an embeddings index.
+
+The index builder stores a small 'manifest' artifact next to the
+embeddings: the number of rows per source and per feed, the model, dims
+and dtype of the embeddings, the storage format, the build time, and
+SHA-256 hashes of the embedding matrix and of the metadata.  A search
+reads it before the embeddings, so it can refuse an index encoded with
+another model than the one that encodes prompts, and prints the corpus
+statistics from it rather than scanning the metadata of every row.
+"""
+import hashlib
+from datetime import datetime, timezone
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from .bitmaps import facet_values
+from .build_state import frame_hash
+from . import wire_format
+
+MANIFEST_VERSION = 1
+HASH_BLOCK_ROWS = 8192
+
+
+def matrix_hash(df: pd.DataFrame) -> str:
+    """SHA-256 of the embedding matrix of an index, read block by block."""
+    columns = wire_format.embedding_columns(df)
+    digest = hashlib.sha256()
+    for start in range(0, len(df), HASH_BLOCK_ROWS):
+        block = np.ascontiguousarray(df[columns].iloc[start:start + HASH_BLOCK_ROWS].to_numpy())
+        digest.update(block.tobytes())
+    return digest.hexdigest()
+
+
+def counts(values: pd.Series) -> dict:
+    """Rows per value, most frequent first; missing values count as 'unknown'."""
+    return {str(value): int(n) for value, n in
+            values.fillna('unknown').value_counts(sort=True).items()}
+
+
+def build_manifest(result: pd.DataFrame, model_name: str, precision: str,
+                   storage_format: str, **extra) -> dict:
+    """Describe a built index.
+
+    Args:
+        result (pd.DataFrame): The index, metadata columns and F0 ... Fn
+        model_name (str): Model the embeddings were encoded with
+        precision (str): Encoding precision
+        storage_format (str): How the embeddings are stored
+        **extra: Further JSON-serializable fields
+
+    Returns:
+        dict: The manifest
+    """
+    columns = wire_format.embedding_columns(result)
+    metadata = result.drop(columns=columns)
+    dtype = result[columns[0]].dtype if columns else np.dtype('float32')
+    return {
+        'version': MANIFEST_VERSION,
+        'built': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'model_name': model_name,
+        'precision': precision,
+        'dims': len(columns),
+        'dtype': str(dtype),
+        'storage_format': storage_format,
+        'rows': len(result),
+        'sources': counts(result['source']) if 'source' in result.columns else {},
+        'feeds': counts(facet_values(result, 'feed')) if 'filename' in result.columns else {},
+        'hashes': {'embeddings': matrix_hash(result), 'metadata': frame_hash(metadata)},
+        **extra,
+    }
+
+
+def check_model(manifest: dict, model_name: str):
+    """Refuse an index encoded with another model than prompts are.
+
+    Raises:
+        ValueError: If the manifest names another model
+    """
+    if manifest.get('model_name') != model_name:
+        raise ValueError(f"Index was encoded with {manifest.get('model_name')}, but prompts are "
+                         f"encoded with {model_name}; rebuild the index")
+
+
+def show_manifest(manifest: dict, rows: Optional[int] = None):
+    """Print the corpus statistics of a manifest, like show_data_stats.
+
+    Args:
+        manifest (dict): The index manifest
+        rows (int, optional): Rows actually loaded, when they differ
+    """
+    n = manifest['rows'] if rows is None else rows
+    print(f' - Searching {n} opportunities:')
+    for feed, count in manifest['feeds'].items():
+        print(f'   -- {feed}: {count} opportunities')
+    print(f"   ({manifest['dims']}-dim {manifest['dtype']} {manifest['model_name']} embeddings, "
+          f"built {manifest['built']})")
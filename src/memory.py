@@ -0,0 +1,328 @@
+"""
+Memory accounting for the index build and search pipelines.
+
+Wrap each pipeline stage in ``MemoryTracker.stage(name)`` to record its
+resident set size (RSS) before, after and at its sampled peak.  Optionally
+record tracemalloc snapshots to find the top allocating call sites, and
+enforce a hard memory budget that aborts the run with a clear message
+before the kernel's OOM killer does.
+
+The budget is checked cooperatively: when a stage starts and ends, and at
+every ``MemoryTracker.check()`` that long stages call between batches.
+``MemoryBudgetExceeded`` is raised there, in the thread running the stage.
+A background sampler notices an overrun in between; if no check has
+reported it ``interrupt_after`` seconds later and a stage is running on the
+main thread, it falls back to ``_thread.interrupt_main()``.  That fallback
+only takes effect between bytecodes of the main thread, so it cannot stop a
+long native call and never reaches a stage running on another thread.
+"""
+import _thread
+import os
+import signal
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import List, Optional
+
+try:
+    import resource
+except ImportError:
+    # Windows: no getrusage, so RSS reads as 0 and the budget is not enforced
+    resource = None
+
+TRACEMALLOC_FRAMES = 25
+SIZE_UNITS = {'': 1, 'B': 1,
+              'K': 1024, 'KB': 1024, 'KIB': 1024,
+              'M': 1024 ** 2, 'MB': 1024 ** 2, 'MIB': 1024 ** 2,
+              'G': 1024 ** 3, 'GB': 1024 ** 3, 'GIB': 1024 ** 3,
+              'T': 1024 ** 4, 'TB': 1024 ** 4, 'TIB': 1024 ** 4}
+
+
+class MemoryBudgetExceeded(MemoryError):
+    """Raised when the process RSS goes over the configured budget."""
+
+
+def parse_size(text) -> int:
+    """Parse a human-readable size such as ``24G`` or ``512MiB`` into bytes.
+
+    Args:
+        text (str or int): Size with an optional binary unit suffix
+
+    Returns:
+        int: Size in bytes
+    """
+    if isinstance(text, (int, float)):
+        return int(text)
+    value = text.strip().upper()
+    number = value.rstrip('KMGTIB')
+    unit = value[len(number):]
+    if unit not in SIZE_UNITS or not number:
+        raise ValueError(f"Cannot parse memory size '{text}' (expected e.g. 512M, 24G)")
+    return int(float(number) * SIZE_UNITS[unit])
+
+
+def human_readable_bytes(num: float) -> str:
+    """Convert a number of bytes to a human-readable string e.g. '1.2G'."""
+    for unit in ('B', 'K', 'M', 'G'):
+        if abs(num) < 1024.0:
+            return f'{num:3.1f}{unit}'
+        num /= 1024.0
+    return f'{num:.1f}T'
+
+
+def current_rss_bytes() -> int:
+    """Return the current resident set size of this process in bytes."""
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        # Not Linux: fall back to the high-water mark, the best we have.
+        return peak_rss_bytes()
+
+
+def peak_rss_bytes() -> int:
+    """Return the RSS high-water mark of this process in bytes, 0 if unknown."""
+    if resource is None:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS.
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+class MemoryTracker:
+    """Record RSS and (optionally) Python allocations per pipeline stage.
+
+    Args:
+        budget_bytes (int, optional): Abort with ``MemoryBudgetExceeded``
+            once RSS goes over this many bytes.  None disables the budget.
+        trace_allocations (bool): Record tracemalloc snapshots so the report
+            can list the top allocating call sites of each stage.  Costs
+            noticeable CPU time, so it is off by default.
+        top_n (int): Number of call sites to keep per stage
+        poll_interval (float): Seconds between RSS samples while a stage runs
+        interrupt_after (float): Seconds the sampler waits for a cooperative
+            check to report an overrun before interrupting the main thread
+    """
+
+    def __init__(self, budget_bytes: Optional[int] = None,
+                 trace_allocations: bool = False,
+                 top_n: int = 10,
+                 poll_interval: float = 0.25,
+                 interrupt_after: float = 5.0):
+        self.budget_bytes = budget_bytes
+        self.trace_allocations = trace_allocations
+        self.top_n = top_n
+        self.poll_interval = poll_interval
+        self.interrupt_after = interrupt_after
+        self.stages: List[dict] = []
+        self._active: List[dict] = []
+        self._lock = threading.Lock()
+        self._sampler = None
+        self._stop = threading.Event()
+        self._exceeded = None
+        self._reported = False
+
+    @contextmanager
+    def stage(self, name: str):
+        """Context manager measuring the memory used by one pipeline stage.
+
+        Stages may be nested; each nested stage is reported on its own line.
+
+        Args:
+            name (str): Name shown in the report
+
+        Raises:
+            MemoryBudgetExceeded: If RSS went over the budget during the stage
+        """
+        if self.trace_allocations and not tracemalloc.is_tracing():
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+        rss = current_rss_bytes()
+        record = {'stage': '  ' * len(self._active) + name,
+                  'rss_before': rss,
+                  'rss_peak': rss,
+                  'rss_after': None,
+                  'high_water': None,
+                  'seconds': None,
+                  'top_allocations': [],
+                  'snapshot': tracemalloc.take_snapshot() if self.trace_allocations else None,
+                  'thread': threading.get_ident()}
+        self._check_budget(name, rss)
+        with self._lock:
+            self._active.append(record)
+            self.stages.append(record)
+        self._start_sampler()
+        start = time.perf_counter()
+        try:
+            yield record
+        except KeyboardInterrupt:
+            # The sampler's fallback interrupts the main thread to enforce the budget.
+            if self._exceeded is not None:
+                self._reported = True
+                raise MemoryBudgetExceeded(self._budget_message(*self._exceeded)) from None
+            raise
+        finally:
+            with self._lock:
+                self._active.remove(record)
+            rss = current_rss_bytes()
+            record['seconds'] = time.perf_counter() - start
+            record['rss_after'] = rss
+            record['rss_peak'] = max(record['rss_peak'], rss)
+            record['high_water'] = peak_rss_bytes()
+            record.pop('thread')
+            if record['snapshot'] is not None:
+                record['top_allocations'] = self.top_allocations(record.pop('snapshot'))
+            else:
+                record.pop('snapshot')
+            if not self._active:
+                self._stop_sampler()
+        self._check_budget(name, rss)
+
+    def check(self):
+        """Enforce the budget at a batch boundary of a long stage.
+
+        Cheap enough to call between batches: one read of
+        ``/proc/self/statm``.
+
+        Raises:
+            MemoryBudgetExceeded: If RSS is over the budget now, or the
+                sampler saw it go over since the last check
+        """
+        if not self.budget_bytes:
+            return
+        with self._lock:
+            stage = self._innermost_stage()
+        self._check_budget(stage or 'idle', current_rss_bytes())
+
+    def top_allocations(self, since=None) -> List[tuple]:
+        """Return the top allocating call sites as (location, bytes, count).
+
+        Args:
+            since (tracemalloc.Snapshot, optional): Only count memory allocated
+                after this snapshot.  None reports everything still allocated.
+
+        Returns:
+            List[tuple]: Up to ``top_n`` call sites, largest first
+        """
+        if not tracemalloc.is_tracing():
+            return []
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+        ))
+        if since is None:
+            stats = [(s.traceback, s.size, s.count) for s in snapshot.statistics('lineno')]
+        else:
+            stats = [(s.traceback, s.size_diff, s.count_diff)
+                     for s in snapshot.compare_to(since, 'lineno') if s.size_diff > 0]
+        return [(str(tb[0]), size, count) for tb, size, count in stats[:self.top_n]]
+
+    def report(self):
+        """Print a per-stage memory table and the top allocating call sites."""
+        print('\nMemory by stage (RSS):')
+        print(f'  {"stage":<32} {"before":>8} {"after":>8} {"peak":>8} {"delta":>8} '
+              f'{"hwm":>8} {"secs":>7}')
+        for r in self.stages:
+            if r['rss_after'] is None:
+                continue
+            print(f'  {r["stage"]:<32} '
+                  f'{human_readable_bytes(r["rss_before"]):>8} '
+                  f'{human_readable_bytes(r["rss_after"]):>8} '
+                  f'{human_readable_bytes(r["rss_peak"]):>8} '
+                  f'{human_readable_bytes(r["rss_peak"] - r["rss_before"]):>8} '
+                  f'{human_readable_bytes(r["high_water"]):>8} '
+                  f'{r["seconds"]:7.1f}')
+        for r in self.stages:
+            if r['top_allocations']:
+                print(f'\nTop allocations in {r["stage"].strip()}:')
+                for location, size, count in r['top_allocations']:
+                    print(f'  {human_readable_bytes(size):>8} in {count:>8} blocks  {location}')
+        if self.budget_bytes:
+            print(f'\nMemory budget: {human_readable_bytes(self.budget_bytes)}, '
+                  f'process high-water mark: {human_readable_bytes(peak_rss_bytes())}')
+
+    def install_signal_handler(self, signum: Optional[int] = None):
+        """Print current RSS and top allocations when the process gets ``signum``.
+
+        Lets an operator take a tracemalloc snapshot on demand from another
+        shell (``kill -USR1 <pid>``) while a long build is running.  By
+        default ``SIGUSR1``; does nothing on platforms without it (Windows).
+        """
+        if signum is None:
+            signum = getattr(signal, 'SIGUSR1', None)
+            if signum is None:
+                return
+        def _dump(_signum, _frame):
+            stage = self._active[-1]['stage'].strip() if self._active else 'idle'
+            print(f'\n[memory] stage={stage} rss={human_readable_bytes(current_rss_bytes())} '
+                  f'hwm={human_readable_bytes(peak_rss_bytes())}')
+            for location, size, count in self.top_allocations():
+                print(f'  {human_readable_bytes(size):>8} in {count:>8} blocks  {location}')
+        signal.signal(signum, _dump)
+
+    def _budget_message(self, stage: str, rss: int) -> str:
+        return (f"Memory budget exceeded during stage '{stage}': RSS is "
+                f"{human_readable_bytes(rss)}, budget is "
+                f"{human_readable_bytes(self.budget_bytes)}. Aborting before the "
+                f"kernel OOM killer does; re-run with --trace-allocations to see "
+                f"the top allocating call sites.")
+
+    def _innermost_stage(self) -> Optional[str]:
+        # The innermost stage of the calling thread, as stages may run concurrently
+        thread = threading.get_ident()
+        for record in reversed(self._active):
+            if record.get('thread') == thread:
+                return record['stage'].strip()
+        return None
+
+    def _check_budget(self, stage: str, rss: int):
+        if not self.budget_bytes:
+            return
+        if rss > self.budget_bytes:
+            self._reported = True
+            raise MemoryBudgetExceeded(self._budget_message(stage, rss))
+        if self._exceeded is not None:
+            # RSS went over between checks and may have dropped back since
+            self._reported = True
+            raise MemoryBudgetExceeded(self._budget_message(*self._exceeded))
+
+    def _start_sampler(self):
+        if self._sampler is not None or not self.poll_interval:
+            return
+        self._stop.clear()
+        self._sampler = threading.Thread(target=self._sample, name='memory-sampler',
+                                         daemon=True)
+        self._sampler.start()
+
+    def _stop_sampler(self):
+        if self._sampler is None:
+            return
+        self._stop.set()
+        if self._sampler is not threading.current_thread():
+            self._sampler.join()
+        self._sampler = None
+
+    def _sample(self):
+        while not self._stop.wait(self.poll_interval):
+            rss = current_rss_bytes()
+            with self._lock:
+                for record in self._active:
+                    record['rss_peak'] = max(record['rss_peak'], rss)
+                stage = self._active[-1]['stage'].strip() if self._active else None
+            if self.budget_bytes and rss > self.budget_bytes and self._exceeded is None:
+                self._exceeded = (stage, rss)
+                self._interrupt_if_unreported()
+                return
+
+    def _interrupt_if_unreported(self):
+        # Fallback for stages that do not reach a check in time, e.g. a long
+        # native call; it can only ever stop Python code on the main thread.
+        self._stop.wait(self.interrupt_after)
+        if self._reported or self._stop.is_set():
+            return
+        main = threading.main_thread().ident
+        with self._lock:
+            on_main = any(record.get('thread') == main for record in self._active)
+        if on_main:
+            _thread.interrupt_main()
@@ -0,0 +1,132 @@
+"""
+Near-duplicate detection for descriptions with MinHash and LSH banding.
+
+Reprints, OCR variants and the same species treated across journal volumes
+produce descriptions that are nearly but not exactly identical.  The index
+builder groups them so that each group is embedded once (its
+representative) and the other members are kept as aliases.
+
+Each description is reduced to a set of word shingles, the set to a MinHash
+signature, and the signature is cut into bands.  Descriptions sharing any
+band bucket are candidates; a candidate joins a group only if the Jaccard
+similarity estimated from the full signatures reaches the threshold.
+"""
+import zlib
+from typing import Iterable, List, Tuple
+
+import numpy as np
+
+from .lexical import tokenize
+
+NUM_PERM = 128
+SHINGLE_SIZE = 3
+MERSENNE_PRIME = (1 << 31) - 1
+MAX_HASH = np.uint64(MERSENNE_PRIME)
+
+
+def shingles(text: str, size: int = SHINGLE_SIZE) -> np.ndarray:
+    """32-bit hashes of the word ``size``-grams of ``text``."""
+    tokens = tokenize(text)
+    if len(tokens) < size:
+        grams = [' '.join(tokens)]
+    else:
+        grams = [' '.join(tokens[i:i + size]) for i in range(len(tokens) - size + 1)]
+    return np.unique(np.fromiter((zlib.crc32(g.encode('utf-8')) for g in grams),
+                                 dtype=np.uint64, count=len(grams)))
+
+
+def minhash_signatures(texts: Iterable[str], num_perm: int = NUM_PERM,
+                       shingle_size: int = SHINGLE_SIZE, seed: int = 1) -> np.ndarray:
+    """MinHash signature of every text.
+
+    Args:
+        texts (Iterable[str]): Descriptions
+        num_perm (int): Number of hash permutations (signature length)
+        shingle_size (int): Words per shingle
+        seed (int): Seed for the permutations; signatures are only comparable
+            when built with the same seed
+
+    Returns:
+        np.ndarray: uint32 array of shape (len(texts), num_perm)
+    """
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, MERSENNE_PRIME, num_perm, dtype=np.uint64)[:, None]
+    b = rng.integers(0, MERSENNE_PRIME, num_perm, dtype=np.uint64)[:, None]
+    signatures = []
+    for text in texts:
+        hashes = shingles(text, shingle_size)[None, :]
+        # a < 2**31 and hashes < 2**32, so a * hashes + b fits in uint64.
+        signatures.append(((a * hashes + b) % MAX_HASH).min(axis=1))
+    if not signatures:
+        return np.zeros((0, num_perm), dtype=np.uint32)
+    return np.vstack(signatures).astype(np.uint32)
+
+
+def lsh_bands(threshold: float, num_perm: int = NUM_PERM) -> Tuple[int, int]:
+    """Choose (bands, rows per band) so the LSH S-curve sits below ``threshold``.
+
+    Pairs at the threshold then become candidates with high probability; the
+    exact signature comparison removes the false positives.
+    """
+    best = (num_perm, 1)
+    for rows in range(1, num_perm + 1):
+        if num_perm % rows:
+            continue
+        bands = num_perm // rows
+        if (1.0 / bands) ** (1.0 / rows) <= threshold * 0.9:
+            best = (bands, rows)
+    return best
+
+
+def near_duplicate_representatives(texts: List[str], threshold: float = 0.9,
+                                   num_perm: int = NUM_PERM,
+                                   shingle_size: int = SHINGLE_SIZE) -> np.ndarray:
+    """Group near-identical texts and pick one representative per group.
+
+    The representative is the longest text of its group (the most complete
+    copy, rather than a truncated reprint or OCR fragment).
+
+    Args:
+        texts (List[str]): Descriptions
+        threshold (float): Minimum estimated Jaccard similarity of shingles
+        num_perm (int): MinHash signature length
+        shingle_size (int): Words per shingle
+
+    Returns:
+        np.ndarray: For every text, the position of its group's representative
+            (itself if it has no near duplicates)
+    """
+    texts = list(texts)
+    signatures = minhash_signatures(texts, num_perm, shingle_size)
+    bands, rows = lsh_bands(threshold, num_perm)
+    parent = np.arange(len(texts))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for band in range(bands):
+        buckets = {}
+        block = np.ascontiguousarray(signatures[:, band * rows:(band + 1) * rows])
+        for i in range(len(texts)):
+            first = buckets.setdefault(block[i].tobytes(), i)
+            if first == i:
+                continue
+            root_i, root_first = find(i), find(first)
+            if root_i == root_first:
+                continue
+            if np.mean(signatures[i] == signatures[first]) >= threshold:
+                parent[max(root_i, root_first)] = min(root_i, root_first)
+
+    roots = np.array([find(i) for i in range(len(texts))], dtype=np.int64)
+    lengths = np.array([len(t) if isinstance(t, str) else 0 for t in texts])
+    representatives = np.arange(len(texts))
+    best = {}
+    for i, root in enumerate(roots):
+        if root not in best or lengths[i] > lengths[best[root]]:
+            best[root] = i
+    for i, root in enumerate(roots):
+        representatives[i] = best[root]
+    return representatives
@@ -0,0 +1,174 @@
+"""
+Passage-level vectors of long descriptions.
+
+The encoder reads at most ``max_seq_length`` tokens, so the tail of a long
+SKOL treatment never reaches its embedding.  In passage mode the index
+builder splits every description into windows of at most that many tokens
+and encodes each window.  Windows end on paragraph boundaries where they
+can: those given by a SKOL_TAXA row's ``description_spans``, or else the
+line breaks of the description.  A paragraph longer than a window is split
+between words.
+
+The passage vectors are stored, with the row each passage belongs to, as
+the 'passages' artifact.  Passages are stored in row order, so a row's
+score for a prompt, the best score of any of its passages, is one
+``np.maximum.reduceat`` over the passage scores.
+"""
+from typing import Callable, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .reduction import normalize_rows
+
+# Tokens taken by the encoder's own start and end markers
+SPECIAL_TOKENS = 2
+# Window of all-mpnet-base-v2, whose max_seq_length is 384
+MAX_TOKENS = 384 - SPECIAL_TOKENS
+
+
+def description_units(description: str, spans=None) -> List[str]:
+    """The paragraphs of a description, which passages do not split if they fit.
+
+    Args:
+        description (str): The description
+        spans (list, optional): Its ``description_spans``: paragraph texts,
+            dicts with a 'text' or with 'start' and 'end' offsets into the
+            description, or (start, end) pairs.  Line breaks are used when
+            the spans are missing or do not fit the description.
+
+    Returns:
+        List[str]: The non-blank paragraphs
+    """
+    units = None
+    if isinstance(spans, (list, tuple)) and spans:
+        units = []
+        for span in spans:
+            if isinstance(span, str):
+                units.append(span)
+            elif isinstance(span, dict) and isinstance(span.get('text'), str):
+                units.append(span['text'])
+            else:
+                if isinstance(span, dict):
+                    start, end = span.get('start'), span.get('end')
+                elif isinstance(span, (list, tuple)) and len(span) == 2:
+                    start, end = span
+                else:
+                    start = end = None
+                if not (isinstance(start, int) and isinstance(end, int)
+                        and 0 <= start < end <= len(description)):
+                    units = None
+                    break
+                units.append(description[start:end])
+    if units is None:
+        units = description.splitlines()
+    return [unit.strip() for unit in units if unit.strip()]
+
+
+def token_windows(units: Sequence[str], count_tokens: Callable[[List[str]], List[int]],
+                  max_tokens: int) -> List[str]:
+    """Pack paragraphs into passages of at most ``max_tokens`` tokens.
+
+    Args:
+        units (Sequence[str]): Paragraphs, in order
+        count_tokens (Callable): Token counts of a list of words
+        max_tokens (int): Tokens per passage
+
+    Returns:
+        List[str]: The passages; at least one, which is empty for an
+            empty description
+    """
+    windows = []
+    words: List[str] = []
+    used = 0
+    for unit in units:
+        unit_words = unit.split()
+        counts = count_tokens(unit_words)
+        total = sum(counts)
+        if words and used + total > max_tokens:
+            windows.append(' '.join(words))
+            words, used = [], 0
+        for word, count in zip(unit_words, counts):
+            # Only paragraphs longer than a whole window are split inside
+            if words and used + count > max_tokens:
+                windows.append(' '.join(words))
+                words, used = [], 0
+            words.append(word)
+            used += count
+    if words or not windows:
+        windows.append(' '.join(words))
+    return windows
+
+
+def _one_token_per_word(words: List[str]) -> List[int]:
+    return [1] * len(words)
+
+
+def split_passages(descriptions: Iterable[str], spans: Optional[Iterable] = None,
+                   count_tokens: Callable[[List[str]], List[int]] = None,
+                   max_tokens: int = MAX_TOKENS) -> Tuple[List[str], np.ndarray]:
+    """Split every description into token-bounded passages.
+
+    Args:
+        descriptions (Iterable[str]): One description per index row
+        spans (Iterable, optional): The rows' ``description_spans``
+        count_tokens (Callable): Token counts of a list of words; one token
+            per word when None
+        max_tokens (int): Tokens per passage
+
+    Returns:
+        (List[str], np.ndarray): The passages in row order, and the int32
+            row of each
+    """
+    if count_tokens is None:
+        count_tokens = _one_token_per_word
+    descriptions = list(descriptions)
+    spans = [None] * len(descriptions) if spans is None else list(spans)
+    passages: List[str] = []
+    counts = np.empty(len(descriptions), dtype=np.int64)
+    for row, (description, row_spans) in enumerate(zip(descriptions, spans)):
+        windows = token_windows(description_units(description, row_spans),
+                                count_tokens, max_tokens)
+        passages.extend(windows)
+        counts[row] = len(windows)
+    parents = np.repeat(np.arange(len(descriptions), dtype=np.int32), counts)
+    return passages, parents
+
+
+class PassageIndex:
+    """Unit-length passage vectors and the row each passage belongs to.
+
+    Args:
+        model_name (str): SentenceTransformer model the vectors come from
+        vectors (np.ndarray): float32, one unit-length row per passage
+        parents (np.ndarray): int32 row of each passage, non-decreasing,
+            every row having at least one passage
+    """
+
+    def __init__(self, model_name: str, vectors: np.ndarray, parents: np.ndarray):
+        self.model_name = model_name
+        self.vectors = vectors
+        self.parents = parents
+        self.starts = np.flatnonzero(np.r_[len(parents) > 0, parents[1:] != parents[:-1]])
+
+    def __len__(self) -> int:
+        """Number of index rows."""
+        return len(self.starts)
+
+    @property
+    def n_passages(self) -> int:
+        return len(self.parents)
+
+    @classmethod
+    def build(cls, model_name: str, vectors: np.ndarray, parents: np.ndarray) -> 'PassageIndex':
+        """Keep normalized float32 vectors and int32 parents."""
+        return cls(model_name, normalize_rows(np.asarray(vectors, dtype=np.float32)),
+                   np.asarray(parents, dtype=np.int32))
+
+    def row_scores(self, vector: np.ndarray) -> np.ndarray:
+        """Cosine similarity of every row's best passage to a prompt vector.
+
+        Returns:
+            np.ndarray: float32, one score per index row
+        """
+        query = normalize_rows(np.asarray(vector, dtype=np.float32).reshape(1, -1))[0]
+        return np.maximum.reduceat(self.vectors @ query, self.starts)
@@ -0,0 +1,184 @@
+"""
+Concurrent execution of the get_* data preparation scripts.
+
+Each feed has its own get_* script, and most of them only download and
+split their own feed, so they run concurrently on a bounded pool.  A
+script that needs another's output declares it in a header comment::
+
+    # depends: get_nsf.sh get_grants.sh
+
+and starts only once those scripts succeeded; it is skipped if one of them
+failed.  Output is streamed line by line as it is produced, each line
+prefixed with the script's name.  A script still running after its timeout
+is killed, together with any processes it started.
+"""
+import os
+import re
+import signal
+import subprocess
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, List, Optional, Sequence, Tuple
+
+DEPENDS = re.compile(r'^#\s*depends:\s*(.*)$')
+# Return codes of scripts that did not run to completion
+SKIPPED = -1
+TIMED_OUT = -2
+# Header lines searched for dependency declarations
+HEADER_LINES = 20
+
+_print_lock = threading.Lock()
+
+
+def read_dependencies(script: str) -> List[str]:
+    """Names of the scripts a script declares it depends on."""
+    names = []
+    with open(script, errors='replace') as f:
+        for _, line in zip(range(HEADER_LINES), f):
+            match = DEPENDS.match(line.strip())
+            if match:
+                names.extend(match.group(1).replace(',', ' ').split())
+    return names
+
+
+def dependency_graph(scripts: Sequence[str]) -> Dict[str, List[str]]:
+    """The scripts each script depends on, by path.
+
+    Dependencies on scripts that are not in ``scripts`` are reported and
+    ignored.
+
+    Raises:
+        ValueError: If the dependencies form a cycle
+    """
+    by_name = {os.path.basename(script): script for script in scripts}
+    graph = {}
+    for script in scripts:
+        graph[script] = []
+        for name in read_dependencies(script):
+            if name in by_name:
+                graph[script].append(by_name[name])
+            else:
+                print(f"Warning: {os.path.basename(script)} depends on unknown script {name}")
+    # Depth-first search for a cycle
+    state = {}
+
+    def visit(script, path):
+        if state.get(script) == 'done':
+            return
+        if state.get(script) == 'visiting':
+            cycle = path[path.index(script):] + [script]
+            raise ValueError('Data preparation scripts depend on each other in a cycle: '
+                             + ' -> '.join(os.path.basename(s) for s in cycle))
+        state[script] = 'visiting'
+        for dependency in graph[script]:
+            visit(dependency, path + [script])
+        state[script] = 'done'
+
+    for script in scripts:
+        visit(script, [])
+    return graph
+
+
+def _emit(prefix: str, line: str):
+    with _print_lock:
+        print(f'{prefix}{line}', end='' if line.endswith('\n') else '\n', flush=True)
+
+
+def run_script(command: List[str], timeout: Optional[float] = None) -> Tuple[int, float]:
+    """Run one script, streaming its output with its name as a prefix.
+
+    Args:
+        command (List[str]): The script and its arguments
+        timeout (float, optional): Seconds before the script is killed
+
+    Returns:
+        (int, float): The return code (``TIMED_OUT`` if killed) and the
+            seconds it ran
+    """
+    prefix = f'[{os.path.basename(command[0])}] '
+    start = time.perf_counter()
+    try:
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                   text=True, errors='replace', bufsize=1,
+                                   start_new_session=True)
+    except OSError as e:
+        _emit(prefix, f'Could not start: {e}')
+        return SKIPPED, time.perf_counter() - start
+    _emit(prefix, f'Running: {" ".join(command)}')
+    timed_out = threading.Event()
+
+    def kill():
+        timed_out.set()
+        # The script's children would otherwise keep its output open
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except OSError:
+            process.kill()
+
+    timer = threading.Timer(timeout, kill) if timeout else None
+    if timer is not None:
+        timer.daemon = True
+        timer.start()
+    try:
+        for line in process.stdout:
+            _emit(prefix, line)
+        returncode = process.wait()
+    finally:
+        if timer is not None:
+            timer.cancel()
+        process.stdout.close()
+    duration = time.perf_counter() - start
+    if timed_out.is_set():
+        _emit(prefix, f'Killed after the {timeout:g}s timeout')
+        return TIMED_OUT, duration
+    return returncode, duration
+
+
+def run_scripts(scripts: Sequence[str], args: Sequence[str], workers: int = 4,
+                timeout: Optional[float] = None) -> List[Tuple[str, int, float]]:
+    """Run data preparation scripts concurrently, respecting their dependencies.
+
+    Args:
+        scripts (Sequence[str]): Script paths
+        args (Sequence[str]): Arguments passed to every script
+        workers (int): Scripts run at once
+        timeout (float, optional): Seconds before a script is killed
+
+    Returns:
+        List[Tuple[str, int, float]]: (script, return code, seconds) in the
+            order of ``scripts``; scripts skipped because a dependency
+            failed have return code ``SKIPPED``
+    """
+    graph = dependency_graph(scripts)
+    results = {}
+    pending = list(scripts)
+    running = {}
+    with ThreadPoolExecutor(max_workers=max(1, workers),
+                            thread_name_prefix='prep-script') as pool:
+        while pending or running:
+            for script in list(pending):
+                dependencies = graph[script]
+                failed = [d for d in dependencies if d in results and results[d][0] != 0]
+                if failed:
+                    names = ', '.join(os.path.basename(d) for d in failed)
+                    print(f'Skipping {script}: {names} failed')
+                    results[script] = (SKIPPED, 0.0)
+                    pending.remove(script)
+                elif all(d in results for d in dependencies):
+                    running[pool.submit(run_script, [script, *args], timeout)] = script
+                    pending.remove(script)
+            if not running:
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                script = running.pop(future)
+                try:
+                    returncode, duration = future.result()
+                except Exception as e:
+                    print(f'Unexpected error running {script}: {e}')
+                    returncode, duration = SKIPPED, 0.0
+                results[script] = (returncode, duration)
+                status = 'ok' if returncode == 0 else f'exit code {returncode}'
+                print(f'Finished: {script} ({status}, {duration:.1f}s)')
+    return [(script, *results[script]) for script in scripts]
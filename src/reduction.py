@@ -0,0 +1,232 @@
+"""
+PCA projection of the embeddings for a cheap first-stage search.
+
+The mpnet vectors are 768-wide, but in a corpus as narrow as ours most of
+their variance sits in far fewer directions.  The index builder fits a PCA
+projection to a configurable number of dimensions and stores it, together
+with the projected corpus, as the 'pca' artifact.  A search then scans the
+reduced vectors for the top candidates and rescores only those against the
+full vectors, so the final ranking uses exact cosine similarity.
+
+The axes are those of the uncentered second moment (a truncated SVD), which
+preserves dot products rather than distances from the corpus mean, and the
+projected rows are divided by their full-dimension norms.  A reduced dot
+product with a unit query then approximates the full cosine similarity and
+equals it when no dimension is dropped.
+
+Run ``python -m dr_drafts_mycosearch.reduction EMBEDDINGS_FILE`` to report
+recall@k against dimension; corpus rows serve as the queries.
+"""
+import sys
+import time
+from argparse import ArgumentParser
+from typing import Iterable, Optional
+
+import numpy as np
+import pandas as pd
+
+from . import wire_format
+
+DEFAULT_CANDIDATES = 200
+BLOCK_ROWS = 8192
+
+
+def embedding_matrix(df: pd.DataFrame) -> np.ndarray:
+    """The embedding columns of an index as one float32 matrix."""
+    return df[wire_format.embedding_columns(df)].to_numpy(dtype=np.float32)
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """Rows scaled to unit length; all-zero rows stay zero."""
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def top_positions(matrix: np.ndarray, query: np.ndarray, n: int,
+                  rows: Optional[np.ndarray] = None) -> np.ndarray:
+    """Positions of the ``n`` rows with the largest dot product with a query.
+
+    Args:
+        matrix (np.ndarray): Candidate vectors, one per row
+        query (np.ndarray): The query vector
+        n (int): Number of positions
+        rows (np.ndarray, optional): Boolean mask or positions of the rows
+            to consider; all rows when None
+
+    Returns:
+        np.ndarray: Positions, best first
+    """
+    if rows is None:
+        positions = np.arange(len(matrix))
+        scores = matrix @ query
+    else:
+        positions = np.flatnonzero(rows) if rows.dtype == bool else np.asarray(rows)
+        scores = matrix[positions] @ query
+    if n < len(scores):
+        top = np.argpartition(-scores, n)[:n]
+    else:
+        top = np.arange(len(scores))
+    return positions[top[np.argsort(-scores[top], kind='stable')]]
+
+
+class PCAProjection:
+    """A PCA projection and the projected corpus.
+
+    Args:
+        components (np.ndarray): Principal axes, one per row (dims, dims_in)
+        explained_variance_ratio (np.ndarray): Share of the second moment per axis
+        reduced (np.ndarray): The projected corpus over the full row norms
+    """
+
+    def __init__(self, components: np.ndarray, explained_variance_ratio: np.ndarray,
+                 reduced: np.ndarray):
+        self.components = components
+        self.explained_variance_ratio = explained_variance_ratio
+        self.reduced = reduced
+
+    def __len__(self) -> int:
+        return len(self.reduced)
+
+    @property
+    def dims(self) -> int:
+        return len(self.components)
+
+    @classmethod
+    def fit(cls, matrix: np.ndarray, dims: int, block_rows: int = BLOCK_ROWS) -> 'PCAProjection':
+        """Fit the projection to a corpus and project it.
+
+        The second moment is accumulated block by block, so only one block
+        of the corpus is ever held in float64.
+
+        Args:
+            matrix (np.ndarray): The corpus, rows x dims_in
+            dims (int): Dimensions to keep; at most dims_in
+
+        Returns:
+            PCAProjection: The projection
+        """
+        n, dims_in = matrix.shape
+        if not 0 < dims <= dims_in:
+            raise ValueError(f'PCA dimension must be between 1 and {dims_in}, not {dims}')
+        if n == 0:
+            raise ValueError('Cannot fit a PCA projection to an empty corpus')
+        moment = np.zeros((dims_in, dims_in))
+        for start in range(0, n, block_rows):
+            block = matrix[start:start + block_rows].astype(np.float64)
+            moment += block.T @ block
+        variances, axes = np.linalg.eigh(moment)
+        order = np.argsort(variances)[::-1][:dims]
+        total = variances.sum()
+        projection = cls(axes[:, order].T.astype(np.float32),
+                         variances[order] / total if total > 0 else np.zeros(dims),
+                         np.empty((0, dims), dtype=np.float32))
+        reduced = projection.project(matrix, block_rows)
+        for start in range(0, n, block_rows):
+            norms = np.linalg.norm(matrix[start:start + block_rows].astype(np.float32), axis=1)
+            norms[norms == 0] = 1.0
+            reduced[start:start + block_rows] /= norms[:, None]
+        projection.reduced = reduced
+        return projection
+
+    def project(self, matrix: np.ndarray, block_rows: int = BLOCK_ROWS) -> np.ndarray:
+        """Project rows (or one vector) onto the principal axes.
+
+        Returns:
+            np.ndarray: float32, rows x dims
+        """
+        matrix = np.asarray(matrix).reshape(-1, self.components.shape[1])
+        reduced = np.empty((len(matrix), self.dims), dtype=np.float32)
+        for start in range(0, len(matrix), block_rows):
+            block = matrix[start:start + block_rows].astype(np.float32)
+            reduced[start:start + block_rows] = block @ self.components.T
+        return reduced
+
+    def candidates(self, vector: np.ndarray, n: int, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Positions of the ``n`` rows closest to a vector in the reduced space.
+
+        Args:
+            vector (np.ndarray): A full-dimension query vector
+            n (int): Number of candidates
+            rows (np.ndarray, optional): Boolean mask or positions of the
+                rows to consider; all rows when None
+
+        Returns:
+            np.ndarray: Candidate positions, best first
+        """
+        query = normalize_rows(np.asarray(vector, dtype=np.float32).reshape(1, -1))
+        return top_positions(self.reduced, self.project(query)[0], n, rows)
+
+
+def recall_at_k(matrix: np.ndarray, projection: PCAProjection, queries: np.ndarray,
+                k: int, candidates: int) -> dict:
+    """Recall@k of a reduced first stage, before and after exact rescoring.
+
+    Args:
+        matrix (np.ndarray): The full corpus
+        projection (PCAProjection): Projection fitted to ``matrix``
+        queries (np.ndarray): Query vectors, one per row
+        k (int): Neighbors compared with the exact top k
+        candidates (int): First-stage candidates rescored exactly
+
+    Returns:
+        dict: 'first stage' and 'rescored' recall, and 'seconds' per query
+    """
+    normalized = normalize_rows(matrix.astype(np.float32))
+    first_stage = rescored = 0
+    seconds = 0.0
+    for query in queries:
+        exact = np.argsort(-(normalized @ query), kind='stable')[:k]
+        start = time.perf_counter()
+        pool = projection.candidates(query, candidates)
+        scores = normalized[pool] @ query
+        found = pool[np.argsort(-scores, kind='stable')[:k]]
+        seconds += time.perf_counter() - start
+        first_stage += len(np.intersect1d(exact, pool[:k]))
+        rescored += len(np.intersect1d(exact, found))
+    n = len(queries) * min(k, len(matrix))
+    return {'first stage': first_stage / n, 'rescored': rescored / n,
+            'seconds': seconds / len(queries)}
+
+
+def benchmark(matrix: np.ndarray, dims: Iterable[int], k: int = 10,
+              candidates: int = DEFAULT_CANDIDATES, n_queries: int = 100, seed: int = 0):
+    """Print recall@k against PCA dimension, using corpus rows as queries."""
+    rng = np.random.default_rng(seed)
+    picks = rng.choice(len(matrix), size=min(n_queries, len(matrix)), replace=False)
+    queries = normalize_rows(matrix[picks].astype(np.float32))
+    print(f'{len(queries)} queries over {len(matrix)} rows x {matrix.shape[1]} dims, '
+          f'k={k}, {candidates} candidates rescored')
+    print(f'{"dims":>6} {"variance":>9} {"recall@k":>9} {"rescored":>9} {"ms/query":>9}')
+    for d in dims:
+        projection = PCAProjection.fit(matrix, min(d, matrix.shape[1]))
+        recall = recall_at_k(matrix, projection, queries, k, candidates)
+        print(f'{projection.dims:>6} {projection.explained_variance_ratio.sum():>9.3f} '
+              f'{recall["first stage"]:>9.3f} {recall["rescored"]:>9.3f} '
+              f'{1000 * recall["seconds"]:>9.2f}')
+
+
+def main():
+    """Report recall@k against PCA dimension for a local index."""
+    parser = ArgumentParser(description='Recall@k of PCA-reduced first-stage search')
+    parser.add_argument('embeddings_file', help='Local embeddings file')
+    parser.add_argument('--dims', type=int, nargs='+', default=[32, 64, 128, 256],
+                        help='PCA dimensions to compare (default: 32 64 128 256)')
+    parser.add_argument('-k', type=int, default=10, help='Neighbors (default: 10)')
+    parser.add_argument('--candidates', type=int, default=DEFAULT_CANDIDATES,
+                        help=f'First-stage candidates rescored exactly '
+                             f'(default: {DEFAULT_CANDIDATES})')
+    parser.add_argument('--queries', type=int, default=100,
+                        help='Corpus rows used as queries (default: 100)')
+    args = parser.parse_args()
+
+    if wire_format.sniff(args.embeddings_file):
+        df = wire_format.load(args.embeddings_file)
+    else:
+        df = pd.read_pickle(args.embeddings_file)
+    benchmark(embedding_matrix(df), args.dims, args.k, args.candidates, args.queries)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
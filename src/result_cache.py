@@ -0,0 +1,138 @@
+"""
+Cache of final search results.
+
+The web front end sees the same searches again and again (species names,
+the example prompts), and every one of them otherwise encodes the prompt,
+scans the index and hydrates the neighbors.  ``Experiment.search`` first
+looks up the hydrated result table in a result cache, keyed on the
+normalized prompt, k, the filters, the search settings and the index
+version, and stores it there after a miss.
+
+The index version is the Redis version counter the index builder bumps
+after each write, or the size and mtime of a local embeddings file.  It is
+part of every key, so results of an older index are never served once the
+index changes; a local cache also drops them as soon as it sees a new
+version, and Redis entries expire after their TTL.  Searches of an index
+without a version are not cached.
+"""
+import hashlib
+import json
+import pickle
+import threading
+import unicodedata
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Optional
+
+import pandas as pd
+
+DEFAULT_SIZE = 256
+DEFAULT_TTL = 3600
+KEY_PREFIX = 'dr-drafts:results'
+
+
+def normalize_prompt(prompt: str) -> str:
+    """A prompt in Unicode NFKC with runs of whitespace collapsed.
+
+    Case is kept, as it can change the encoded prompt.
+    """
+    return ' '.join(unicodedata.normalize('NFKC', prompt).split())
+
+
+def result_key(prompt: str, k: int, filters: dict, version: str, **settings) -> str:
+    """Cache key of a search.
+
+    Args:
+        prompt (str): The prompt, normalized here
+        k (int): Number of results
+        filters (dict): Parsed filters, see bitmaps.parse_filters
+        version (str): The index version
+        **settings: Other JSON-serializable settings that change the results
+
+    Returns:
+        str: The version and a SHA-256 of the rest
+    """
+    canonical = json.dumps({'prompt': normalize_prompt(prompt), 'k': k,
+                            'filters': {facet: [negated, sorted(values)]
+                                        for facet, (negated, values) in filters.items()},
+                            'settings': settings}, sort_keys=True)
+    return f'{version}:{hashlib.sha256(canonical.encode("utf-8")).hexdigest()}'
+
+
+class ResultCache(ABC):
+    """Where search results are kept; see LocalResultCache and RedisResultCache."""
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[pd.DataFrame]:
+        """The cached results of a search, or None."""
+
+    @abstractmethod
+    def put(self, key: str, results: pd.DataFrame):
+        """Cache the results of a search."""
+
+
+class LocalResultCache(ResultCache):
+    """The most recently used results, in this process.
+
+    Args:
+        size (int): Searches kept
+    """
+
+    def __init__(self, size: int = DEFAULT_SIZE):
+        if size < 1:
+            raise ValueError(f'Result cache size must be positive, not {size}')
+        self.size = size
+        self.entries = OrderedDict()
+        self.version = None
+        self.lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def _check_version(self, key: str):
+        # Entries of another index version can never be read again
+        version = key.rpartition(':')[0]
+        if version != self.version:
+            self.entries.clear()
+            self.version = version
+
+    def get(self, key: str) -> Optional[pd.DataFrame]:
+        with self.lock:
+            self._check_version(key)
+            results = self.entries.get(key)
+            if results is None:
+                return None
+            self.entries.move_to_end(key)
+            return results.copy()
+
+    def put(self, key: str, results: pd.DataFrame):
+        with self.lock:
+            self._check_version(key)
+            self.entries[key] = results.copy()
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+
+class RedisResultCache(ResultCache):
+    """Results shared by every process using one Redis server, with a TTL.
+
+    Args:
+        r (redis.Redis): The client
+        ttl (int): Seconds an entry is kept
+        prefix (str): Key prefix, e.g. to separate deployments
+    """
+
+    def __init__(self, r, ttl: int = DEFAULT_TTL, prefix: str = KEY_PREFIX):
+        if ttl < 1:
+            raise ValueError(f'Result cache TTL must be positive, not {ttl}')
+        self.r = r
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def get(self, key: str) -> Optional[pd.DataFrame]:
+        data = self.r.get(f'{self.prefix}:{key}')
+        return None if data is None else pickle.loads(data)
+
+    def put(self, key: str, results: pd.DataFrame):
+        self.r.set(f'{self.prefix}:{key}', pickle.dumps(results), ex=self.ttl)
@@ -0,0 +1,238 @@
+"""
+Writers for search results: CSV, Parquet and JSON Lines.
+
+A writer is opened once and then fed one batch of results per query, so a
+systematic review running many queries with large k writes a single file.
+Parquet and JSON Lines keep nested fields such as ``DueDates`` and
+``Contacts`` structured instead of stringifying them.  The Parquet writer
+buffers rows and writes them in large row groups.
+
+Parquet support needs the optional ``pyarrow`` package.
+"""
+import json
+import math
+from abc import ABC, abstractmethod
+from datetime import date, datetime
+from os.path import exists
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+
+from .data import ATTRIBUTES
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+FORMATS = ['csv', 'parquet', 'jsonl']
+EXTENSIONS = {'.csv': 'csv', '.parquet': 'parquet', '.pq': 'parquet',
+              '.jsonl': 'jsonl', '.ndjson': 'jsonl'}
+NESTED_FIELDS = ['DueDates', 'Contacts']
+ROW_GROUP_SIZE = 65536
+
+
+def format_from_filename(output_fn: str, default: str = 'csv') -> str:
+    """Guess the output format from the file extension."""
+    for extension, fmt in EXTENSIONS.items():
+        if output_fn.lower().endswith(extension):
+            return fmt
+    return default
+
+
+def jsonable(value):
+    """Convert a result field into plain JSON types, keeping dicts and lists."""
+    if isinstance(value, dict):
+        return {str(k): jsonable(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple, set, np.ndarray)):
+        return [jsonable(v) for v in value]
+    if isinstance(value, np.generic):
+        value = value.item()
+    if value is None or value is pd.NaT:
+        return None
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (str, int, float, bool)):
+        return value
+    return str(value)
+
+
+class ResultWriter(ABC):
+    """Base class: write batches of results, one batch per query.
+
+    Args:
+        output_fn (str): File to write
+    """
+
+    def __init__(self, output_fn: str):
+        self.output_fn = output_fn
+        self.rows_written = 0
+
+    def write(self, results: pd.DataFrame, prompt: str, qname: str):
+        """Write the results of one query.
+
+        Args:
+            results (pd.DataFrame): The results of the SOTA literature search
+            prompt (str): The prompt that generated these results
+            qname (str): The name of the query
+        """
+        results = results.copy()
+        results['Prompt'] = prompt
+        results['QueryName'] = qname
+        self.write_batch(results)
+        self.rows_written += len(results)
+
+    @abstractmethod
+    def write_batch(self, results: pd.DataFrame):
+        """Write a batch of results that already has its query columns."""
+
+    def close(self):
+        """Flush buffered rows and close the file."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class CsvResultWriter(ResultWriter):
+    """Append results to a CSV file; nested fields are stringified."""
+
+    def write(self, results: pd.DataFrame, prompt: str, qname: str):
+        results = results.copy()
+        results['Eligibility'] = 'See URL'
+        results['ApplicantLocation'] = 'See URL'
+        results['ActivityLocation'] = 'See URL'
+        results['SubmissionDetails'] = 'See URL'
+        super().write(results, prompt, qname)
+
+    def write_batch(self, results: pd.DataFrame):
+        results.to_csv(self.output_fn, index=False, mode='a',
+                       header=not exists(self.output_fn))
+
+
+class JsonLinesResultWriter(ResultWriter):
+    """Append one JSON object per result; nested fields stay objects."""
+
+    def __init__(self, output_fn: str):
+        super().__init__(output_fn)
+        self.file = open(output_fn, 'a', encoding='utf-8')
+
+    def write_batch(self, results: pd.DataFrame):
+        lines = [json.dumps(jsonable(record), ensure_ascii=False)
+                 for record in results.to_dict(orient='records')]
+        if lines:
+            self.file.write('\n'.join(lines) + '\n')
+
+    def close(self):
+        self.file.close()
+
+
+class ParquetResultWriter(ResultWriter):
+    """Write results to a Parquet file in large row groups.
+
+    The schema is fixed so row groups from different queries agree:
+    ``Similarity`` is a double, ``CloseDate`` a timestamp, ``DueDates`` and
+    ``Contacts`` are string-to-string maps, and the remaining standard
+    fields are strings.  Source-specific extra fields go into the ``Extra``
+    map.  Parquet files cannot be appended to, so an existing file is
+    replaced.
+
+    Args:
+        output_fn (str): File to write
+        row_group_size (int): Rows buffered per row group
+    """
+
+    def __init__(self, output_fn: str, row_group_size: int = ROW_GROUP_SIZE):
+        if pyarrow is None:
+            raise ImportError("pyarrow package is required for Parquet output. "
+                              "Install with: pip install pyarrow")
+        super().__init__(output_fn)
+        self.row_group_size = row_group_size
+        self.columns = ATTRIBUTES
+        string_map = pyarrow.map_(pyarrow.string(), pyarrow.string())
+        fields = []
+        for name in self.columns:
+            if name == 'Similarity':
+                fields.append(pyarrow.field(name, pyarrow.float64()))
+            elif name == 'CloseDate':
+                fields.append(pyarrow.field(name, pyarrow.timestamp('us')))
+            elif name in NESTED_FIELDS:
+                fields.append(pyarrow.field(name, string_map))
+            else:
+                fields.append(pyarrow.field(name, pyarrow.string()))
+        fields.append(pyarrow.field('Extra', string_map))
+        self.schema = pyarrow.schema(fields)
+        self.writer = pyarrow.parquet.ParquetWriter(output_fn, self.schema)
+        self.buffer: List[dict] = []
+
+    def write_batch(self, results: pd.DataFrame):
+        self.buffer.extend(results.to_dict(orient='records'))
+        while len(self.buffer) >= self.row_group_size:
+            self._flush(self.buffer[:self.row_group_size])
+            self.buffer = self.buffer[self.row_group_size:]
+
+    def close(self):
+        if self.buffer:
+            self._flush(self.buffer)
+            self.buffer = []
+        self.writer.close()
+
+    def _flush(self, records: List[dict]):
+        columns = {name: [] for name in self.schema.names}
+        for record in records:
+            for name in self.columns:
+                columns[name].append(self._cell(name, record.get(name)))
+            extra = {k: v for k, v in record.items() if k not in self.columns}
+            columns['Extra'].append(self._string_map(extra))
+        table = pyarrow.Table.from_pydict(columns, schema=self.schema)
+        self.writer.write_table(table, row_group_size=len(records))
+
+    def _cell(self, name: str, value):
+        value = jsonable(value)
+        if value is None:
+            return None
+        if name == 'Similarity':
+            return float(value)
+        if name == 'CloseDate':
+            stamp = pd.to_datetime(value, errors='coerce')
+            return None if stamp is pd.NaT else stamp.to_pydatetime()
+        if name in NESTED_FIELDS:
+            return self._string_map(value)
+        return value if isinstance(value, str) else json.dumps(value)
+
+    @staticmethod
+    def _string_map(value) -> Optional[list]:
+        if isinstance(value, list):
+            value = {str(i): v for i, v in enumerate(value)}
+        if not isinstance(value, dict):
+            return None
+        value = jsonable(value)
+        return [(k, v if isinstance(v, str) or v is None else json.dumps(v))
+                for k, v in value.items()]
+
+
+def open_result_writer(output_fn: str, fmt: Optional[str] = None) -> ResultWriter:
+    """Open a writer for ``output_fn``.
+
+    Args:
+        output_fn (str): File to write
+        fmt (str, optional): 'csv', 'parquet' or 'jsonl'; guessed from the
+            file extension when None
+
+    Returns:
+        ResultWriter: Use as a context manager, or call close() when done
+    """
+    fmt = fmt or format_from_filename(output_fn)
+    if fmt == 'csv':
+        return CsvResultWriter(output_fn)
+    if fmt == 'jsonl':
+        return JsonLinesResultWriter(output_fn)
+    if fmt == 'parquet':
+        return ParquetResultWriter(output_fn)
+    raise ValueError(f"Unknown output format '{fmt}', expected one of {FORMATS}")
@@ -0,0 +1,172 @@
+"""
+Top-k cosine scans that never hold the whole matrix or similarity vector.
+
+``similarity_to_prompt`` copies the embedding columns into one matrix and
+scores every row before sorting, so a search needs memory proportional to
+the corpus.  ``blocked_top_k`` instead reads the matrix ``block_rows`` rows
+at a time (from a memory-mapped binary index, only those pages are
+touched), scores the block in float32 and merges it into a buffer of the
+best ``k`` rows seen so far.  Peak memory is O(block_rows + k) whatever the
+size of the index.
+
+``parallel_top_k`` splits the rows into contiguous ranges, runs a blocked
+scan of each on a thread pool (NumPy releases the GIL in the matrix
+products) and merges the partial top-k lists.  The BLAS library's own
+threads are pinned meanwhile, so a scan uses ``workers * blas_threads``
+cores and does not compete with the threads of the process hosting it.
+Pinning needs ``threadpoolctl``; without it the BLAS default applies.
+"""
+import os
+from concurrent.futures import Executor, ThreadPoolExecutor
+from contextlib import nullcontext
+from typing import Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from . import wire_format
+
+try:
+    from threadpoolctl import threadpool_limits
+except ImportError:
+    threadpool_limits = None
+
+BLOCK_ROWS = 8192
+BLAS_THREADS = 1
+
+
+def default_workers() -> int:
+    """Scan threads when none are given: the cores this process may use."""
+    try:
+        return max(1, len(os.sched_getaffinity(0)))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def blas_limits(threads: Optional[int]):
+    """Context pinning the BLAS thread pools to ``threads``; no-op when
+    ``threads`` is None or threadpoolctl is not installed."""
+    if threads is None or threadpool_limits is None:
+        return nullcontext()
+    return threadpool_limits(limits=threads, user_api='blas')
+
+
+def row_ranges(n_rows: int, parts: int):
+    """``parts`` contiguous (start, stop) ranges covering ``n_rows`` rows."""
+    parts = max(1, min(parts, n_rows))
+    return [(part * n_rows // parts, (part + 1) * n_rows // parts) for part in range(parts)]
+
+
+def unit_vector(vector: np.ndarray) -> np.ndarray:
+    """A query vector as flat float32 of unit length (zero stays zero)."""
+    vector = np.asarray(vector, dtype=np.float32).reshape(-1)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def block_scores(block: np.ndarray, vector: np.ndarray) -> np.ndarray:
+    """Cosine similarity of a block of rows to a unit vector, in float32."""
+    block = np.asarray(block, dtype=np.float32)
+    norms = np.linalg.norm(block, axis=1)
+    norms[norms == 0] = 1.0
+    return block @ vector / norms
+
+
+def merge_top_k(scores: np.ndarray, positions: np.ndarray,
+                k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """The k best (score, position) pairs, unordered."""
+    if len(scores) <= k:
+        return scores, positions
+    best = np.argpartition(-scores, k - 1)[:k]
+    return scores[best], positions[best]
+
+
+def rank(scores: np.ndarray, positions: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Positions and scores best first; ties keep row order."""
+    order = np.lexsort((positions, -scores))
+    return positions[order], scores[order]
+
+
+def blocked_top_k(embeddings: pd.DataFrame, vector: np.ndarray, k: int,
+                  rows: Optional[np.ndarray] = None, block_rows: int = BLOCK_ROWS,
+                  start: int = 0, stop: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """The k rows most cosine-similar to a vector, one block of rows at a time.
+
+    Args:
+        embeddings (pd.DataFrame): The index, metadata columns and F0 ... Fn
+        vector (np.ndarray): The encoded prompt
+        k (int): Number of rows
+        rows (np.ndarray, optional): Boolean mask of the rows to consider;
+            all rows when None
+        block_rows (int): Rows read and scored at a time
+        start (int): First row scanned
+        stop (int, optional): Past-the-end row scanned (default: all rows)
+
+    Returns:
+        (np.ndarray, np.ndarray): Row positions and their similarities, best first
+    """
+    if block_rows < 1:
+        raise ValueError(f'block_rows must be positive, not {block_rows}')
+    vector = unit_vector(vector)
+    columns = embeddings.columns.get_indexer(wire_format.embedding_columns(embeddings))
+    stop = len(embeddings) if stop is None else stop
+    best_scores = np.empty(0, dtype=np.float32)
+    best_positions = np.empty(0, dtype=np.int64)
+    if k <= 0:
+        return best_positions, best_scores
+    for begin in range(start, stop, block_rows):
+        end = min(begin + block_rows, stop)
+        positions = np.arange(begin, end)
+        if rows is not None:
+            positions = positions[rows[begin:end]]
+            if len(positions) == 0:
+                continue
+            block = embeddings.iloc[positions, columns].to_numpy(dtype=np.float32)
+        else:
+            block = embeddings.iloc[begin:end, columns].to_numpy(dtype=np.float32)
+        best_scores, best_positions = merge_top_k(
+            np.concatenate([best_scores, block_scores(block, vector)]),
+            np.concatenate([best_positions, positions]), k)
+    return rank(best_scores, best_positions)
+
+
+def parallel_top_k(embeddings: pd.DataFrame, vector: np.ndarray, k: int,
+                   rows: Optional[np.ndarray] = None, workers: Optional[int] = None,
+                   block_rows: int = BLOCK_ROWS, blas_threads: Optional[int] = BLAS_THREADS,
+                   pool: Optional[Executor] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """The k rows most cosine-similar to a vector, scanning row ranges in parallel.
+
+    Args:
+        embeddings (pd.DataFrame): The index, metadata columns and F0 ... Fn
+        vector (np.ndarray): The encoded prompt
+        k (int): Number of rows
+        rows (np.ndarray, optional): Boolean mask of the rows to consider
+        workers (int, optional): Row ranges scanned at once (default: the
+            usable cores)
+        block_rows (int): Rows read and scored at a time by each worker
+        blas_threads (int, optional): BLAS threads per worker during the
+            scan; None leaves the BLAS default
+        pool (Executor, optional): Thread pool to reuse across scans; one
+            with ``workers`` threads is started when None
+
+    Returns:
+        (np.ndarray, np.ndarray): Row positions and their similarities, best first
+    """
+    workers = workers or default_workers()
+    ranges = row_ranges(len(embeddings), workers)
+    if len(ranges) == 1:
+        with blas_limits(blas_threads):
+            return blocked_top_k(embeddings, vector, k, rows, block_rows)
+
+    def scan(bounds):
+        return blocked_top_k(embeddings, vector, k, rows, block_rows, *bounds)
+
+    with blas_limits(blas_threads):
+        if pool is None:
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='scan') as own:
+                partials = list(own.map(scan, ranges))
+        else:
+            partials = list(pool.map(scan, ranges))
+    scores, positions = merge_top_k(np.concatenate([scores for _, scores in partials]),
+                                    np.concatenate([positions for positions, _ in partials]), k)
+    return rank(scores, positions)
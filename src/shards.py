@@ -0,0 +1,353 @@
+"""
+Partitioned indexes searched by scatter-gather.
+
+The index builder can split the embeddings into N contiguous shards, stored
+as the artifacts 'shard0' ... 'shard<N-1>' next to the embeddings, plus a
+'shards' artifact recording their sizes.  Shards keep the global row
+labels, so their results merge directly.
+
+A ShardWorker holds one shard as a normalized float32 matrix and answers
+top-k queries.  Workers run as local processes, or as servers on other
+machines (``dr-drafts-shard-worker``) reached over a
+``multiprocessing.connection`` socket authenticated with the key in
+$DR_DRAFTS_SHARD_KEY.  The ShardCoordinator sends every query to all
+workers, waits up to a per-shard timeout and merges the top-k lists that
+arrived; shards that did not answer are reported in ``missing``.
+
+Messages are tuples; every connection starts with the worker's 'ready':
+    worker -> ('ready', shard, n_rows)
+    coordinator -> ('search', query_id, vector, k, filters)
+    worker -> (query_id, shard, labels, similarities, metadata)
+    coordinator -> ('close',)
+"""
+import multiprocessing
+import os
+import threading
+import time
+from argparse import ArgumentParser
+from multiprocessing.connection import Client, Listener, wait
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .artifacts import read_artifact
+from .bitmaps import filter_mask
+
+DEFAULT_TIMEOUT = 5.0
+DEFAULT_PORT = 6380
+# Neighbors gathered per query, so deduplication still finds k distinct results
+MIN_CANDIDATES = 100
+SHARD_KEY_ENV = 'DR_DRAFTS_SHARD_KEY'
+
+
+def shard_name(shard: int) -> str:
+    """Artifact name of one shard."""
+    return f'shard{shard}'
+
+
+def split_shards(embeddings: pd.DataFrame, n_shards: int) -> List[pd.DataFrame]:
+    """Split the index into ``n_shards`` contiguous, nearly equal parts."""
+    return [embeddings.iloc[positions]
+            for positions in np.array_split(np.arange(len(embeddings)), n_shards)]
+
+
+def shard_key() -> bytes:
+    """Authentication key shared by the coordinator and remote workers."""
+    key = os.environ.get(SHARD_KEY_ENV)
+    if not key:
+        raise ValueError(f'Set ${SHARD_KEY_ENV} to the key shared with the shard workers')
+    return key.encode('utf-8')
+
+
+def parse_address(address: str) -> Tuple[str, int]:
+    """'host:port' (or 'host') as a (host, port) tuple."""
+    host, _, port = address.rpartition(':')
+    if not host:
+        return port, DEFAULT_PORT
+    return host, int(port)
+
+
+class ShardWorker:
+    """Top-k cosine search over one shard.
+
+    Args:
+        shard (int): Shard number
+        embeddings (pd.DataFrame): The shard's rows, metadata and F* columns
+    """
+
+    def __init__(self, shard: int, embeddings: pd.DataFrame):
+        self.shard = shard
+        embedding_cols = [col for col in embeddings.columns if col.startswith('F')]
+        matrix = embeddings[embedding_cols].to_numpy(dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        self.matrix = matrix / norms
+        self.metadata = embeddings.drop(columns=embedding_cols)
+        self.labels = embeddings.index.to_numpy()
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+    def top_k(self, vector: np.ndarray, k: int, filters: Optional[dict] = None):
+        """The shard's k rows most cosine-similar to ``vector``.
+
+        Returns:
+            (np.ndarray, np.ndarray, pd.DataFrame): Labels, similarities and
+                metadata rows, best first
+        """
+        vector = np.asarray(vector, dtype=np.float32).reshape(-1)
+        norm = np.linalg.norm(vector)
+        scores = self.matrix @ (vector / norm if norm else vector)
+        candidates = np.arange(len(scores))
+        if filters:
+            candidates = np.flatnonzero(filter_mask(self.metadata, filters))
+        k = min(k, len(candidates))
+        if k == 0:
+            return self.labels[:0], scores[:0], self.metadata.iloc[:0]
+        top = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return self.labels[top], scores[top], self.metadata.iloc[top]
+
+
+def serve(conn, worker: ShardWorker):
+    """Answer queries on one connection until it closes."""
+    conn.send(('ready', worker.shard, len(worker)))
+    while True:
+        try:
+            message = conn.recv()
+        except EOFError:
+            return
+        if message[0] == 'close':
+            return
+        _, query_id, vector, k, filters = message
+        labels, similarities, metadata = worker.top_k(vector, k, filters)
+        conn.send((query_id, worker.shard, labels, similarities, metadata))
+
+
+def load_shard(shard: int, source: dict) -> ShardWorker:
+    """Read one shard artifact.
+
+    Args:
+        shard (int): Shard number
+        source (dict): Keyword arguments of artifacts.read_artifact locating
+            the index (embeddingsFN, or redis_url and embedding_name, ...)
+    """
+    embeddings = read_artifact(shard_name(shard), **source)
+    if embeddings is None:
+        raise ValueError(f'Index has no {shard_name(shard)}; rebuild it with --shards')
+    return ShardWorker(shard, embeddings)
+
+
+def _local_worker(conn, shard: int, source: dict):
+    serve(conn, load_shard(shard, source))
+
+
+def serve_forever(worker: ShardWorker, address: Tuple[str, int], authkey: bytes):
+    """Serve one shard to any number of coordinators, one thread each."""
+    with Listener(address, authkey=authkey) as listener:
+        print(f'Serving shard {worker.shard} ({len(worker)} rows) on {address[0]}:{address[1]}')
+        while True:
+            conn = listener.accept()
+            threading.Thread(target=serve, args=(conn, worker), daemon=True).start()
+
+
+def handshake(conn) -> Tuple[int, int]:
+    """Wait for a worker's 'ready' message; returns (shard, n_rows)."""
+    _, shard, n_rows = conn.recv()
+    return shard, n_rows
+
+
+class ShardCoordinator:
+    """Scatter queries to shard workers and gather a global top-k.
+
+    Args:
+        workers (list): (connection, shard, n_rows) of every ready worker
+        timeout (float): Seconds to wait for the shards' answers per query
+        processes (list): Local worker processes to stop on close()
+        unreachable (list): Remote workers that could not be reached
+    """
+
+    def __init__(self, workers: list, timeout: float = DEFAULT_TIMEOUT,
+                 processes: Optional[list] = None, unreachable: Optional[List[str]] = None):
+        self.timeout = timeout
+        self.processes = processes or []
+        self.unreachable = unreachable or []
+        self.shards: Dict[int, object] = {shard: conn for conn, shard, _ in workers}
+        self.sizes: Dict[int, int] = {shard: n_rows for _, shard, n_rows in workers}
+        self.query_id = 0
+        self.missing: List[int] = []
+
+    @classmethod
+    def local(cls, n_shards: int, source: dict, timeout: float = DEFAULT_TIMEOUT):
+        """Start one worker process per shard; each reads only its own shard.
+
+        The shards load in parallel; this returns once all of them are ready.
+
+        Args:
+            n_shards (int): Number of shards in the index
+            source (dict): Where the index is, see load_shard
+            timeout (float): Per-query timeout in seconds
+        """
+        context = multiprocessing.get_context('spawn')
+        connections, processes = [], []
+        for shard in range(n_shards):
+            parent, child = context.Pipe()
+            process = context.Process(target=_local_worker, args=(child, shard, source),
+                                      daemon=True)
+            process.start()
+            child.close()
+            connections.append(parent)
+            processes.append(process)
+        workers = []
+        for conn in connections:
+            try:
+                workers.append((conn, *handshake(conn)))
+            except EOFError:
+                for process in processes:
+                    process.terminate()
+                raise ValueError('A shard worker exited before it was ready')
+        return cls(workers, timeout, processes)
+
+    @classmethod
+    def remote(cls, addresses: List[str], timeout: float = DEFAULT_TIMEOUT,
+               authkey: Optional[bytes] = None):
+        """Connect to shard workers serving on other machines.
+
+        Workers that do not complete the handshake within ``timeout`` are
+        left out and listed in ``unreachable``.  Client() itself cannot time
+        out, so each connection is made in a daemon thread.
+
+        Args:
+            addresses (List[str]): 'host:port' of each worker
+            timeout (float): Connect and per-query timeout in seconds
+            authkey (bytes, optional): Shared key (default: $DR_DRAFTS_SHARD_KEY)
+        """
+        authkey = authkey or shard_key()
+        results: Dict[str, tuple] = {}
+
+        def connect(address):
+            try:
+                conn = Client(parse_address(address), authkey=authkey)
+                results[address] = (conn, *handshake(conn))
+            except (OSError, EOFError, multiprocessing.AuthenticationError) as e:
+                print(f'Shard worker {address}: {e}')
+
+        threads = [threading.Thread(target=connect, args=(a,), daemon=True) for a in addresses]
+        for thread in threads:
+            thread.start()
+        deadline = time.monotonic() + timeout
+        for thread in threads:
+            thread.join(max(0.0, deadline - time.monotonic()))
+        ready = dict(results)
+        return cls([ready[a] for a in addresses if a in ready], timeout,
+                   unreachable=[a for a in addresses if a not in ready])
+
+    def __len__(self) -> int:
+        return sum(self.sizes.values())
+
+    def search(self, vector: np.ndarray, k: int, filters: Optional[dict] = None) -> pd.DataFrame:
+        """Global top-k over every shard that answers within the timeout.
+
+        Shards that time out or fail are listed in ``self.missing``; a late
+        answer is discarded when it arrives during a later query.
+
+        Returns:
+            pd.DataFrame: Metadata and 'similarity' of the best k rows,
+                indexed by global row label, best first
+        """
+        self.query_id += 1
+        pending = {}
+        failed = []
+        for shard, conn in self.shards.items():
+            try:
+                conn.send(('search', self.query_id, vector, k, filters))
+                pending[conn] = shard
+            except (OSError, EOFError):
+                failed.append(shard)
+
+        parts = []
+        deadline = time.monotonic() + self.timeout
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            for conn in wait(list(pending), timeout=remaining):
+                try:
+                    query_id, shard, labels, similarities, metadata = conn.recv()
+                except (OSError, EOFError):
+                    failed.append(pending.pop(conn))
+                    continue
+                if query_id != self.query_id:
+                    continue
+                del pending[conn]
+                part = metadata.copy()
+                part['similarity'] = similarities
+                part.index = labels
+                parts.append(part)
+        self.missing = sorted(failed + list(pending.values()))
+
+        if not parts:
+            return pd.DataFrame({'similarity': []})
+        merged = pd.concat(parts)
+        merged.sort_values('similarity', ascending=False, inplace=True, kind='stable')
+        return merged.head(k)
+
+    def close(self):
+        """Disconnect from the workers and stop the local ones."""
+        for conn in self.shards.values():
+            try:
+                conn.send(('close',))
+                conn.close()
+            except (OSError, EOFError):
+                pass
+        for process in self.processes:
+            process.join(timeout=1.0)
+            if process.is_alive():
+                process.terminate()
+
+
+def main():
+    """Entry point for the dr-drafts-shard-worker command."""
+    parser = ArgumentParser(
+        prog='dr-drafts-shard-worker',
+        description='Serve one shard of a partitioned index to dr-drafts --shard-worker'
+    )
+    parser.add_argument('--shard', type=int, required=True,
+                        help='Shard number to serve')
+    parser.add_argument('--embeddings-file', default=None,
+                        help='Local embeddings pickle the shard artifacts sit next to')
+    parser.add_argument('--redis-url', default='redis://localhost:6379',
+                        help='Redis URL, used without --embeddings-file')
+    parser.add_argument('--redis-username', default=None,
+                        help='Redis username')
+    parser.add_argument('--redis-password', default=None,
+                        help='Redis password')
+    parser.add_argument('--redis-db', type=int, default=0,
+                        help='Redis database number (default: 0)')
+    parser.add_argument('--embedding-name', default='skol:embeddings:v0.1',
+                        help='Name of embedding in Redis (default: skol:embeddings:v0.1)')
+    parser.add_argument('--listen', default=f'0.0.0.0:{DEFAULT_PORT}',
+                        help=f'HOST:PORT to listen on (default: 0.0.0.0:{DEFAULT_PORT}); '
+                             f'clients authenticate with ${SHARD_KEY_ENV}')
+    args = parser.parse_args()
+
+    source = dict(embeddingsFN=args.embeddings_file,
+                  redis_url=args.redis_url,
+                  embedding_name=args.embedding_name,
+                  redis_username=args.redis_username,
+                  redis_password=args.redis_password,
+                  redis_db=args.redis_db)
+    try:
+        authkey = shard_key()
+        worker = load_shard(args.shard, source)
+    except ValueError as e:
+        print(f'Error: {e}')
+        return 1
+    serve_forever(worker, parse_address(args.listen), authkey)
+    return 0
+
+
+if __name__ == "__main__":
+    import sys
+    sys.exit(main())
@@ -2,19 +2,37 @@
 Module for the state of the art (SOTA) literature search
 """
 import textwrap
+import numpy as np
 import pandas as pd
 import time
-from os.path import exists
-from os import environ
+from os.path import exists, join
+from os import environ, stat
+from os.path import abspath
 from datetime import datetime
 from dateutil.relativedelta import relativedelta
 from sentence_transformers import SentenceTransformer
 from sklearn.metrics.pairwise import cosine_similarity
 from transformers import pipeline
 from . import data as DATA
+from .artifacts import docstore_path, read_artifact, redis_client, summaries_path
+from .bitmaps import facet_values, filter_mask, parse_filters
+from .docstore import DocStore
+from .index_cache import IndexCache, default_cache_dir, version_key
+from .lexical import reciprocal_rank_fusion
+from .manifest import check_model, counts, show_manifest
+from .memory import MemoryTracker
+from .result_cache import ResultCache, result_key
+from .result_writers import CsvResultWriter, ResultWriter
+from .scan import BLAS_THREADS, blocked_top_k, parallel_top_k
+from .shards import DEFAULT_TIMEOUT, MIN_CANDIDATES, ShardCoordinator
+from .summarize import DRGIST, Summarizer, SummaryCache
+from . import wire_format
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from functools import lru_cache
+from itertools import islice
 import pickle
-from typing import Optional
+from typing import List, Optional
 
 
 environ["TOKENIZERS_PARALLELISM"] = "false"  # parallel GPU throws warning
@@ -35,7 +53,10 @@ TARGET = {'NSF': 'Synopsis',
           'SKOL': 'description',
           }
 DRDRAFT = 'all-mpnet-base-v2'
-DRGIST = 'facebook/bart-large-cnn'
+SEARCH_MODES = ['dense', 'lexical', 'hybrid']
+SIMILARITY_BLOCK_ROWS = 8192
+# Raw data sources kept loaded for hydration, least recently used dropped first
+SOURCE_CACHE_SIZE = 16
 
 
 def results2console(results: pd.DataFrame, print_summary=False):
@@ -43,7 +64,8 @@ def results2console(results: pd.DataFrame, print_summary=False):
 
     Args:
         results (pd.DataFrame): The results of the SOTA literature search
-        print_summary (bool, optional): Defaults to False.
+        print_summary (bool, optional): Show the 'Summary' column, when
+            the results have one, instead of the abstract. Defaults to False.
     """
     show_testometer_banner()
     show_prizes()
@@ -52,8 +74,11 @@ def results2console(results: pd.DataFrame, print_summary=False):
         x = results.iloc[i]
         show_prize_banner(f'{x.Title}', x.Similarity)
         show_one('URL', x['URL'])
-        description = x['Description']
-        show_one('Abstract', description, limit=True)
+        if print_summary and isinstance(x.get('Summary'), str):
+            show_one('Summary', x['Summary'], limit=True)
+        else:
+            description = x['Description']
+            show_one('Abstract', description, limit=True)
         similarity = x['Similarity']
         show_one('Similarity', str(similarity))
 
@@ -67,6 +92,18 @@ def results2csv(results: pd.DataFrame, output_fn: str, prompt: str, qname: str):
         prompt (str): The prompt that generated these results
         qname (str): The name of the query
     """
+    results2file(results, CsvResultWriter(output_fn), prompt, qname)
+
+
+def results2file(results: pd.DataFrame, writer: ResultWriter, prompt: str, qname: str):
+    """ Write the results of the SOTA Literature Search through a result writer
+
+    Args:
+        results (pd.DataFrame): The results of the SOTA Literature Search
+        writer (ResultWriter): Open CSV, Parquet or JSON Lines writer
+        prompt (str): The prompt that generated these results
+        qname (str): The name of the query
+    """
     show_testometer_banner()
     show_prizes()
     print(f'\n*** Dr. Draft\'s ({DRDRAFT}) top {len(results)} picks ***')
@@ -74,14 +111,7 @@ def results2csv(results: pd.DataFrame, output_fn: str, prompt: str, qname: str):
         x = results.iloc[i]
         show_prize_banner(f'{x.Title}', x.Similarity,
                           show_score=True, limit=False)
-    results['Prompt'] = prompt
-    results['QueryName'] = qname
-    results['Eligibility'] = 'See URL'
-    results['ApplicantLocation'] = 'See URL'
-    results['ActivityLocation'] = 'See URL'
-    results['SubmissionDetails'] = 'See URL'
-    results.to_csv(output_fn, index=False, mode='a',
-                   header=not exists(output_fn))
+    writer.write(results, prompt, qname)
 
 
 def show_prize_banner(message: str, prize: float, show_score=False, limit=True):
@@ -146,12 +176,13 @@ def description(ds, nearest_neighbors, i):
     show_one(i, raw_data.df.loc[row].Description)
 
 
-@lru_cache(maxsize=2)
-def _get_model(backend: Optional[str] = None) -> SentenceTransformer:
-    """Load and cache the SentenceTransformer model.
+@lru_cache(maxsize=4)
+def _get_model(backend: Optional[str] = None, model_name: str = DRDRAFT) -> SentenceTransformer:
+    """Load and cache a SentenceTransformer model.
 
     Args:
         backend: "torch", "onnx", or None (defaults to "torch").
+        model_name: The model (default: DRDRAFT)
 
     Returns:
         Cached SentenceTransformer instance.
@@ -168,104 +199,308 @@ def _get_model(backend: Optional[str] = None) -> SentenceTransformer:
             "CPUExecutionProvider",
         ]
     return SentenceTransformer(
-        DRDRAFT,
+        model_name,
         backend=effective_backend,
         model_kwargs=model_kwargs or None,
     )
 
 
-def encode_prompt(prompt, backend=None):
+def encode_prompt(prompt, backend=None, model_name=DRDRAFT):
     """Encode a prompt using the DRDRAFT model.
 
     Args:
         prompt (str): The prompt to encode
         backend (str, optional): "onnx" for ONNX Runtime,
             None for PyTorch (default).
+        model_name (str, optional): Another model, e.g. the first stage
+            of a cascade
 
     Returns:
         Array: Vector representation of the prompt
     """
-    model = _get_model(backend)
+    model = _get_model(backend, model_name)
     return model.encode([prompt])
 
-def read_narrative_embeddings(filename: str):
+def read_narrative_embeddings(filename: str, verify: bool = False):
     """ Read narrative embeddings from a file
 
     Args:
         filename (str): The filename to read
+        verify (bool): Check the matrix checksum of a binary index.  This
+            reads every page of a memory-mapped matrix before the search,
+            so it is off by default (default: False)
 
     Returns:
         Pandas.DataFrame: The narrative embeddings
     """
+    if wire_format.sniff(filename):
+        return wire_format.load(filename, verify=verify)
     return pd.read_pickle(filename)
 
 def read_narrative_embeddings_from_redis(redis_url: str, embedding_name: str,
                                          redis_username: Optional[str] = None,
                                          redis_password: Optional[str] = None,
-                                         redis_db: int = 0):
+                                         redis_db: int = 0,
+                                         cache: Optional[IndexCache] = None,
+                                         verify: bool = False):
     """ Read narrative embeddings from Redis
 
+    A binary index fetched from Redis is in memory anyway, so its checksum
+    is always checked; ``verify`` applies to the cache's local copies.
+
     Args:
         redis_url (str): Redis URL (use rediss:// for TLS)
         embedding_name (str): Name of the embedding in Redis
         redis_username (str, optional): Redis username
         redis_password (str, optional): Redis password
         redis_db (int): Redis database number (default: 0)
+        cache (IndexCache, optional): Read a versioned index through local
+            copies, downloading it only when its version changed
+        verify (bool): Check the checksum of a memory-mapped local copy
 
     Returns:
         Pandas.DataFrame: The narrative embeddings
-
-    Note:
-        For TLS connections, use a rediss:// URL. The system CA certificates
-        will be used for verification.
     """
-    import redis
+    if cache is not None and cache.version is not None:
+        path = cache.local_copy(embedding_name)
+        if path is None:
+            raise ValueError(f"Embedding '{embedding_name}' not found in Redis (db={redis_db})")
+        return read_narrative_embeddings(path, verify)
+    r = redis_client(redis_url, redis_username, redis_password, redis_db)
+
+    data = r.get(embedding_name)
+    if data is None:
+        raise ValueError(f"Embedding '{embedding_name}' not found in Redis (db={redis_db})")
 
-    kwargs = {'db': redis_db}
+    if wire_format.is_wire_format(data):
+        return wire_format.loads(data)
+    return pickle.loads(data)
+
+def similarity_to_prompt(embedded_prompt, embedded_narratives, rows=None):
+    """ Cosine similarity of (a subset of) the narratives to an encoded prompt
+
+    Args:
+        embedded_prompt (numpy.ndarray): The encoded prompt
+        embedded_narratives (pandas.DataFrame): The embedded narratives
+        rows (numpy.ndarray, optional): Boolean mask or positions of the rows
+            to score; all rows are scored when None
 
-    # Add authentication if configured
-    if redis_username:
-        kwargs['username'] = redis_username
-    if redis_password:
-        kwargs['password'] = redis_password
+    Returns:
+        Pandas.DataFrame: Unsorted 'similarity' column indexed like the narratives
+    """
+    if rows is not None:
+        positions = np.flatnonzero(rows) if rows.dtype == bool else rows
+        embedded_narratives = embedded_narratives.iloc[positions]
+    # Select only embedding columns (F0, F1, F2, ...) by name pattern
+    # This allows metadata columns to be present without breaking the computation
+    embedding_cols = [col for col in embedded_narratives.columns if col.startswith('F')]
+    if len(embedded_narratives) == 0:
+        return pd.DataFrame({'similarity': []}, index=embedded_narratives.index)
+    matrix = embedded_narratives[embedding_cols].to_numpy()
+    if matrix.dtype == np.float16:
+        similarity = blockwise_cosine_similarity(matrix, embedded_prompt)
+    else:
+        similarity = [_[0] for _ in
+                      cosine_similarity(matrix, embedded_prompt.reshape(1, -1))]
+    return pd.DataFrame({'similarity': similarity},
+                        index=embedded_narratives.index)
 
-    # Configure TLS if using rediss:// URL
-    if redis_url and redis_url.startswith('rediss://'):
-        kwargs['ssl_ca_certs'] = '/etc/ssl/certs/ca-certificates.crt'
-        # Don't verify hostname (cert is for synoptickeyof.life but we connect to localhost)
-        kwargs['ssl_check_hostname'] = False
 
-    r = redis.from_url(redis_url, **kwargs)
+def blockwise_cosine_similarity(matrix, vector, block_rows=SIMILARITY_BLOCK_ROWS):
+    """ Cosine similarity of the rows of a float16 matrix to a vector
 
-    pickled_data = r.get(embedding_name)
-    if pickled_data is None:
-        raise ValueError(f"Embedding '{embedding_name}' not found in Redis (db={redis_db})")
+    Each block of rows is upcast to float32 on its own, so a compressed
+    index is never held in float32 as a whole.
 
-    return pickle.loads(pickled_data)
+    Args:
+        matrix (numpy.ndarray): rows x dims, float16
+        vector (numpy.ndarray): The encoded prompt
+        block_rows (int): Rows upcast at a time
 
-def sort_by_similarity_to_prompt(prompt, embedded_narratives):
+    Returns:
+        numpy.ndarray: float32 similarity of every row
+    """
+    vector = np.asarray(vector, dtype=np.float32).reshape(-1)
+    vector = vector / (np.linalg.norm(vector) or 1.0)
+    similarity = np.empty(len(matrix), dtype=np.float32)
+    for start in range(0, len(matrix), block_rows):
+        block = matrix[start:start + block_rows].astype(np.float32)
+        norms = np.linalg.norm(block, axis=1)
+        norms[norms == 0] = 1.0
+        similarity[start:start + block_rows] = block @ vector / norms
+    return similarity
+
+
+def sort_by_similarity_to_prompt(prompt, embedded_narratives, rows=None, embedded_prompt=None):
     """ Sort a set of narratives by similarity to a prompt
 
     Args:
         prompt (str): The prompt to compare
         embedded_narratives (pandas.DataFrame): The embedded narratives
+        rows (numpy.ndarray, optional): Boolean mask of the rows to score;
+            all rows are scored when None
+        embedded_prompt (numpy.ndarray, optional): The prompt, already encoded
 
     Returns:
         Pandas.DataFrame: The sorted narratives
     """
-    embedded_prompt = encode_prompt(prompt)
-    # Select only embedding columns (F0, F1, F2, ...) by name pattern
-    # This allows metadata columns to be present without breaking the computation
-    embedding_cols = [col for col in embedded_narratives.columns if col.startswith('F')]
-    similarity = [_[0] for _ in
-                  cosine_similarity(embedded_narratives[embedding_cols],
-                                    embedded_prompt.reshape(1, -1))]
-    result = pd.DataFrame({'similarity': similarity},
-                          index=embedded_narratives.index)
+    if embedded_prompt is None:
+        embedded_prompt = encode_prompt(prompt)
+    result = similarity_to_prompt(embedded_prompt, embedded_narratives, rows)
     result.sort_values('similarity', inplace=True, ascending=False)
     return result
 
 
+def blocked_search(prompt, embedded_narratives, k, rows=None, embedded_prompt=None,
+                   block_rows=SIMILARITY_BLOCK_ROWS, workers=None, blas_threads=BLAS_THREADS,
+                   pool=None):
+    """ The k narratives most similar to a prompt, scanning the matrix block by block
+
+    Unlike sort_by_similarity_to_prompt, neither the embedding matrix nor
+    the similarity of every row is held at once, so memory stays
+    O(block_rows + k) however large the (memory-mapped) index is.  With
+    ``workers``, that many row ranges are scanned on threads at once and
+    their top-k lists merged.
+
+    Args:
+        prompt (str): The prompt to compare
+        embedded_narratives (pandas.DataFrame): The embedded narratives
+        k (int): Number of narratives returned
+        rows (numpy.ndarray, optional): Boolean mask of the rows to rank
+        embedded_prompt (numpy.ndarray, optional): The prompt, already encoded
+        block_rows (int): Rows scored at a time
+        workers (int, optional): Scan threads; one range in this thread when None
+        blas_threads (int, optional): BLAS threads per scan thread while
+            scanning in parallel; None leaves the BLAS default
+        pool (concurrent.futures.Executor, optional): Scan threads to reuse
+
+    Returns:
+        Pandas.DataFrame: The k best 'similarity' values, sorted
+    """
+    if embedded_prompt is None:
+        embedded_prompt = encode_prompt(prompt)
+    if workers:
+        positions, scores = parallel_top_k(embedded_narratives, embedded_prompt, k, rows,
+                                           workers, block_rows, blas_threads, pool)
+    else:
+        positions, scores = blocked_top_k(embedded_narratives, embedded_prompt, k, rows,
+                                          block_rows)
+    return pd.DataFrame({'similarity': scores}, index=embedded_narratives.index[positions])
+
+
+def reduced_search(prompt, embedded_narratives, first_stage, candidates, rows=None,
+                   embedded_prompt=None, first_stage_prompt=None):
+    """ Rank a cheap first stage's candidates by their full cosine similarity
+
+    The first stage is either a PCA projection of the embeddings or the
+    vectors of a smaller model.  It picks ``candidates`` rows; only those
+    are scored against the DRDRAFT embeddings.
+
+    Args:
+        prompt (str): The prompt to compare
+        embedded_narratives (pandas.DataFrame): The embedded narratives
+        first_stage (reduction.PCAProjection or cascade.FirstStage): Covers
+            the same rows
+        candidates (int): Rows rescored against the full vectors
+        rows (numpy.ndarray, optional): Boolean mask of the rows to rank
+        embedded_prompt (numpy.ndarray, optional): The prompt, already encoded
+        first_stage_prompt (numpy.ndarray, optional): The prompt encoded by
+            a cascade.FirstStage's model; a PCA projection uses ``embedded_prompt``
+
+    Returns:
+        Pandas.DataFrame: The candidates, sorted by 'similarity'
+    """
+    if len(first_stage) != len(embedded_narratives):
+        raise ValueError(f'The first stage covers {len(first_stage)} rows but the embeddings '
+                         f'have {len(embedded_narratives)}; rebuild the index')
+    if embedded_prompt is None:
+        embedded_prompt = encode_prompt(prompt)
+    if first_stage_prompt is None:
+        first_stage_prompt = embedded_prompt
+    positions = first_stage.candidates(first_stage_prompt, candidates, rows)
+    result = similarity_to_prompt(embedded_prompt, embedded_narratives, positions)
+    return result.sort_values('similarity', ascending=False, kind='stable')
+
+
+def passage_search(prompt, embedded_narratives, passages, rows=None, embedded_prompt=None):
+    """ Rank narratives by the cosine similarity of their best passage
+
+    Args:
+        prompt (str): The prompt to compare
+        embedded_narratives (pandas.DataFrame): The embedded narratives
+        passages (passages.PassageIndex): Passages of the same rows
+        rows (numpy.ndarray, optional): Boolean mask of the rows to rank
+        embedded_prompt (numpy.ndarray, optional): The prompt, already encoded
+
+    Returns:
+        Pandas.DataFrame: 'similarity' of the best passage, sorted
+    """
+    if len(passages) != len(embedded_narratives):
+        raise ValueError(f'The passages cover {len(passages)} rows but the embeddings '
+                         f'have {len(embedded_narratives)}; rebuild the index')
+    if embedded_prompt is None:
+        embedded_prompt = encode_prompt(prompt)
+    scores = passages.row_scores(embedded_prompt)
+    index = embedded_narratives.index
+    if rows is not None:
+        positions = np.flatnonzero(rows) if rows.dtype == bool else rows
+        scores, index = scores[positions], index[positions]
+    result = pd.DataFrame({'similarity': scores}, index=index)
+    return result.sort_values('similarity', ascending=False, kind='stable')
+
+
+def hybrid_search(prompt, embedded_narratives, bm25, mode='hybrid', rows=None,
+                  candidates=None, embedded_prompt=None):
+    """ Rank narratives by BM25, or by BM25 fused with cosine similarity
+
+    In 'lexical' mode only narratives matching a prompt term are returned.
+    In 'hybrid' mode the BM25 and cosine rankings are combined with
+    reciprocal-rank fusion.  With ``candidates`` set, the BM25 top
+    ``candidates`` are the only rows given a dense score, which avoids a
+    full scan of the embedding matrix; prompts matching fewer rows than that
+    fall back to a full dense scan.
+
+    Args:
+        prompt (str): The prompt to compare
+        embedded_narratives (pandas.DataFrame): The embedded narratives
+        bm25 (lexical.BM25Index): Inverted index over the same rows
+        mode (str): 'lexical' or 'hybrid'
+        rows (numpy.ndarray, optional): Boolean mask of the rows to rank
+        candidates (int, optional): Lexical candidates to rescore densely
+        embedded_prompt (numpy.ndarray, optional): The prompt, already encoded
+
+    Returns:
+        Pandas.DataFrame: 'similarity' (cosine), 'bm25' and fused 'score'
+            columns, sorted by 'score'
+    """
+    if bm25.n_docs != len(embedded_narratives):
+        raise ValueError(f'BM25 index covers {bm25.n_docs} rows but the embeddings have '
+                         f'{len(embedded_narratives)}; rebuild the index')
+    if embedded_prompt is None:
+        embedded_prompt = encode_prompt(prompt)
+    n_lexical = len(embedded_narratives) if mode == 'lexical' or not candidates else candidates
+    lexical, lexical_scores = bm25.top_k(prompt, n_lexical, rows)
+    if mode == 'lexical':
+        ranked, scores = lexical, lexical_scores
+        dense = similarity_to_prompt(embedded_prompt, embedded_narratives, ranked)
+    else:
+        if candidates and len(lexical) >= candidates:
+            dense = similarity_to_prompt(embedded_prompt, embedded_narratives, lexical)
+            dense_order = lexical[np.argsort(-dense.similarity.to_numpy(), kind='stable')]
+        else:
+            dense = similarity_to_prompt(embedded_prompt, embedded_narratives, rows)
+            positions = (np.flatnonzero(rows) if rows is not None
+                         else np.arange(len(embedded_narratives)))
+            dense_order = positions[np.argsort(-dense.similarity.to_numpy(), kind='stable')]
+        ranked, scores = reciprocal_rank_fusion(dense_order, lexical)
+    index = embedded_narratives.index[ranked]
+    bm25_scores = pd.Series(lexical_scores, index=embedded_narratives.index[lexical])
+    return pd.DataFrame({'similarity': dense.similarity.reindex(index).to_numpy(),
+                         'bm25': bm25_scores.reindex(index, fill_value=0.0).to_numpy(),
+                         'score': scores},
+                        index=index)
+
+
 def human_readable_dollars(num: float):
     """Convert a number of dollars to a human-readable string
 
@@ -354,6 +589,9 @@ def show_flags(k: int, prompt: str, output: str, title: str):
 def show_data_stats(ds):
     """Show statistics about the data
 
+    Indexes built with a manifest print these from it instead; see
+    ``manifest.show_manifest``.
+
     Args:
         ds (pd.DataFrame): The data
 
@@ -361,20 +599,37 @@ def show_data_stats(ds):
         None: Prints to console
     """
     print(f' - Searching {len(ds)} opportunities:')
-    feeds = []
-    for source in ds.filename.unique():
-        # Handle None, np.nan, and other non-string values
-        if pd.isna(source) or not isinstance(source, str):
-            feed = 'unknown'
-        else:
-            feed = source.split('_')[0].split('/')[-1]
-        if feed not in feeds:
-            feeds.append(feed)
-    for feed in feeds:
-        if feed == 'unknown':
-            print(f'   -- {feed}: {ds.filename.isna().sum()} opportunities')
-        else:
-            print(f'   -- {feed}: {len(ds[ds.filename.str.contains(feed, na=False)])} opportunities')
+    for feed, count in counts(facet_values(ds, 'feed')).items():
+        print(f'   -- {feed}: {count} opportunities')
+
+
+def results_frame(results: List[dict]) -> pd.DataFrame:
+    """Collect hydrated results into a DataFrame
+
+    Args:
+        results (List[dict]): Results from Experiment.hydrate
+
+    Returns:
+        pd.DataFrame: One row per result, CloseDate parsed
+    """
+    if not results:
+        return pd.DataFrame(columns=DATA.ATTRIBUTES)
+    df = pd.DataFrame(results)
+    df['CloseDate'] = pd.to_datetime(df['CloseDate'])
+    return df
+
+
+def show_filters(filters) -> str:
+    """Render parsed filters back into facet=value expressions
+
+    Args:
+        filters (dict): Parsed filters, see bitmaps.parse_filters
+
+    Returns:
+        str: e.g. 'source=SKOL_TAXA database!=skol_dev'
+    """
+    return ' '.join(f'{facet}{"!=" if negated else "="}{",".join(values)}'
+                    for facet, (negated, values) in filters.items())
 
 
 class Experiment():
@@ -385,7 +640,26 @@ class Experiment():
                  redis_username: Optional[str] = None,
                  redis_password: Optional[str] = None,
                  redis_db: int = 0,
-                 embedding_name: Optional[str] = None):
+                 embedding_name: Optional[str] = None,
+                 memory_tracker: Optional[MemoryTracker] = None,
+                 filters: Optional[List[str]] = None,
+                 search_mode: str = 'dense',
+                 lexical_candidates: Optional[int] = None,
+                 docstoreFN: Optional[str] = None,
+                 sharded: bool = False,
+                 shard_workers: Optional[List[str]] = None,
+                 shard_timeout: float = DEFAULT_TIMEOUT,
+                 pca_candidates: Optional[int] = None,
+                 index_cache_dir: Optional[str] = None,
+                 cascade_candidates: Optional[int] = None,
+                 summarize: bool = False,
+                 summary_cache: Optional[str] = None,
+                 passages: bool = False,
+                 scan_block_rows: Optional[int] = None,
+                 scan_workers: Optional[int] = None,
+                 blas_threads: Optional[int] = BLAS_THREADS,
+                 result_cache: Optional[ResultCache] = None,
+                 verify_index: bool = False):
         self.prompt = prompt
         self.embeddingsFN = embeddingsFN
         self.embeddings = None
@@ -396,8 +670,73 @@ class Experiment():
         self.redis_password = redis_password
         self.redis_db = redis_db
         self.embedding_name = embedding_name
+        self.memory = memory_tracker if memory_tracker is not None else MemoryTracker()
+        self.filters = parse_filters(filters or [])
+        self.bitmaps = None
+        self.selected_rows = None
+        self.search_mode = search_mode
+        self.lexical_candidates = lexical_candidates
+        self.bm25 = None
+        self.aliases = None
+        self.hydrated = {}
+        self.sources = OrderedDict()
+        self.docstoreFN = docstoreFN
+        self.docstore = None
+        self.documents = {}
+        self.sharded = sharded or bool(shard_workers)
+        self.shard_workers = shard_workers
+        self.shard_timeout = shard_timeout
+        self.coordinator = None
+        self.timings = {}
+        self.pca_candidates = pca_candidates
+        self.pca = None
+        self.index_cache_dir = index_cache_dir
+        self.index_cache = None
+        self.manifest = None
+        self.cascade_candidates = cascade_candidates
+        self.first_stage = None
+        self.summarize = summarize
+        self.summary_cache = summary_cache
+        self.summarizer = None
+        self.passages = passages
+        self.passage_index = None
+        self.scan_block_rows = scan_block_rows
+        self.scan_workers = scan_workers
+        self.blas_threads = blas_threads
+        self.scan_pool = None
+        self.embedded_prompt = None
+        self.first_stage_prompt = None
+        self.candidates = None
+        self.missing_shards = set()
+        self.result_cache = result_cache
+        self.verify_index = verify_index
+        self.redis = None
 
         # Validate inputs
+        if search_mode not in SEARCH_MODES:
+            raise ValueError(f"search_mode must be one of {SEARCH_MODES}, not '{search_mode}'")
+        if self.sharded and search_mode != 'dense':
+            raise ValueError("Sharded indexes support search_mode='dense' only")
+        if pca_candidates and (search_mode != 'dense' or self.sharded):
+            raise ValueError("pca_candidates needs search_mode='dense' and an unsharded index")
+        if cascade_candidates and (search_mode != 'dense' or self.sharded or pca_candidates):
+            raise ValueError("cascade_candidates needs search_mode='dense', an unsharded "
+                             "index and no pca_candidates")
+        if passages and (search_mode != 'dense' or self.sharded or pca_candidates
+                         or cascade_candidates):
+            raise ValueError("passages needs search_mode='dense', an unsharded index and "
+                             "no pca_candidates or cascade_candidates")
+        if (scan_block_rows is not None and scan_block_rows < 1) or \
+                (scan_workers is not None and scan_workers < 1):
+            raise ValueError("scan_block_rows and scan_workers must be positive")
+        if (scan_block_rows or scan_workers) and (search_mode != 'dense' or self.sharded
+                                                  or pca_candidates or cascade_candidates
+                                                  or passages):
+            raise ValueError("scan_block_rows and scan_workers need search_mode='dense', an "
+                             "unsharded index and no pca_candidates, cascade_candidates or "
+                             "passages")
+        if shard_workers:
+            return
         if embeddingsFN is None and embedding_name is None:
             raise ValueError("Either embeddingsFN or embedding_name must be provided")
         if embeddingsFN is None and redis_url is None:
@@ -405,25 +744,525 @@ class Experiment():
 
     def run(self):
         """ Run the experiment
+
+        The index is loaded on the first run only, so several prompts can be
+        searched by setting ``prompt`` and calling run() again.  On that
+        first run the model loads and encodes the prompt while the index is
+        fetched.
+        """
+        if self.embeddings is None and self.coordinator is None:
+            embedded_prompt = self.load_concurrently()
+        else:
+            with self.memory.stage('encode prompt'):
+                embedded_prompt = encode_prompt(self.prompt)
+        first_stage_prompt = None
+        if self.first_stage is not None:
+            # A second encoder per query: the cascade saves scan time, not encoding
+            with self.memory.stage('encode prompt (first stage)'):
+                first_stage_prompt = encode_prompt(self.prompt,
+                                                   model_name=self.first_stage.model_name)
+        self.hydrated = {}
+        self.documents = {}
+        self.embedded_prompt = embedded_prompt
+        self.first_stage_prompt = first_stage_prompt
+        self.candidates = None
+        self.missing_shards = set()
+        with self.memory.stage('similarity'):
+            if self.coordinator is not None:
+                self.candidates = max(self.k, MIN_CANDIDATES)
+                self.nearest_neighbors = self.candidate_search(self.candidates)
+                if self.coordinator.missing:
+                    print(f' - Partial results: shards {self.coordinator.missing} did not '
+                          f'answer within {self.shard_timeout}s')
+            elif self.first_stage is not None:
+                self.candidates = max(self.k, self.cascade_candidates)
+                self.nearest_neighbors = self.candidate_search(self.candidates)
+            elif self.passage_index is not None:
+                self.nearest_neighbors = passage_search(
+                    self.prompt, self.embeddings, self.passage_index, self.selected_rows,
+                    embedded_prompt)
+            elif self.pca is not None:
+                self.candidates = max(self.k, self.pca_candidates)
+                self.nearest_neighbors = self.candidate_search(self.candidates)
+            elif self.search_mode == 'dense' and (self.scan_block_rows or self.scan_workers):
+                self.candidates = max(self.k, MIN_CANDIDATES)
+                self.nearest_neighbors = self.candidate_search(self.candidates)
+            elif self.search_mode == 'dense':
+                self.nearest_neighbors = sort_by_similarity_to_prompt(
+                    self.prompt, self.embeddings, self.selected_rows, embedded_prompt)
+            else:
+                self.nearest_neighbors = hybrid_search(
+                    self.prompt, self.embeddings, self.bm25, self.search_mode,
+                    self.selected_rows, self.lexical_candidates, embedded_prompt)
+
+    def candidate_search(self, candidates: int):
+        """ The best ``candidates`` rows of a sharded search, cascade or PCA
+        first stage, or blocked scan, which do not rank every row
+
+        Args:
+            candidates (int): Rows ranked
+
+        Returns:
+            Pandas.DataFrame: Their 'similarity', sorted; from shards, with
+                their metadata
+        """
+        if self.coordinator is not None:
+            found = self.coordinator.search(self.embedded_prompt, candidates, self.filters)
+            # Any query of the search that missed a shard makes its results partial
+            self.missing_shards.update(self.coordinator.missing)
+            return found
+        if self.first_stage is not None:
+            return reduced_search(self.prompt, self.embeddings, self.first_stage, candidates,
+                                  self.selected_rows, self.embedded_prompt,
+                                  self.first_stage_prompt)
+        if self.pca is not None:
+            return reduced_search(self.prompt, self.embeddings, self.pca, candidates,
+                                  self.selected_rows, self.embedded_prompt)
+        if self.scan_workers and self.scan_pool is None:
+            self.scan_pool = ThreadPoolExecutor(max_workers=self.scan_workers,
+                                                thread_name_prefix='scan')
+        return blocked_search(
+            self.prompt, self.embeddings, candidates, self.selected_rows, self.embedded_prompt,
+            self.scan_block_rows or SIMILARITY_BLOCK_ROWS, self.scan_workers,
+            self.blas_threads, self.scan_pool)
+
+    def widen(self) -> bool:
+        """ Rank twice as many candidates, once deduplication used them all up
+
+        Searches that keep only their best candidates can run out of
+        distinct results while unranked rows remain.  Rows already ranked
+        keep their positions, as some may have been yielded, and the wider
+        search only appends the rows it adds.  A shard that missed an
+        earlier query can answer this one, so those rows are not always
+        worse than the ones before them.
+
+        Returns:
+            bool: Whether the search may rank more neighbors
+        """
+        if self.candidates is None or len(self.nearest_neighbors) < self.candidates:
+            # Every row the search could rank is ranked already
+            return False
+        self.candidates *= 2
+        found = self.candidate_search(self.candidates)
+        added = found[~found.index.isin(self.nearest_neighbors.index)]
+        self.nearest_neighbors = pd.concat([self.nearest_neighbors, added])
+        return True
+
+    def search(self, prompt: Optional[str] = None, k: Optional[int] = None,
+               key: Optional[str] = 'Title'):
+        """ Run the experiment and return its top results, through the result cache
+
+        With a ``result_cache``, a search already made against the same
+        index version is answered from the cache without encoding, scanning
+        or hydrating anything.  Partial results of a sharded search are not
+        cached.
+
+        Args:
+            prompt (str, optional): The prompt (default: ``self.prompt``)
+            k (int, optional): Number of results (default: self.k)
+            key (str, optional): Field to deduplicate on; None keeps duplicates
+
+        Returns:
+            Pandas.DataFrame: Up to k results, best first
+        """
+        if prompt is not None:
+            self.prompt = prompt
+        k = k or self.k
+        cache_key = None
+        if self.result_cache is not None:
+            version = self.index_version()
+            if version is not None:
+                cache_key = result_key(self.prompt, k, self.filters, version, key=key,
+                                       **self.search_settings())
+                with self.memory.stage('result cache'):
+                    results = self.result_cache.get(cache_key)
+                if results is not None:
+                    print(' - Results from the result cache')
+                    return results
+        self.run()
+        results = self.top_results(k, key)
+        if cache_key is not None and not self.missing_shards:
+            self.result_cache.put(cache_key, results)
+        return results
+
+    def search_settings(self) -> dict:
+        """ The settings besides prompt, k and filters that change the results
+        """
+        return {'search_mode': self.search_mode,
+                'lexical_candidates': self.lexical_candidates,
+                'pca_candidates': self.pca_candidates,
+                'cascade_candidates': self.cascade_candidates,
+                'passages': self.passages,
+                'blocked_scan': bool(self.scan_block_rows or self.scan_workers),
+                'summarize': self.summarize}
+
+    def index_version(self) -> Optional[str]:
+        """ The version of the searched index, read afresh on every call
+
+        Returns:
+            str: The Redis version counter of the index, or the path, size
+                and mtime of its local file; None for an unversioned index
         """
         if self.embeddingsFN:
-            self.embeddings = read_narrative_embeddings(self.embeddingsFN)
+            try:
+                info = stat(self.embeddingsFN)
+            except FileNotFoundError:
+                return None
+            return f'{abspath(self.embeddingsFN)}@{info.st_size}-{info.st_mtime_ns}'
+        if self.embedding_name and self.redis_url:
+            if self.redis is None:
+                self.redis = redis_client(self.redis_url, self.redis_username,
+                                          self.redis_password, self.redis_db)
+            value = self.redis.get(version_key(self.embedding_name))
+            if value is None:
+                return None
+            return f'{self.redis_url}/{self.redis_db}/{self.embedding_name}@{int(value)}'
+        return None
+
+    def load_concurrently(self):
+        """ Load the index while another thread loads the model and encodes the prompt
+
+        The two slowest cold-start steps are independent: fetching and
+        unpickling the index, and loading the SentenceTransformer.  They
+        join before the similarity step.  The seconds each took, the wall
+        time and the overlap saved are kept in ``self.timings``.
+
+        Returns:
+            numpy.ndarray: The encoded prompt
+        """
+        def encode():
+            start = time.perf_counter()
+            embedded_prompt = encode_prompt(self.prompt)
+            return embedded_prompt, time.perf_counter() - start
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix='encode-prompt') as pool:
+            encoding = pool.submit(encode)
+            self.load()
+            load_seconds = time.perf_counter() - start
+            embedded_prompt, encode_seconds = encoding.result()
+        wall_seconds = time.perf_counter() - start
+        saved = max(0.0, load_seconds + encode_seconds - wall_seconds)
+        self.timings = {'load index': load_seconds,
+                        'load model and encode prompt': encode_seconds,
+                        'startup': wall_seconds,
+                        'overlap saved': saved}
+        print(f' - Startup {wall_seconds:.2f}s: index {load_seconds:.2f}s and model + prompt '
+              f'{encode_seconds:.2f}s ran concurrently, saving {saved:.2f}s')
+        return embedded_prompt
+
+    def load(self):
+        """ Load the embeddings and the artifacts this experiment needs
+        """
+        if not self.sharded and not self.embeddingsFN and self.index_cache_dir:
+            self.index_cache = IndexCache(
+                redis_client(self.redis_url, self.redis_username,
+                             self.redis_password, self.redis_db),
+                self.embedding_name, self.index_cache_dir,
+                server=f'{self.redis_url}/{self.redis_db}')
+        # Refuse an incompatible index before reading any of its rows
+        self.read_manifest()
+        if self.sharded:
+            self.connect_shards()
+            self.open_docstore()
+            return
+        with self.memory.stage('load embeddings'):
+            if self.embeddingsFN:
+                self.embeddings = read_narrative_embeddings(self.embeddingsFN, self.verify_index)
+            else:
+                self.embeddings = read_narrative_embeddings_from_redis(
+                    self.redis_url,
+                    self.embedding_name,
+                    self.redis_username,
+                    self.redis_password,
+                    self.redis_db,
+                    self.index_cache,
+                    self.verify_index
+                )
+        if self.manifest is not None and self.manifest['rows'] == len(self.embeddings):
+            show_manifest(self.manifest)
         else:
-            self.embeddings = read_narrative_embeddings_from_redis(
-                self.redis_url,
-                self.embedding_name,
-                self.redis_username,
-                self.redis_password,
-                self.redis_db
-            )
-        show_data_stats(self.embeddings)
-        self.nearest_neighbors = sort_by_similarity_to_prompt(self.prompt, self.embeddings)
+            if self.manifest is not None:
+                print(f"Warning: index manifest lists {self.manifest['rows']} rows, "
+                      f"but {len(self.embeddings)} were loaded")
+            show_data_stats(self.embeddings)
+        if self.filters:
+            with self.memory.stage('filter rows'):
+                self.bitmaps = self.read_artifact('bitmaps')
+                self.selected_rows = filter_mask(self.embeddings, self.filters, self.bitmaps)
+            print(f' - Filters {show_filters(self.filters)} select '
+                  f'{self.selected_rows.sum()} of {len(self.embeddings)} opportunities')
+        if self.pca_candidates:
+            with self.memory.stage('load pca'):
+                self.pca = self.read_artifact('pca')
+            if self.pca is None:
+                raise ValueError("Index has no PCA projection; rebuild it with --pca-dims N")
+            print(f' - Scanning {self.pca.dims} PCA dimensions, rescoring the top '
+                  f'{self.pca_candidates} candidates')
+        if self.cascade_candidates:
+            with self.memory.stage('load first stage'):
+                self.first_stage = self.read_artifact('first_stage')
+            if self.first_stage is None:
+                raise ValueError("Index has no first-stage vectors; rebuild it with "
+                                 "--first-stage-model")
+            print(f' - Ranking with {self.first_stage.model_name}, reranking the top '
+                  f'{self.cascade_candidates} with {DRDRAFT}')
+        if self.passages:
+            with self.memory.stage('load passages'):
+                self.passage_index = self.read_artifact('passages')
+            if self.passage_index is None:
+                raise ValueError("Index has no passages; rebuild it with --passages")
+            if self.passage_index.model_name != DRDRAFT:
+                raise ValueError(f"Index passages were encoded with "
+                                 f"{self.passage_index.model_name}, not {DRDRAFT}")
+            print(f' - Scoring each opportunity by the best of '
+                  f'{self.passage_index.n_passages} passages')
+        if self.scan_block_rows or self.scan_workers:
+            threads = (f' on {self.scan_workers} threads x {self.blas_threads or "default"} BLAS'
+                       if self.scan_workers else '')
+            print(f' - Scanning {self.scan_block_rows or SIMILARITY_BLOCK_ROWS} rows at a time'
+                  f'{threads}, keeping the best {max(self.k, MIN_CANDIDATES)}')
+        if self.search_mode != 'dense':
+            with self.memory.stage('load bm25'):
+                self.bm25 = self.read_artifact('bm25')
+            if self.bm25 is None:
+                raise ValueError(f"Index has no BM25 artifact; rebuild it to use "
+                                 f"search_mode='{self.search_mode}'")
+        self.open_docstore()
+
+    def connect_shards(self):
+        """ Start local shard workers, or connect to remote ones
+
+        The embeddings are not loaded in this process; each worker holds
+        one shard and the neighbors' metadata comes back with the results.
+        """
+        with self.memory.stage('connect shards'):
+            if self.shard_workers:
+                self.coordinator = ShardCoordinator.remote(self.shard_workers, self.shard_timeout)
+            else:
+                manifest = self.read_artifact('shards')
+                if manifest is None:
+                    raise ValueError("Index has no shards; rebuild it with --shards N")
+                source = dict(embeddingsFN=self.embeddingsFN,
+                              redis_url=self.redis_url,
+                              embedding_name=self.embedding_name,
+                              redis_username=self.redis_username,
+                              redis_password=self.redis_password,
+                              redis_db=self.redis_db)
+                self.coordinator = ShardCoordinator.local(manifest['n_shards'], source,
+                                                          self.shard_timeout)
+        if not self.coordinator.shards:
+            raise ValueError("No shard worker is reachable")
+        print(f' - Searching {len(self.coordinator)} opportunities in '
+              f'{len(self.coordinator.shards)} shards')
+        if self.coordinator.unreachable:
+            print(f' - Partial results: shard workers {self.coordinator.unreachable} '
+                  f'are unreachable')
+
+    def close(self):
+        """ Stop the shard workers and scan threads and close the document store and
+        summary cache
+        """
+        if self.scan_pool is not None:
+            self.scan_pool.shutdown()
+            self.scan_pool = None
+        if self.coordinator is not None:
+            self.coordinator.close()
+            self.coordinator = None
+        if self.docstore is not None:
+            self.docstore.close()
+            self.docstore = None
+        if self.summarizer is not None and self.summarizer.cache is not None:
+            self.summarizer.cache.close()
+            self.summarizer = None
+
+    def open_docstore(self):
+        """ Hydrate from the document store when there is one
+
+        An explicit docstoreFN must exist; the default next to a local
+        embeddings file is used if the index was built with it.  A store
+        built for another index than the manifest describes is refused:
+        an explicit one raises, the default one is ignored.
+        """
+        path = self.docstoreFN
+        if path is None and self.embeddingsFN:
+            path = docstore_path(self.embeddingsFN)
+        if path is None or not exists(path):
+            if self.docstoreFN:
+                raise ValueError(f"Document store '{self.docstoreFN}' not found")
+            return
+        docstore = DocStore(path)
+        expected = (self.manifest or {}).get('hashes', {}).get('metadata')
+        if expected is not None and docstore.metadata_hash not in (None, expected):
+            # Its row ids belong to another build of the index
+            docstore.close()
+            if self.docstoreFN:
+                raise ValueError(f"Document store '{path}' was built for another index")
+            print(f' - Ignoring document store {path}: it was built for another index')
+            return
+        self.docstore = docstore
+        print(f' - Hydrating results from document store {path}')
+
+    def read_manifest(self) -> Optional[dict]:
+        """ Read the index manifest, checking that prompts are encoded with
+        the index's model
+
+        Returns:
+            dict: The manifest, or None for an index built without one
+
+        Raises:
+            ValueError: If the index was encoded with another model
+        """
+        with self.memory.stage('load manifest'):
+            self.manifest = self.read_artifact('manifest')
+        if self.manifest is not None:
+            check_model(self.manifest, DRDRAFT)
+        return self.manifest
+
+    def read_artifact(self, name: str):
+        """ Read an auxiliary index artifact, or None if the index has none
+        """
+        return read_artifact(name, self.embeddingsFN, self.redis_url, self.embedding_name,
+                             self.redis_username, self.redis_password, self.redis_db,
+                             self.index_cache)
 
     def select_results(self, neighbors):
-        df = pd.DataFrame([self.read_neighbor(i) for i in neighbors])
-        df['CloseDate'] = pd.to_datetime(df['CloseDate'])
-        return df
+        # Filters and lexical search can rank fewer rows than were asked for.
+        neighbors = [i for i in neighbors if i < len(self.nearest_neighbors)]
+        with self.memory.stage('hydrate results'):
+            self.prefetch(neighbors)
+            return results_frame([self.hydrate(i) for i in neighbors])
+
+    def iter_results(self, key: Optional[str] = 'Title'):
+        """ Walk the ranked neighbors in order, hydrating each one lazily
+
+        Args:
+            key (str, optional): Skip results whose value for this field was
+                already yielded; None yields every neighbor
+
+        Yields:
+            dict: Hydrated results (see data.Raw_Data_Index.to_dict), best first
+        """
+        seen = set()
+        i = 0
+        while i < len(self.nearest_neighbors) or self.widen():
+            if i % self.k == 0:
+                self.prefetch(range(i, i + self.k))
+            result = self.hydrate(i)
+            i += 1
+            if key is not None:
+                value = result.get(key)
+                marker = value if isinstance(value, str) else repr(value)
+                if marker in seen:
+                    continue
+                seen.add(marker)
+            yield result
+
+    def top_results(self, k: Optional[int] = None, key: Optional[str] = 'Title'):
+        """ The best k results with distinct ``key`` values
+
+        Hydrates neighbors only until k distinct results are found.
+
+        Args:
+            k (int, optional): Number of results (default: self.k)
+            key (str, optional): Field to deduplicate on; None keeps duplicates
+
+        Returns:
+            Pandas.DataFrame: Up to k results, best first
+        """
+        with self.memory.stage('hydrate results'):
+            results = results_frame(list(islice(self.iter_results(key), k or self.k)))
+        if self.summarize and len(results):
+            with self.memory.stage('summarize'):
+                results['Summary'] = self.summaries(results['Description'])
+        return results
+
+    def summaries(self, descriptions):
+        """ Summarize result descriptions with DRGIST in one batch, through the cache
+
+        The cache is ``summary_cache``, else the one the index builder
+        filled next to a local embeddings file, else one in the user's
+        cache directory.
+        """
+        if self.summarizer is None:
+            path = self.summary_cache
+            if path is None and self.embeddingsFN:
+                path = summaries_path(self.embeddingsFN)
+            if path is None:
+                path = join(default_cache_dir(), 'summaries.sqlite')
+            self.summarizer = Summarizer(DRGIST, SummaryCache(path))
+        return self.summarizer.summarize(descriptions)
+
+    def hydrate(self, i):
+        """ Hydrate the i-th neighbor, at most once per search per row label
+        """
+        label = self.nearest_neighbors.index[i]
+        if label not in self.hydrated:
+            self.hydrated[label] = self.read_neighbor(i)
+        return self.hydrated[label]
+
+    def prefetch(self, neighbors):
+        """ Fetch the stored records of several neighbors in one query
+        """
+        if self.docstore is None:
+            return
+        labels = [self.nearest_neighbors.index[i] for i in neighbors
+                  if i < len(self.nearest_neighbors)]
+        labels = [label for label in labels
+                  if label not in self.hydrated and label not in self.documents]
+        found = self.docstore.get_many(labels)
+        self.documents.update({label: found.get(int(label)) for label in labels})
+
+    def stored_record(self, label):
+        """ The rendered record of a row, or None to read the raw source
+        """
+        if self.docstore is None:
+            return None
+        if label not in self.documents:
+            self.documents[label] = self.docstore.get(label)
+        return self.documents[label]
 
     def read_neighbor(self, i):
-        x=self.embeddings.loc[self.nearest_neighbors.index[i]]
-        return getattr(DATA,x.source)(x.filename,TARGET[x.source]).to_dict(x.row,self.nearest_neighbors.iloc[i].similarity)
+        label = self.nearest_neighbors.index[i]
+        # Sharded searches return the neighbors' metadata with their similarity.
+        x = (self.nearest_neighbors if self.embeddings is None else self.embeddings).loc[label]
+        similarity = self.nearest_neighbors.iloc[i].similarity
+        record = self.stored_record(label)
+        if record is not None:
+            result = dict(record)
+            result['Similarity'] = similarity
+        else:
+            result = self.load_source(x.source, x.filename).to_dict(x.row, similarity)
+        if x.get('n_aliases', 0):
+            result['Aliases'] = int(x.n_aliases)
+        return result
+
+    def load_source(self, source: str, filename: str):
+        """ Load a raw data source once, however many neighbors come from it
+
+        Only the ``SOURCE_CACHE_SIZE`` most recently used sources stay
+        loaded, so a long-lived experiment does not keep every CSV or
+        CouchDB frame it ever hydrated from.
+        """
+        key = (source, filename)
+        if key in self.sources:
+            self.sources.move_to_end(key)
+        else:
+            self.sources[key] = getattr(DATA, source)(filename, TARGET[source])
+            while len(self.sources) > SOURCE_CACHE_SIZE:
+                self.sources.popitem(last=False)
+        return self.sources[key]
+
+    def aliases_of(self, i):
+        """ Rows collapsed into the i-th neighbor as near duplicates at build time
+
+        Returns:
+            Pandas.DataFrame: source, filename and row of each alias
+        """
+        if self.aliases is None:
+            self.aliases = self.read_artifact('aliases')
+            if self.aliases is None:
+                self.aliases = pd.DataFrame(columns=['source', 'filename', 'row', 'representative'])
+        label = self.nearest_neighbors.index[i]
+        position = label if self.embeddings is None else self.embeddings.index.get_loc(label)
+        return self.aliases[self.aliases.representative == position]
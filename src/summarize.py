@@ -0,0 +1,188 @@
+"""
+Summaries of result descriptions with the DRGIST model.
+
+Long SKOL descriptions are otherwise only truncated on the console.
+bart-large-cnn is expensive on CPU, so summaries are computed in one
+batched pipeline call per result page.  They are cached persistently in an
+SQLite file, keyed by the SHA-256 of the description and the model name,
+so a description is summarized once per model.  The index builder can fill
+the cache for the whole corpus ahead of time with a pool of processes.
+Descriptions shorter than ``MIN_WORDS`` are their own summary.
+"""
+import hashlib
+import multiprocessing
+import os
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
+
+DRGIST = 'facebook/bart-large-cnn'
+MIN_WORDS = 80
+MAX_LENGTH = 130
+MIN_LENGTH = 30
+CHUNK_SIZE = 32
+# SQLite's default limit on host parameters per statement, less the model
+MAX_VARIABLES = 998
+
+
+def description_hash(text: str) -> str:
+    """Cache key of a description."""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def needs_summary(text) -> bool:
+    """Whether a description is long enough to be worth summarizing."""
+    return isinstance(text, str) and len(text.split()) >= MIN_WORDS
+
+
+class SummaryCache:
+    """Summaries keyed by description hash and model, in an SQLite file.
+
+    Args:
+        path (str): SQLite file, created if missing
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute('CREATE TABLE IF NOT EXISTS summaries (hash TEXT NOT NULL, '
+                                'model TEXT NOT NULL, summary TEXT NOT NULL, '
+                                'PRIMARY KEY (hash, model))')
+
+    def __len__(self) -> int:
+        return self.connection.execute('SELECT COUNT(*) FROM summaries').fetchone()[0]
+
+    def get_many(self, model: str, hashes: Iterable[str]) -> Dict[str, str]:
+        """The cached summaries of several descriptions; misses are left out."""
+        hashes = list(hashes)
+        found = {}
+        for start in range(0, len(hashes), MAX_VARIABLES):
+            chunk = hashes[start:start + MAX_VARIABLES]
+            marks = ','.join('?' * len(chunk))
+            found.update(self.connection.execute(
+                f'SELECT hash, summary FROM summaries WHERE model = ? AND hash IN ({marks})',
+                [model] + chunk))
+        return found
+
+    def put_many(self, model: str, summaries: Iterable[Tuple[str, str]]):
+        """Store (hash, summary) pairs."""
+        self.connection.executemany('INSERT OR REPLACE INTO summaries VALUES (?, ?, ?)',
+                                    [(h, model, summary) for h, summary in summaries])
+        self.connection.commit()
+
+    def close(self):
+        self.connection.close()
+
+
+def load_pipeline(model: str = DRGIST):
+    """The transformers summarization pipeline of a model."""
+    from transformers import pipeline
+    return pipeline('summarization', model=model)
+
+
+def run_pipeline(pipe, texts: List[str]) -> List[str]:
+    """Summarize several descriptions in one batched pipeline call."""
+    outputs = pipe(texts, batch_size=len(texts), truncation=True,
+                   max_length=MAX_LENGTH, min_length=MIN_LENGTH)
+    return [output['summary_text'] for output in outputs]
+
+
+class Summarizer:
+    """Batched, cached summaries of descriptions.
+
+    Args:
+        model (str): Summarization model (default: DRGIST)
+        cache (SummaryCache, optional): Persistent cache; summaries are only
+            kept for the Summarizer's lifetime when None
+    """
+
+    def __init__(self, model: str = DRGIST, cache: Optional[SummaryCache] = None):
+        self.model = model
+        self.cache = cache
+        self.pipe = None
+        self.memo = {}
+
+    def summarize(self, texts: Iterable[str]) -> List[str]:
+        """Summaries of several descriptions, with at most one model call.
+
+        Args:
+            texts (Iterable[str]): Descriptions; short or missing ones are
+                returned unchanged
+
+        Returns:
+            List[str]: One summary per description
+        """
+        texts = list(texts)
+        keys = [description_hash(text) if needs_summary(text) else None for text in texts]
+        wanted = {key for key in keys if key is not None and key not in self.memo}
+        if self.cache is not None and wanted:
+            self.memo.update(self.cache.get_many(self.model, wanted))
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key is not None and key not in self.memo:
+                missing[key] = text
+        if missing:
+            if self.pipe is None:
+                self.pipe = load_pipeline(self.model)
+            summaries = dict(zip(missing, run_pipeline(self.pipe, list(missing.values()))))
+            self.memo.update(summaries)
+            if self.cache is not None:
+                self.cache.put_many(self.model, summaries.items())
+        return [text if key is None else self.memo[key] for key, text in zip(keys, texts)]
+
+
+_worker_pipe = None
+
+
+def _start_worker(model: str):
+    global _worker_pipe
+    _worker_pipe = load_pipeline(model)
+
+
+def _summarize_chunk(texts: List[str]) -> List[str]:
+    return run_pipeline(_worker_pipe, texts)
+
+
+def precompute(texts: Iterable[str], cache: SummaryCache, model: str = DRGIST,
+               processes: int = 2, chunk_size: int = CHUNK_SIZE) -> int:
+    """Summarize every long description not yet in the cache.
+
+    Each worker process loads the model once and summarizes chunks of
+    ``chunk_size`` descriptions; the parent writes the results.
+
+    Args:
+        texts (Iterable[str]): The corpus descriptions
+        cache (SummaryCache): Cache to fill
+        model (str): Summarization model
+        processes (int): Worker processes; 1 summarizes in this process
+
+    Returns:
+        int: Number of summaries computed
+    """
+    pending = {}
+    for text in texts:
+        if needs_summary(text):
+            pending.setdefault(description_hash(text), text)
+    for key in cache.get_many(model, pending):
+        del pending[key]
+    keys = list(pending)
+    chunks = [keys[start:start + chunk_size] for start in range(0, len(keys), chunk_size)]
+    print(f'Summaries: {len(keys)} descriptions to summarize with {model}')
+    if not chunks:
+        return 0
+    texts_of = ([pending[key] for key in chunk] for chunk in chunks)
+    if processes <= 1:
+        pipe = load_pipeline(model)
+        results = (run_pipeline(pipe, chunk) for chunk in texts_of)
+        for chunk, summaries in zip(chunks, results):
+            cache.put_many(model, zip(chunk, summaries))
+        return len(keys)
+    with ProcessPoolExecutor(max_workers=processes,
+                             mp_context=multiprocessing.get_context('spawn'),
+                             initializer=_start_worker, initargs=(model,)) as pool:
+        for chunk, summaries in zip(chunks, pool.map(_summarize_chunk, texts_of)):
+            cache.put_many(model, zip(chunk, summaries))
+    return len(keys)
@@ -0,0 +1,78 @@
+"""Tests for metadata bitmaps and filter expressions."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from . import bitmaps
+
+
+def _table():
+    return pd.DataFrame({
+        'source': ['SKOL_TAXA', 'SKOL_TAXA', 'SKOL', 'SKOL_COLLECTIONS', 'SKOL_TAXA'],
+        'filename': ['https://a', 'couchdb://skol_taxa_full', 'index/SKOL_S_Vol054_n1.txt.ann',
+                     'couchdb://skol_collections_dev', 'https://b'],
+        'row': [0, 1, 0, 0, 2],
+        'ingest': [{'db_name': 'skol_taxa_dev', 'url': 'https://a'}, None, None, None,
+                   {'db_name': 'skol_taxa_dev', 'url': 'https://b'}],
+        'owner': [None, None, None, {'username': 'piggy'}, None],
+        'F0': [0.1, 0.2, 0.3, 0.4, 0.5],
+    })
+
+
+class TestParseFilters:
+    """facet=value[,value] and facet!=value expressions."""
+
+    def test_values_are_split_and_merged(self):
+        filters = bitmaps.parse_filters(['source=SKOL_TAXA,SKOL', 'source=SKOL_COLLECTIONS',
+                                         'database=skol_taxa_dev'])
+        assert filters == {'source': (False, ['SKOL_TAXA', 'SKOL', 'SKOL_COLLECTIONS']),
+                           'database': (False, ['skol_taxa_dev'])}
+
+    def test_negation(self):
+        assert bitmaps.parse_filters(['feed!=SKOL']) == {'feed': (True, ['SKOL'])}
+
+    @pytest.mark.parametrize('expression', ['source', 'source=', '=SKOL'])
+    def test_malformed(self, expression):
+        with pytest.raises(ValueError):
+            bitmaps.parse_filters([expression])
+
+
+class TestBitmapIndex:
+    """Bitmaps built at index time agree with a column scan."""
+
+    def test_derived_facets(self):
+        df = _table()
+        assert list(bitmaps.facet_values(df, 'database')) == [
+            'skol_taxa_dev', 'skol_taxa_full', None, 'skol_collections_dev', 'skol_taxa_dev']
+        assert bitmaps.facet_values(df, 'feed')[2] == 'SKOL'
+        assert bitmaps.facet_values(df, 'owner')[3] == 'piggy'
+
+    def test_counts(self):
+        index = bitmaps.BitmapIndex.build(_table())
+        assert index.counts('source') == {'SKOL_TAXA': 3, 'SKOL': 1, 'SKOL_COLLECTIONS': 1}
+
+    def test_high_cardinality_facets_are_skipped(self):
+        index = bitmaps.BitmapIndex.build(_table(), max_cardinality=3)
+        assert 'source' in index.bitmaps
+        assert 'filename' not in index.bitmaps
+
+    @pytest.mark.parametrize('expressions, expected', [
+        (['source=SKOL_TAXA'], [True, True, False, False, True]),
+        (['source=SKOL_TAXA', 'database=skol_taxa_dev'], [True, False, False, False, True]),
+        (['source=SKOL,SKOL_COLLECTIONS'], [False, False, True, True, False]),
+        (['source!=SKOL_TAXA'], [False, False, True, True, False]),
+        (['owner=piggy'], [False, False, False, True, False]),
+        (['row=0'], [True, False, True, True, False]),
+        (['source=NOPE'], [False] * 5),
+    ])
+    def test_filter_mask_matches_scan(self, expressions, expected):
+        df = _table()
+        filters = bitmaps.parse_filters(expressions)
+        index = bitmaps.BitmapIndex.build(df)
+        np.testing.assert_array_equal(bitmaps.filter_mask(df, filters, index), expected)
+        np.testing.assert_array_equal(bitmaps.filter_mask(df, filters), expected)
+
+    def test_unknown_facet(self):
+        with pytest.raises(KeyError):
+            bitmaps.filter_mask(_table(), bitmaps.parse_filters(['colour=red']))
@@ -0,0 +1,60 @@
+"""Tests for build shards encoded on several hosts."""
+
+import pytest
+
+from .build_shards import check_manifests, parse_build_shard, shard_bounds
+
+
+def manifests(n_rows, n_shards, **overrides):
+    result = []
+    for shard in range(n_shards):
+        start, stop = shard_bounds(n_rows, shard, n_shards)
+        result.append({'shard': shard, 'n_shards': n_shards, 'start': start, 'stop': stop,
+                       'total_rows': n_rows, 'descriptions': 'abc', 'dims': 768,
+                       'model_name': 'all-mpnet-base-v2', 'precision': 'float32',
+                       'file': f'embeddings.shard{shard}of{n_shards}.pkl'})
+    result[-1].update(overrides)
+    return result
+
+
+class TestParseBuildShard:
+
+    def test_valid(self):
+        assert parse_build_shard('3/8') == (3, 8)
+
+    @pytest.mark.parametrize('spec', ['8/8', '3', '-1/4', 'a/b'])
+    def test_invalid(self, spec):
+        with pytest.raises(ValueError):
+            parse_build_shard(spec)
+
+
+class TestShardBounds:
+
+    @pytest.mark.parametrize('n_rows,n_shards', [(10, 3), (2, 4), (0, 2), (7, 7)])
+    def test_slices_tile_the_table(self, n_rows, n_shards):
+        bounds = [shard_bounds(n_rows, shard, n_shards) for shard in range(n_shards)]
+        assert bounds[0][0] == 0 and bounds[-1][1] == n_rows
+        assert all(stop == start for (_, stop), (start, _) in zip(bounds, bounds[1:]))
+
+
+class TestCheckManifests:
+
+    def test_orders_complete_shards(self):
+        ordered = check_manifests(manifests(10, 3)[::-1])
+        assert [manifest['shard'] for manifest in ordered] == [0, 1, 2]
+
+    def test_disagreeing_model_is_an_error(self):
+        with pytest.raises(ValueError, match='disagree on model_name'):
+            check_manifests(manifests(10, 3, model_name='all-MiniLM-L6-v2'))
+
+    def test_different_description_tables_are_an_error(self):
+        with pytest.raises(ValueError, match='disagree on descriptions'):
+            check_manifests(manifests(10, 3, descriptions='other'))
+
+    def test_missing_shard_is_an_error(self):
+        with pytest.raises(ValueError, match=r'missing \[1\]'):
+            check_manifests([m for m in manifests(10, 3) if m['shard'] != 1])
+
+    def test_gap_between_slices_is_an_error(self):
+        with pytest.raises(ValueError, match='starts at row'):
+            check_manifests(manifests(10, 3, start=8))
@@ -0,0 +1,98 @@
+"""Tests for the build state of incremental index builds."""
+
+import os
+
+import pandas as pd
+
+from . import build_state
+from .build_state import BuildState, frame_hash
+
+
+def write(path, text):
+    with open(path, 'w') as f:
+        f.write(text)
+    return str(path)
+
+
+class TestBuildState:
+
+    def test_never_built_then_up_to_date(self, tmp_path):
+        raw = write(tmp_path / 'raw.csv', 'a,b\n')
+        state = BuildState(str(tmp_path / 'build_state.json'))
+        inputs = state.fingerprint([raw], maxlines=10)
+        assert state.reason('prep', inputs) == 'never built'
+        state.record('prep', inputs, state.fingerprint())
+        reloaded = BuildState(str(tmp_path / 'build_state.json'))
+        assert reloaded.reason('prep', reloaded.fingerprint([raw], maxlines=10)) is None
+
+    def test_changed_content_and_options(self, tmp_path):
+        raw = write(tmp_path / 'raw.csv', 'a,b\n')
+        state = BuildState(str(tmp_path / 'build_state.json'))
+        state.record('prep', state.fingerprint([raw], maxlines=10), state.fingerprint())
+        assert state.reason('prep', state.fingerprint([raw], maxlines=20)) == \
+            'inputs changed (maxlines)'
+        write(raw, 'a,c\n')
+        assert state.reason('prep', state.fingerprint([raw], maxlines=10)) == \
+            'inputs changed (raw.csv)'
+
+    def test_touched_file_is_unchanged(self, tmp_path):
+        raw = write(tmp_path / 'raw.csv', 'a,b\n')
+        state = BuildState(str(tmp_path / 'build_state.json'))
+        state.record('prep', state.fingerprint([raw]), state.fingerprint())
+        os.utime(raw, ns=(0, 0))
+        assert state.reason('prep', state.fingerprint([raw])) is None
+
+    def test_unchanged_size_and_mtime_reuse_the_hash(self, tmp_path, monkeypatch):
+        raw = write(tmp_path / 'raw.csv', 'a,b\n')
+        state = BuildState(str(tmp_path / 'build_state.json'))
+        state.record('prep', state.fingerprint([raw]), state.fingerprint())
+        monkeypatch.setattr(build_state, 'file_hash', lambda path: 'rehashed')
+        assert state.fingerprint([raw])['files'][raw]['sha256'] != 'rehashed'
+
+    def test_missing_output_is_a_change(self, tmp_path):
+        out = write(tmp_path / 'NSF_S000', 'x\n')
+        state = BuildState(str(tmp_path / 'build_state.json'))
+        state.record('prep', state.fingerprint(), state.fingerprint([out]))
+        os.remove(out)
+        assert state.reason('prep', state.fingerprint(), state.fingerprint([out])) == \
+            'outputs changed (NSF_S000 removed)'
+
+
+class TestFrameHash:
+
+    def test_content_and_order_matter(self):
+        df = pd.DataFrame({'source': ['NSF', 'SKOL'], 'description': ['a', 'b']})
+        assert frame_hash(df) == frame_hash(df.copy())
+        assert frame_hash(df) != frame_hash(df.iloc[::-1])
+        assert frame_hash(df) != frame_hash(df.assign(description=['a', 'c']))
+
+
+class FakeRedis:
+    """The get/exists subset of redis.Redis the build state reads."""
+
+    def __init__(self, values):
+        self.values = values
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def exists(self, key):
+        return int(key in self.values)
+
+
+class TestRedisOutputs:
+
+    def test_flushed_redis_index_is_rebuilt(self, tmp_path):
+        from .build_index import IndexBuilder
+        builder = IndexBuilder(idir=str(tmp_path), redis_url='redis://localhost:6379',
+                               embedding_name='myco:embeddings')
+        computer = builder.embeddings_computer()
+        redis = FakeRedis({'myco:embeddings': b'index', 'myco:embeddings:version': b'3'})
+        computer.redis_client = lambda: redis
+        state = BuildState(str(tmp_path / build_state.STATE_FILE))
+        inputs = state.fingerprint(options={})
+        state.record('embeddings', inputs, builder.embedding_outputs(state, computer))
+        assert state.reason('embeddings', inputs, builder.embedding_outputs(state, computer)) is None
+        redis.values.clear()
+        assert state.reason('embeddings', inputs, builder.embedding_outputs(
+            state, computer)).startswith('outputs changed (redis')
@@ -0,0 +1,41 @@
+"""Tests for the first stage of the two-model search cascade."""
+
+import numpy as np
+
+from .cascade import FirstStage
+
+
+class TestFirstStage:
+
+    def test_vectors_are_stored_unit_length(self):
+        stage = FirstStage.build('small', np.array([[3.0, 4.0], [0.0, 2.0], [0.0, 0.0]]))
+        assert stage.vectors.dtype == np.float32
+        assert (len(stage), stage.dims) == (3, 2)
+        np.testing.assert_allclose(np.linalg.norm(stage.vectors, axis=1), [1, 1, 0])
+
+    def test_candidates_rank_by_cosine_within_rows(self):
+        stage = FirstStage.build('small', np.array([[1.0, 0.0], [10.0, 1.0], [0.0, 1.0],
+                                                    [1.0, 1.0]]))
+        assert list(stage.candidates(np.array([2.0, 0.0]), 2)) == [0, 1]
+        rows = np.array([False, False, True, True])
+        assert list(stage.candidates(np.array([2.0, 0.0]), 5, rows)) == [3, 2]
+
+
+class TestExperimentWidens:
+
+    def test_fewer_candidates_than_k_still_give_k_results(self):
+        import pandas as pd
+        from .sota_search import Experiment
+        # Similarity falls with the row number; the best rows share a title
+        n = 300
+        vectors = np.stack([np.ones(n), np.arange(n) / 100], axis=1)
+        titles = ['A' if i < 150 else f'T{i}' for i in range(n)]
+        experiment = Experiment('p', 'unused.pkl', k=3, cascade_candidates=2)
+        experiment.embeddings = pd.DataFrame(vectors, columns=['F0', 'F1'])
+        experiment.first_stage = FirstStage.build('small', vectors)
+        experiment.embedded_prompt = np.array([[1.0, 0.0]])
+        experiment.first_stage_prompt = np.array([1.0, 0.0])
+        experiment.read_neighbor = lambda i: {'Title': titles[experiment.nearest_neighbors.index[i]]}
+        experiment.candidates = 3
+        experiment.nearest_neighbors = experiment.candidate_search(3)
+        assert [r['Title'] for r in experiment.iter_results()][:3] == ['A', 'T150', 'T151']
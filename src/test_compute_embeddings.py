@@ -5,7 +5,10 @@ itself requires a real model load + (optionally) CUDA, so it's exercised
 end-to-end via skol's bin/embed_treatments rather than unit-tested here.
 """
 
+import pandas
+
 from . import compute_embeddings
+from .docstore import DocStore
 
 
 _GB = 1024 ** 3
@@ -63,3 +66,63 @@ class TestEmbeddingsComputerBatchSizeParam:
     def test_explicit_value_kept(self):
         ec = compute_embeddings.EmbeddingsComputer(idir="/tmp", batch_size=128)
         assert ec.batch_size == 128
+
+
+class TestArtifacts:
+    """Optional artifacts of an earlier build must not outlive it."""
+
+    def test_delete_artifact_removes_the_file(self, tmp_path):
+        ec = compute_embeddings.EmbeddingsComputer(idir=str(tmp_path))
+        ec.write_artifact("aliases", {"rows": [1]})
+        path = tmp_path / "embeddings.aliases.pkl"
+        assert path.exists()
+        ec.delete_artifact("aliases")
+        assert not path.exists()
+
+    def test_delete_missing_artifact_is_a_no_op(self, tmp_path):
+        ec = compute_embeddings.EmbeddingsComputer(idir=str(tmp_path))
+        ec.delete_artifact("pca")
+        assert list(tmp_path.iterdir()) == []
+
+
+class TestRedisClient:
+    """The computer connects through artifacts.redis_client."""
+
+    def test_delegates_with_the_instance_configuration(self, monkeypatch):
+        calls = []
+        monkeypatch.setattr(compute_embeddings, 'redis_client',
+                            lambda *args: calls.append(args) or 'client')
+        ec = compute_embeddings.EmbeddingsComputer(
+            idir='/tmp', redis_url='rediss://localhost:6380', redis_username='u',
+            redis_password='p', redis_db=2)
+        assert ec.redis_client() == 'client'
+        assert calls == [('rediss://localhost:6380', 'u', 'p', 2)]
+
+
+class TestDocumentStore:
+    """A rebuild without the document store must not leave the old one behind."""
+
+    def build(self, tmp_path, titles, write_docstore):
+        from .test_docstore import FakeSource
+        df = pandas.DataFrame({'source': 'NSF', 'filename': 'a', 'row': range(len(titles)),
+                               'description': titles})
+        ec = compute_embeddings.EmbeddingsComputer(idir=str(tmp_path),
+                                                   write_docstore=write_docstore)
+        ec.result = pandas.concat([df, pandas.DataFrame({'F0': [1.0] * len(titles),
+                                                         'F1': [0.5] * len(titles)})],
+                                  axis=1)
+        ec.write_index(df, [FakeSource('a', titles)])
+        return ec
+
+    def test_rebuild_without_docstore_removes_it(self, tmp_path):
+        self.build(tmp_path, ['Lichens', 'Spores'], write_docstore=True)
+        path = tmp_path / 'embeddings.docstore.sqlite'
+        assert path.exists()
+        self.build(tmp_path, ['Rusts'], write_docstore=False)
+        assert not path.exists()
+
+    def test_store_is_stamped_with_the_manifest(self, tmp_path):
+        ec = self.build(tmp_path, ['Lichens', 'Spores'], write_docstore=True)
+        store = DocStore(str(tmp_path / 'embeddings.docstore.sqlite'))
+        assert store.metadata_hash == ec.manifest['hashes']['metadata']
+        store.close()
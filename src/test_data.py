@@ -7,4 +7,85 @@ def test_SKOL():
     skol = data.SKOL('../../skol/data/annotated/journals/Mycotaxon/Vol054/n1.txt.ann', 'description')
     assert skol.df['description'].iloc[0] == 'APOTHECIA se...8\nµm wide.\n'
     
-    
\ No newline at end of file
+    
+def _write(tmp_path, name, df):
+    path = tmp_path / name
+    df.to_csv(path, index=False)
+    return str(path)
+
+def test_NSF_dates_normalized_at_load(tmp_path):
+    '''Weekday prefixes are stripped and missing dates become empty'''
+    fn = _write(tmp_path, 'nsf.csv', data.pd.DataFrame({
+        'Posted_date': ['Monday, 2024-01-15', '2024-02-01', None],
+        'Next_due_date': ['2024-03-01', None, 'TBD']}))
+    nsf = data.NSF(fn, 'Posted_date')
+    assert nsf.normalized_dates['Posted_date'] == ['01/15/2024', '02/01/2024', '']
+    assert nsf.normalized_dates['Next_due_date'] == ['03/01/2024', '', None]
+    assert nsf.unparsed_dates == {'Next_due_date': 1}
+    assert nsf.date_formats['Posted_date'] == {'%Y-%m-%d': 2}
+
+def test_SAM_timestamps_with_offsets(tmp_path):
+    '''Fractional seconds and UTC offsets do not hide the date'''
+    fn = _write(tmp_path, 'sam.csv', data.pd.DataFrame({
+        'PostedDate': ['2024-05-01 10:11:12.123-04', '2024-05-02'],
+        'ResponseDeadLine': ['2024-06-01T17:00:00-04:00', '2024-06-02T17:00+05:30'],
+        'ArchiveDate': [None, '2024-07-01'],
+        'AwardDate': [None, None]}))
+    sam = data.SAM(fn, 'PostedDate')
+    assert sam.normalized_dates['PostedDate'] == ['05/01/2024', '05/02/2024']
+    assert sam.normalized_dates['ResponseDeadLine'] == ['06/01/2024', '06/02/2024']
+    assert sam.normalized_dates['ArchiveDate'] == ['', '07/01/2024']
+    assert sam.unparsed_dates == {}
+
+def test_GRANTS_numeric_dates_keep_leading_zero(tmp_path):
+    '''MMDDYYYY dates read as numbers are zero padded before parsing'''
+    fn = _write(tmp_path, 'grants.csv', data.pd.DataFrame({
+        'PostDate': [1152024.0, 12012023.0, float('nan')],
+        'CloseDate': ['2025-02-01', None, '2025-03-01'],
+        'LastUpdatedDate': [None, None, None]}))
+    grants = data.GRANTS(fn, 'PostDate')
+    assert grants.normalized_dates['PostDate'] == ['01/15/2024', '12/01/2023', '']
+    assert grants.normalized_dates['CloseDate'] == ['02/01/2025', '', '03/01/2025']
+    assert grants.date2MMDDYYYY('01152024') == '01/15/2024'
+
+def test_GFORWARD_deadline_lines(tmp_path):
+    '''The last Submission: line of Deadlines becomes the close date'''
+    fn = _write(tmp_path, 'gforward.csv', data.pd.DataFrame({
+        'Deadlines': ['LOI: 2024-01-01\nSubmission: 2024-02-01\nSubmission: March 3, 2024',
+                      None],
+        'Submit Date': ['2023-12-01', None],
+        'Modified Date': ['2023-12-02', '2023-12-03']}))
+    gforward = data.GFORWARD(fn, 'Deadlines')
+    assert gforward.normalized_dates['CloseDate'] == ['03/03/2024', '']
+    assert gforward.normalized_dates['Posted'] == ['', '']
+    assert gforward.normalized_date(1, 'Modified Date') == '12/03/2023'
+
+def test_PIVOT_sponsor_deadlines(tmp_path):
+    '''The first sponsor deadline is the posted date and the last the close date'''
+    fn = _write(tmp_path, 'pivot.csv', data.pd.DataFrame({
+        'Ex Libris Pivot-RP ID': [1, 2],
+        'Title': ['Lichens', 'Spores'],
+        'Funder': ['NSF', 'USDA'],
+        'Funder ID': [10, 20],
+        'Funder type': ['Government', 'Government'],
+        'Upcoming deadlines': ['15 Jan 2024 - sponsor deadline\n'
+                               '01 Feb 2024 - internal deadline\n'
+                               '03 Mar 2024 - sponsor deadline', None],
+        'Eligibility': ['', ''],
+        'Applicant/Institution Location': ['', ''],
+        'Citizenship': ['', ''],
+        'Activity location': ['', ''],
+        'Applicant type': ['', ''],
+        'Abstract': ['Lichen surveys', 'Spore prints'],
+        'Link to Pivot-RP': ['Link //pivot/1', 'Link //pivot/2'],
+        'Website': ['Site //nsf.gov', 'Site //usda.gov'],
+        'Keywords': ['', ''],
+        'Funding type': ['Grant', 'Grant'],
+        'Amount Upper': [1, 2],
+        'Amount': [1, 2],
+        'CFDA Numbers': ['', '']}))
+    pivot = data.PIVOT(fn, 'Abstract')
+    first = pivot.to_dict(0, 0.9)
+    assert first['Posted'] == '01/15/2024'
+    assert first['CloseDate'] == '03/03/2024'
+    assert pivot.to_dict(1, 0.5)['Posted'] is None
@@ -0,0 +1,61 @@
+"""Tests for the SQLite document store of rendered results."""
+
+import pandas as pd
+
+from . import docstore
+
+
+class FakeSource:
+    """Stands in for a data.Raw_Data_Index over a small frame."""
+
+    def __init__(self, filename, titles):
+        self.filename = filename
+        self.df = pd.DataFrame({'Title': titles})
+
+    def to_dict(self, idx, similarity):
+        return {'Similarity': similarity, 'Title': self.df.Title.iloc[idx],
+                'DueDates': {'Deadline': '02/01/2025'}, 'Amount': float('nan')}
+
+
+FakeSource.__name__ = 'NSF'
+
+
+def _descriptions():
+    return pd.DataFrame({'source': ['NSF', 'NSF', 'NSF', 'SKOL'],
+                         'filename': ['a', 'b', 'a', 'c'],
+                         'row': [1, 0, 0, 0]})
+
+
+class TestRenderRecords:
+
+    def test_rows_render_from_their_source(self):
+        sources = [FakeSource('a', ['A0', 'A1']), FakeSource('b', ['B0'])]
+        records = dict(docstore.render_records(_descriptions(), sources))
+        assert sorted(records) == [0, 1, 2]
+        assert records[0]['Title'] == 'A1'
+        assert records[1]['Title'] == 'B0'
+        assert records[2]['Similarity'] is None
+
+
+class TestDocStore:
+
+    def test_round_trip(self, tmp_path):
+        path = str(tmp_path / 'docs.sqlite')
+        sources = [FakeSource('a', ['A0', 'A1']), FakeSource('b', ['B0'])]
+        n = docstore.DocStore.build(path, docstore.render_records(_descriptions(), sources),
+                                    batch_size=2)
+        assert n == 3
+        store = docstore.DocStore(path)
+        assert len(store) == 3
+        assert store.get(1)['DueDates'] == {'Deadline': '02/01/2025'}
+        assert store.get(3) is None
+        assert sorted(store.get_many([2, 0, 3])) == [0, 2]
+        store.close()
+
+    def test_rebuild_replaces_the_store(self, tmp_path):
+        path = str(tmp_path / 'docs.sqlite')
+        docstore.DocStore.build(path, [(0, {'Title': 'old'}), (1, {'Title': 'gone'})])
+        docstore.DocStore.build(path, [(0, {'Title': 'new'})])
+        store = docstore.DocStore(path)
+        assert len(store) == 1
+        assert store.get(0)['Title'] == 'new'
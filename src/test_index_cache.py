@@ -0,0 +1,84 @@
+"""Tests for the local read-through cache of Redis-hosted indexes."""
+
+import os
+import pickle
+
+from . import artifacts
+from .index_cache import IndexCache, version_key
+
+
+class FakeRedis:
+    """The GET, INCR and pipeline calls of redis.Redis over a dict."""
+
+    def __init__(self, values):
+        self.values = dict(values)
+        self.gets = []
+
+    def get(self, key):
+        self.gets.append(key)
+        return self.values.get(key)
+
+    def incr(self, key):
+        self.values[key] = str(int(self.values.get(key, 0)) + 1).encode()
+        return int(self.values[key])
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+
+    def __init__(self, r):
+        self.r = r
+        self.keys = []
+
+    def get(self, key):
+        self.keys.append(key)
+
+    def execute(self):
+        return [self.r.get(key) for key in self.keys]
+
+
+def _redis():
+    return FakeRedis({'idx': b'matrix', 'idx:bm25': pickle.dumps({'k1': 1.2}),
+                      version_key('idx'): b'1'})
+
+
+class TestIndexCache:
+
+    def test_current_copy_is_read_without_downloading(self, tmp_path):
+        r = _redis()
+        path = IndexCache(r, 'idx', str(tmp_path)).local_copy('idx')
+        with open(path, 'rb') as f:
+            assert f.read() == b'matrix'
+        r.gets.clear()
+        assert IndexCache(r, 'idx', str(tmp_path)).local_copy('idx') == path
+        assert r.gets == [version_key('idx')]
+
+    def test_new_version_replaces_the_copy(self, tmp_path):
+        r = _redis()
+        old = IndexCache(r, 'idx', str(tmp_path)).local_copy('idx')
+        r.values['idx'] = b'rebuilt'
+        r.incr(version_key('idx'))
+        new = IndexCache(r, 'idx', str(tmp_path)).local_copy('idx')
+        assert new != old and not os.path.exists(old)
+        with open(new, 'rb') as f:
+            assert f.read() == b'rebuilt'
+
+    def test_servers_do_not_share_copies(self, tmp_path):
+        a = IndexCache(_redis(), 'idx', str(tmp_path), server='redis://a/0')
+        b = IndexCache(_redis(), 'idx', str(tmp_path), server='redis://b/0')
+        assert a.path('idx', 1) != b.path('idx', 1)
+
+    def test_missing_key(self, tmp_path):
+        assert IndexCache(_redis(), 'idx', str(tmp_path)).local_copy('idx:pca') is None
+
+    def test_unversioned_index(self, tmp_path):
+        r = _redis()
+        del r.values[version_key('idx')]
+        assert IndexCache(r, 'idx', str(tmp_path)).version is None
+
+    def test_artifacts_read_through_the_cache(self, tmp_path):
+        cache = IndexCache(_redis(), 'idx', str(tmp_path))
+        assert artifacts.read_artifact('bm25', embedding_name='idx', cache=cache) == {'k1': 1.2}
+        assert artifacts.read_artifact('pca', embedding_name='idx', cache=cache) is None
@@ -0,0 +1,72 @@
+"""Tests for the BM25 inverted index and reciprocal-rank fusion."""
+
+import numpy as np
+
+from . import lexical
+
+
+DOCS = [
+    'Basidiospores ellipsoid, smooth, 7-9 x 4-5 µm. Clamp connections present.',
+    'Basidiospores globose, warted. Clamp connections absent.',
+    'Pileus campanulate, lamellae yellow rust-brown.',
+    'Cortinarius violaceus: pileus dark violet, basidiospores ellipsoid.',
+]
+
+
+class TestTokenize:
+
+    def test_words_numbers_and_latin(self):
+        assert lexical.tokenize('Cortinarius violaceus, 7.5 µm; rust-brown') == [
+            'cortinarius', 'violaceus', '7.5', 'µm', 'rust-brown']
+
+    def test_non_strings(self):
+        assert lexical.tokenize(float('nan')) == []
+
+
+class TestBM25Index:
+
+    def test_postings_are_sorted_and_compact(self):
+        index = lexical.BM25Index.build(DOCS)
+        docs, tfs = index.postings('basidiospores')
+        assert list(docs) == [0, 1, 3]
+        assert list(tfs) == [1, 1, 1]
+        assert index.doc_ids.dtype == np.uint16
+        assert index.term_freqs.dtype == np.uint8
+        assert len(index.postings('nothing')[0]) == 0
+
+    def test_exact_terms_rank_first(self):
+        index = lexical.BM25Index.build(DOCS)
+        ranked, scores = index.top_k('ellipsoid basidiospores', 10)
+        assert set(ranked[:2]) == {0, 3}
+        assert 2 not in ranked
+        assert np.all(np.diff(scores) <= 0)
+
+    def test_rare_terms_outweigh_common_ones(self):
+        index = lexical.BM25Index.build(DOCS)
+        scores = index.scores('basidiospores violaceus')
+        assert scores.argmax() == 3
+
+    def test_top_k_respects_mask_and_k(self):
+        index = lexical.BM25Index.build(DOCS)
+        mask = np.array([False, True, True, True])
+        ranked, _ = index.top_k('basidiospores', 1, mask)
+        assert len(ranked) == 1
+        assert ranked[0] != 0
+
+    def test_unknown_query(self):
+        index = lexical.BM25Index.build(DOCS)
+        ranked, scores = index.top_k('zzz', 5)
+        assert len(ranked) == 0 and len(scores) == 0
+
+
+class TestReciprocalRankFusion:
+
+    def test_documents_in_both_rankings_win(self):
+        fused, scores = lexical.reciprocal_rank_fusion(np.array([3, 1, 2]), np.array([1, 0]))
+        assert fused[0] == 1
+        assert set(fused) == {0, 1, 2, 3}
+        assert np.all(np.diff(scores) <= 0)
+
+    def test_single_ranking_keeps_order(self):
+        fused, _ = lexical.reciprocal_rank_fusion(np.array([5, 2, 9]))
+        assert list(fused) == [5, 2, 9]
@@ -0,0 +1,64 @@
+"""Tests for the index manifest."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from .manifest import build_manifest, check_model, show_manifest
+
+
+def index(n_rows=5, dims=4):
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        'source': ['nsf', 'nsf', 'grants', 'nsf', None][:n_rows],
+        'filename': ['data/NSF_S000', 'data/NSF_S001', 'GRANTS_S000', 'data/NSF_S001', None][:n_rows],
+        'description': [f'description {i}' for i in range(n_rows)],
+    })
+    vectors = rng.standard_normal((n_rows, dims)).astype('float32')
+    return pd.concat([df, pd.DataFrame(vectors, columns=[f'F{i}' for i in range(dims)])], axis=1)
+
+
+class TestBuildManifest:
+
+    def test_counts_sources_and_feeds(self):
+        manifest = build_manifest(index(), 'all-mpnet-base-v2', 'float32', 'pickle')
+        assert manifest['rows'] == 5
+        assert manifest['dims'] == 4
+        assert manifest['dtype'] == 'float32'
+        assert manifest['sources'] == {'nsf': 3, 'grants': 1, 'unknown': 1}
+        assert manifest['feeds'] == {'NSF': 3, 'GRANTS': 1, 'unknown': 1}
+
+    def test_hashes_follow_contents(self):
+        df = index()
+        first = build_manifest(df, 'all-mpnet-base-v2', 'float32', 'pickle')
+        assert build_manifest(df.copy(), 'all-mpnet-base-v2', 'float32', 'pickle')['hashes'] \
+            == first['hashes']
+        changed = df.copy()
+        changed.loc[0, 'F0'] += 1
+        hashes = build_manifest(changed, 'all-mpnet-base-v2', 'float32', 'pickle')['hashes']
+        assert hashes['embeddings'] != first['hashes']['embeddings']
+        assert hashes['metadata'] == first['hashes']['metadata']
+
+    def test_extra_fields(self):
+        manifest = build_manifest(index(), 'all-mpnet-base-v2', 'float32', 'binary', shards=2)
+        assert manifest['shards'] == 2
+        assert manifest['storage_format'] == 'binary'
+
+
+class TestCheckModel:
+
+    def test_same_model(self):
+        check_model({'model_name': 'all-mpnet-base-v2'}, 'all-mpnet-base-v2')
+
+    def test_other_model_is_an_error(self):
+        with pytest.raises(ValueError, match='rebuild the index'):
+            check_model({'model_name': 'all-MiniLM-L6-v2'}, 'all-mpnet-base-v2')
+
+
+class TestShowManifest:
+
+    def test_prints_feed_counts(self, capsys):
+        show_manifest(build_manifest(index(), 'all-mpnet-base-v2', 'float32', 'pickle'))
+        out = capsys.readouterr().out
+        assert 'Searching 5 opportunities' in out
+        assert '-- NSF: 3 opportunities' in out
@@ -0,0 +1,116 @@
+"""Tests for memory accounting helpers."""
+
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from . import memory
+
+
+class TestParseSize:
+    """Human-readable sizes used by --memory-budget."""
+
+    def test_plain_bytes(self):
+        assert memory.parse_size('4096') == 4096
+
+    def test_binary_units(self):
+        assert memory.parse_size('512M') == 512 * 1024 ** 2
+        assert memory.parse_size('24G') == 24 * 1024 ** 3
+        assert memory.parse_size('2GiB') == 2 * 1024 ** 3
+        assert memory.parse_size('1.5g') == int(1.5 * 1024 ** 3)
+
+    def test_rejects_garbage(self):
+        with pytest.raises(ValueError):
+            memory.parse_size('lots')
+
+
+class TestMemoryTracker:
+    """Per-stage RSS records, the budget, and allocation tracing."""
+
+    def test_stage_is_recorded(self):
+        tracker = memory.MemoryTracker(poll_interval=0)
+        with tracker.stage('outer'):
+            with tracker.stage('inner'):
+                pass
+        names = [r['stage'] for r in tracker.stages]
+        assert names == ['outer', '  inner']
+        for r in tracker.stages:
+            assert r['rss_after'] > 0
+            assert r['rss_peak'] >= r['rss_before']
+
+    def test_budget_exceeded_has_clear_message(self):
+        tracker = memory.MemoryTracker(budget_bytes=1, poll_interval=0)
+        with pytest.raises(memory.MemoryBudgetExceeded, match="stage 'concat'"):
+            with tracker.stage('concat'):
+                pass
+
+    def test_budget_is_a_memory_error(self):
+        assert issubclass(memory.MemoryBudgetExceeded, MemoryError)
+
+    def test_trace_allocations_finds_call_site(self):
+        tracker = memory.MemoryTracker(trace_allocations=True, poll_interval=0)
+        with tracker.stage('allocate'):
+            blob = [bytearray(1024) for _ in range(4096)]
+        assert blob
+        locations = [loc for loc, _size, _count in tracker.stages[0]['top_allocations']]
+        assert any('test_memory.py' in loc for loc in locations)
+
+    def test_report_prints_stages(self, capsys):
+        tracker = memory.MemoryTracker(poll_interval=0)
+        with tracker.stage('encode narratives'):
+            pass
+        tracker.report()
+        assert 'encode narratives' in capsys.readouterr().out
+
+
+class TestCooperativeBudget:
+    """The budget is enforced in the thread running the stage."""
+
+    def test_check_raises_in_a_worker_thread(self):
+        tracker = memory.MemoryTracker(budget_bytes=memory.current_rss_bytes() * 4,
+                                       poll_interval=0)
+        with tracker.stage('load'):
+            tracker.budget_bytes = 1
+            with ThreadPoolExecutor(max_workers=1) as pool:
+                error = pool.submit(tracker.check).exception()
+            tracker.budget_bytes = None
+        assert isinstance(error, memory.MemoryBudgetExceeded)
+
+    def test_check_reports_an_overrun_the_sampler_saw(self):
+        tracker = memory.MemoryTracker(budget_bytes=memory.current_rss_bytes() * 4,
+                                       poll_interval=0)
+        tracker._exceeded = ('encode narratives', tracker.budget_bytes + 1)
+        with pytest.raises(memory.MemoryBudgetExceeded, match="stage 'encode narratives'"):
+            tracker.check()
+
+    def test_check_without_a_budget_does_nothing(self):
+        memory.MemoryTracker(poll_interval=0).check()
+
+    def test_sampler_does_not_interrupt_a_stage_off_the_main_thread(self, monkeypatch):
+        interrupts = []
+        monkeypatch.setattr(memory._thread, 'interrupt_main', lambda: interrupts.append(1))
+        tracker = memory.MemoryTracker(budget_bytes=memory.current_rss_bytes() * 4,
+                                       poll_interval=0.01, interrupt_after=0.05)
+
+        def stage():
+            with tracker.stage('load embeddings'):
+                tracker.budget_bytes = 1
+                tracker._sampler.join()
+                tracker.check()
+
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            error = pool.submit(stage).exception()
+        assert isinstance(error, memory.MemoryBudgetExceeded)
+        assert interrupts == []
+
+
+class TestWithoutPosix:
+    """Windows has neither the resource module nor SIGUSR1."""
+
+    def test_peak_rss_is_unknown(self, monkeypatch):
+        monkeypatch.setattr(memory, 'resource', None)
+        assert memory.peak_rss_bytes() == 0
+
+    def test_signal_handler_is_skipped(self, monkeypatch):
+        monkeypatch.delattr(memory.signal, 'SIGUSR1', raising=False)
+        memory.MemoryTracker(poll_interval=0).install_signal_handler()
@@ -0,0 +1,51 @@
+"""Tests for MinHash/LSH near-duplicate grouping."""
+
+import numpy as np
+
+from . import near_duplicates
+
+
+BASE = ('Pileus 3-7 cm broad, convex to plane, dark violet, dry, finely scaly. '
+        'Lamellae adnate, close, dark violet. Stipe 6-12 cm long, bulbous. '
+        'Basidiospores ellipsoid, verrucose, 12-17 x 7-10 µm. Clamp connections present.')
+REPRINT = BASE.replace('finely scaly', 'finely scaIy')  # one OCR error
+OTHER = ('Ascomata discoid, sessile, yellow. Asci cylindrical, eight-spored, '
+         'inamyloid. Ascospores fusoid, hyaline, smooth, 18-22 x 5-6 µm.')
+
+
+class TestMinHash:
+
+    def test_signatures_are_deterministic(self):
+        a = near_duplicates.minhash_signatures([BASE, OTHER])
+        b = near_duplicates.minhash_signatures([BASE, OTHER])
+        assert a.shape == (2, near_duplicates.NUM_PERM)
+        np.testing.assert_array_equal(a, b)
+
+    def test_signature_agreement_estimates_jaccard(self):
+        sig = near_duplicates.minhash_signatures([BASE, REPRINT, OTHER])
+        assert np.mean(sig[0] == sig[1]) > 0.7
+        assert np.mean(sig[0] == sig[2]) < 0.1
+
+    def test_lsh_bands_sit_below_threshold(self):
+        bands, rows = near_duplicates.lsh_bands(0.9)
+        assert bands * rows == near_duplicates.NUM_PERM
+        assert (1.0 / bands) ** (1.0 / rows) <= 0.9
+
+
+class TestRepresentatives:
+
+    def test_near_duplicates_share_the_longest_representative(self):
+        truncated = BASE[:len(BASE) - 10]
+        texts = [REPRINT, OTHER, BASE, truncated]
+        reps = near_duplicates.near_duplicate_representatives(texts, threshold=0.7)
+        assert reps[1] == 1
+        assert reps[0] == reps[3]
+        assert reps[0] in (0, 2)
+        assert len(texts[reps[0]]) == max(len(REPRINT), len(BASE))
+
+    def test_distinct_texts_are_their_own_representative(self):
+        reps = near_duplicates.near_duplicate_representatives([BASE, OTHER, 'short'], 0.9)
+        assert list(reps) == [0, 1, 2]
+
+    def test_empty(self):
+        assert len(near_duplicates.near_duplicate_representatives([], 0.9)) == 0
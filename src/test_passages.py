@@ -0,0 +1,72 @@
+"""Tests for passage splitting and max-pooled row scores."""
+
+import numpy as np
+import pandas as pd
+
+from .passages import PassageIndex, description_units, split_passages, token_windows
+from .sota_search import passage_search
+
+
+def one_token_per_word(words):
+    return [1] * len(words)
+
+
+class TestDescriptionUnits:
+
+    def test_line_breaks_without_spans(self):
+        assert description_units('Pileus convex.\n\n  Lamellae free. \n') == \
+            ['Pileus convex.', 'Lamellae free.']
+
+    def test_span_texts_and_offsets(self):
+        text = 'Pileus convex. Lamellae free.'
+        assert description_units(text, [{'text': 'Pileus convex.'}, 'Lamellae free.']) == \
+            ['Pileus convex.', 'Lamellae free.']
+        assert description_units(text, [{'start': 0, 'end': 14}, (15, 29)]) == \
+            ['Pileus convex.', 'Lamellae free.']
+
+    def test_offsets_outside_the_description_fall_back(self):
+        assert description_units('a\nb', [{'start': 100, 'end': 140}]) == ['a', 'b']
+
+
+class TestTokenWindows:
+
+    def test_paragraphs_are_kept_whole_when_they_fit(self):
+        windows = token_windows(['a b c', 'd e', 'f g h i'], one_token_per_word, 5)
+        assert windows == ['a b c d e', 'f g h i']
+
+    def test_long_paragraph_is_split_between_words(self):
+        windows = token_windows(['a b c d e f g'], one_token_per_word, 3)
+        assert windows == ['a b c', 'd e f', 'g']
+
+    def test_token_counts_bound_the_window(self):
+        windows = token_windows(['aa b cc'], lambda words: [len(w) for w in words], 3)
+        assert windows == ['aa b', 'cc']
+
+    def test_empty_description_has_one_passage(self):
+        assert token_windows([], one_token_per_word, 4) == ['']
+
+
+class TestPassageIndex:
+
+    def test_parents_are_compact_and_in_row_order(self):
+        passages, parents = split_passages(['a b c d e', '', 'f'], None,
+                                           one_token_per_word, 2)
+        assert passages == ['a b', 'c d', 'e', '', 'f']
+        assert parents.dtype == np.int32
+        assert parents.tolist() == [0, 0, 0, 1, 2]
+
+    def test_row_score_is_the_best_passage(self):
+        vectors = np.array([[1, 0], [0, 1], [1, 1], [0, 1]], dtype=np.float32)
+        index = PassageIndex.build('model', vectors, np.array([0, 0, 1, 2]))
+        assert len(index) == 3
+        scores = index.row_scores(np.array([0.0, 2.0]))
+        np.testing.assert_allclose(scores, [1.0, np.sqrt(0.5), 1.0], rtol=1e-6)
+
+    def test_passage_search_ranks_selected_rows(self):
+        vectors = np.array([[1, 0], [0, 1], [1, 1], [0, 1]], dtype=np.float32)
+        index = PassageIndex.build('model', vectors, np.array([0, 0, 1, 2]))
+        df = pd.DataFrame({'F0': [0.0, 0.0, 0.0], 'F1': [0.0, 0.0, 0.0]},
+                          index=[10, 11, 12])
+        result = passage_search('prompt', df, index, np.array([False, True, True]),
+                                np.array([[0.0, 1.0]]))
+        assert result.index.tolist() == [12, 11]
@@ -0,0 +1,67 @@
+"""Tests for concurrent, dependency-aware data preparation scripts."""
+
+import os
+import time
+
+import pytest
+
+from .prep_scripts import SKIPPED, TIMED_OUT, dependency_graph, run_scripts
+
+
+def write_script(directory, name, body, depends=None):
+    path = os.path.join(directory, name)
+    header = f'# depends: {depends}\n' if depends else ''
+    with open(path, 'w') as f:
+        f.write(f'#!/bin/bash\n{header}{body}\n')
+    os.chmod(path, 0o755)
+    return path
+
+
+class TestDependencyGraph:
+
+    def test_declared_dependencies_by_path(self, tmp_path):
+        a = write_script(tmp_path, 'get_a.sh', 'true')
+        b = write_script(tmp_path, 'get_b.sh', 'true', depends='get_a.sh get_z.sh')
+        assert dependency_graph([a, b]) == {a: [], b: [a]}
+
+    def test_cycle_is_an_error(self, tmp_path):
+        a = write_script(tmp_path, 'get_a.sh', 'true', depends='get_b.sh')
+        b = write_script(tmp_path, 'get_b.sh', 'true', depends='get_a.sh')
+        with pytest.raises(ValueError, match='cycle'):
+            dependency_graph([a, b])
+
+
+class TestRunScripts:
+
+    def test_output_is_prefixed_and_durations_returned(self, tmp_path, capsys):
+        a = write_script(tmp_path, 'get_a.sh', 'echo "idir=$1 maxlines=$4"')
+        b = write_script(tmp_path, 'get_b.sh', 'echo oops >&2; exit 3')
+        results = run_scripts([a, b], ['idx', 'raw', 'src', '10'], workers=2)
+        assert [(script, code) for script, code, _ in results] == [(a, 0), (b, 3)]
+        assert all(seconds >= 0 for _, _, seconds in results)
+        out = capsys.readouterr().out
+        assert '[get_a.sh] idir=idx maxlines=10' in out
+        assert '[get_b.sh] oops' in out
+
+    def test_dependents_wait_for_and_skip_after_failures(self, tmp_path):
+        log = tmp_path / 'log'
+        a = write_script(tmp_path, 'get_a.sh', f'sleep 0.2; echo a >> {log}')
+        b = write_script(tmp_path, 'get_b.sh', f'echo b >> {log}', depends='get_a.sh')
+        c = write_script(tmp_path, 'get_c.sh', 'exit 1')
+        d = write_script(tmp_path, 'get_d.sh', f'echo d >> {log}', depends='get_c.sh')
+        results = run_scripts([a, b, c, d], [], workers=4)
+        assert [code for _, code, _ in results] == [0, 0, 1, SKIPPED]
+        assert log.read_text().split() == ['a', 'b']
+
+    def test_independent_scripts_overlap(self, tmp_path):
+        scripts = [write_script(tmp_path, f'get_{i}.sh', 'sleep 0.5') for i in range(3)]
+        start = time.perf_counter()
+        results = run_scripts(scripts, [], workers=3)
+        assert [code for _, code, _ in results] == [0, 0, 0]
+        assert time.perf_counter() - start < 1.4
+
+    def test_timeout_kills_the_script(self, tmp_path):
+        slow = write_script(tmp_path, 'get_slow.sh', 'sleep 10; echo done')
+        [(_, code, seconds)] = run_scripts([slow], [], timeout=0.3)
+        assert code == TIMED_OUT
+        assert seconds < 5
@@ -0,0 +1,68 @@
+"""Tests for the PCA-reduced first-stage search."""
+
+import numpy as np
+import pytest
+
+from .reduction import PCAProjection, normalize_rows, recall_at_k
+
+
+def _corpus(n=200, rank=6, dims=32, seed=0):
+    rng = np.random.default_rng(seed)
+    return (rng.normal(size=(n, rank)) @ rng.normal(size=(rank, dims))).astype(np.float32)
+
+
+class TestPCAProjection:
+
+    def test_full_rank_preserves_cosine_similarity(self):
+        matrix = _corpus()
+        projection = PCAProjection.fit(matrix, 6, block_rows=64)
+        assert projection.reduced.shape == (200, 6)
+        assert projection.explained_variance_ratio.sum() == pytest.approx(1.0, abs=1e-6)
+        query = normalize_rows(matrix[:1])[0]
+        reduced_query = projection.project(query)[0]
+        np.testing.assert_allclose(projection.reduced @ reduced_query,
+                                   normalize_rows(matrix) @ query, atol=1e-4)
+
+    def test_candidates_are_best_first_within_rows(self):
+        matrix = _corpus()
+        projection = PCAProjection.fit(matrix, 6)
+        assert projection.candidates(matrix[7], 5)[0] == 7
+        rows = np.zeros(200, dtype=bool)
+        rows[100:] = True
+        found = projection.candidates(matrix[7], 5, rows)
+        assert len(found) == 5 and found.min() >= 100
+        assert len(projection.candidates(matrix[7], 500, np.arange(3))) == 3
+
+    def test_dimension_is_checked(self):
+        with pytest.raises(ValueError, match='between 1 and 32'):
+            PCAProjection.fit(_corpus(), 33)
+
+
+class TestRecall:
+
+    def test_rescoring_recovers_what_the_first_stage_misses(self):
+        matrix = _corpus(rank=24)
+        queries = normalize_rows(matrix[:20])
+        projection = PCAProjection.fit(matrix, 4)
+        recall = recall_at_k(matrix, projection, queries, k=5, candidates=200)
+        assert recall['rescored'] == 1.0
+        assert recall['first stage'] < 1.0
+
+
+class TestExperimentWidens:
+
+    def test_fewer_candidates_than_k_still_give_k_results(self):
+        import pandas as pd
+        from .sota_search import Experiment
+        # Similarity falls with the row number; the best rows share a title
+        n = 300
+        df = pd.DataFrame({'F0': np.ones(n), 'F1': np.arange(n) / 100})
+        titles = ['A' if i < 150 else f'T{i}' for i in range(n)]
+        experiment = Experiment('p', 'unused.pkl', k=3, pca_candidates=2)
+        experiment.embeddings = df
+        experiment.pca = PCAProjection.fit(df.to_numpy(dtype=np.float32), 2)
+        experiment.embedded_prompt = np.array([[1.0, 0.0]])
+        experiment.read_neighbor = lambda i: {'Title': titles[experiment.nearest_neighbors.index[i]]}
+        experiment.candidates = 3
+        experiment.nearest_neighbors = experiment.candidate_search(3)
+        assert [r['Title'] for r in experiment.iter_results()][:3] == ['A', 'T150', 'T151']
@@ -0,0 +1,103 @@
+"""Tests for the search result cache."""
+
+import pandas as pd
+import pytest
+
+from .result_cache import (LocalResultCache, RedisResultCache, ResultCache, normalize_prompt,
+                           result_key)
+
+
+def results(title='Fungi A'):
+    return pd.DataFrame({'Title': [title], 'Similarity': [0.9]})
+
+
+class FakeRedis:
+    """The get/set subset of redis.Redis the cache uses."""
+
+    def __init__(self):
+        self.values = {}
+        self.expiry = {}
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def set(self, key, value, ex=None):
+        self.values[key] = value
+        self.expiry[key] = ex
+
+
+class TestResultKey:
+
+    def test_normalizes_whitespace_and_unicode(self):
+        assert normalize_prompt('  ellipsoid\n spores  ') == 'ellipsoid spores'
+        assert result_key(' ellipsoid  spores', 3, {}, 'v1') == \
+            result_key('ellipsoid spores', 3, {}, 'v1')
+
+    def test_filter_value_order_does_not_matter(self):
+        assert result_key('p', 3, {'source': (False, ['NSF', 'SKOL'])}, 'v1') == \
+            result_key('p', 3, {'source': (False, ['SKOL', 'NSF'])}, 'v1')
+
+    @pytest.mark.parametrize('other', [
+        dict(prompt='other'), dict(k=5), dict(version='v2'),
+        dict(filters={'source': (True, ['NSF'])}), dict(search_mode='hybrid')])
+    def test_every_part_matters(self, other):
+        search = dict(prompt='p', k=3, filters={'source': (False, ['NSF'])}, version='v1',
+                      search_mode='dense')
+        assert result_key(**search) != result_key(**dict(search, **other))
+
+    def test_starts_with_the_version(self):
+        assert result_key('p', 3, {}, 'redis://h:6379/0/myco:v1@4').startswith(
+            'redis://h:6379/0/myco:v1@4:')
+
+
+class TestResultCache:
+
+    def test_base_class_is_abstract(self):
+        with pytest.raises(TypeError, match='get'):
+            ResultCache()
+
+
+class TestLocalResultCache:
+
+    def test_hit_and_miss(self):
+        cache = LocalResultCache()
+        key = result_key('p', 3, {}, 'v1')
+        assert cache.get(key) is None
+        cache.put(key, results())
+        pd.testing.assert_frame_equal(cache.get(key), results())
+
+    def test_evicts_least_recently_used(self):
+        cache = LocalResultCache(size=2)
+        keys = [result_key(p, 3, {}, 'v1') for p in 'abc']
+        cache.put(keys[0], results('a'))
+        cache.put(keys[1], results('b'))
+        cache.get(keys[0])
+        cache.put(keys[2], results('c'))
+        assert cache.get(keys[1]) is None
+        assert cache.get(keys[0]) is not None and cache.get(keys[2]) is not None
+
+    def test_new_index_version_drops_old_results(self):
+        cache = LocalResultCache()
+        cache.put(result_key('p', 3, {}, 'v1'), results())
+        assert cache.get(result_key('p', 3, {}, 'v2')) is None
+        assert len(cache) == 0
+
+    def test_returns_copies(self):
+        cache = LocalResultCache()
+        key = result_key('p', 3, {}, 'v1')
+        cache.put(key, results())
+        hit = cache.get(key)
+        hit['Title'] = 'changed'
+        assert cache.get(key).Title[0] == 'Fungi A'
+
+
+class TestRedisResultCache:
+
+    def test_round_trip_with_ttl(self):
+        r = FakeRedis()
+        cache = RedisResultCache(r, ttl=60)
+        key = result_key('p', 3, {}, 'v1')
+        assert cache.get(key) is None
+        cache.put(key, results())
+        pd.testing.assert_frame_equal(cache.get(key), results())
+        assert list(r.expiry.values()) == [60]
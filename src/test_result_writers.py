@@ -0,0 +1,80 @@
+"""Tests for the CSV, JSON Lines and Parquet result writers."""
+
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from . import result_writers
+
+
+def _results(titles):
+    return pd.DataFrame([{'Similarity': np.float32(0.5), 'Title': t,
+                          'CloseDate': pd.Timestamp('2025-02-01'),
+                          'DueDates': {'ResponseDeadLine': '02/01/2025', 'AwardDate': None},
+                          'Contacts': {'Email': 'a@b.org'},
+                          'FeedID': 7, 'Amount': float('nan'), 'LineNumber': 12}
+                         for t in titles])
+
+
+class TestFormatFromFilename:
+
+    @pytest.mark.parametrize('name, fmt', [('out.csv', 'csv'), ('out.PARQUET', 'parquet'),
+                                           ('out.jsonl', 'jsonl'), ('out', 'csv')])
+    def test_extensions(self, name, fmt):
+        assert result_writers.format_from_filename(name) == fmt
+
+
+class TestJsonLines:
+
+    def test_batches_append_and_keep_nested_fields(self, tmp_path):
+        output = str(tmp_path / 'out.jsonl')
+        with result_writers.open_result_writer(output) as writer:
+            writer.write(_results(['A', 'B']), 'spores', 'Q1')
+            writer.write(_results(['C']), 'clamps', 'Q2')
+        records = [json.loads(line) for line in open(output)]
+        assert [r['Title'] for r in records] == ['A', 'B', 'C']
+        assert records[0]['DueDates'] == {'ResponseDeadLine': '02/01/2025', 'AwardDate': None}
+        assert records[0]['Amount'] is None
+        assert records[2]['QueryName'] == 'Q2'
+
+
+class TestParquet:
+
+    def test_row_groups_and_typed_columns(self, tmp_path):
+        pq = pytest.importorskip('pyarrow.parquet')
+        output = str(tmp_path / 'out.parquet')
+        writer = result_writers.ParquetResultWriter(output, row_group_size=2)
+        writer.write(_results(['A', 'B', 'C']), 'spores', 'Q1')
+        writer.write(_results(['D']), 'clamps', 'Q2')
+        writer.close()
+        meta = pq.ParquetFile(output).metadata
+        assert meta.num_rows == 4
+        assert meta.num_row_groups == 2
+        table = pq.read_table(output)
+        assert isinstance(table.schema.field('DueDates').type, result_writers.pyarrow.MapType)
+        row = table.slice(0, 1).to_pylist()[0]
+        assert dict(row['DueDates']) == {'ResponseDeadLine': '02/01/2025', 'AwardDate': None}
+        assert row['FeedID'] == '7'
+        assert dict(row['Extra']) == {'LineNumber': '12'}
+        assert row['CloseDate'].year == 2025
+
+
+class TestCsv:
+
+    def test_appends_with_one_header(self, tmp_path):
+        output = str(tmp_path / 'out.csv')
+        for qname in ('Q1', 'Q2'):
+            with result_writers.open_result_writer(output) as writer:
+                writer.write(_results(['A']), 'spores', qname)
+        df = pd.read_csv(output)
+        assert list(df.QueryName) == ['Q1', 'Q2']
+        assert set(df.Eligibility) == {'See URL'}
+
+
+class TestResultWriter:
+
+    def test_base_class_is_abstract(self, tmp_path):
+        with pytest.raises(TypeError, match='write_batch'):
+            result_writers.ResultWriter(str(tmp_path / 'out.csv'))
@@ -0,0 +1,148 @@
+"""Tests for blocked and parallel top-k cosine scans."""
+
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from . import wire_format
+from .scan import blocked_top_k, merge_top_k, parallel_top_k, row_ranges
+
+
+def index(n_rows=50, dims=8, dtype='float32'):
+    rng = np.random.default_rng(1)
+    vectors = rng.standard_normal((n_rows, dims)).astype(dtype)
+    df = pd.DataFrame(vectors, columns=[f'F{i}' for i in range(dims)])
+    df.insert(0, 'filename', [f'NSF_S{i % 3:03}' for i in range(n_rows)])
+    return df
+
+
+def full_scan(df, vector, rows=None):
+    matrix = df[wire_format.embedding_columns(df)].to_numpy(dtype=np.float64)
+    scores = matrix @ vector / np.linalg.norm(matrix, axis=1) / np.linalg.norm(vector)
+    positions = np.arange(len(df)) if rows is None else np.flatnonzero(rows)
+    return positions[np.argsort(-scores[positions], kind='stable')], scores
+
+
+class TestBlockedTopK:
+
+    @pytest.mark.parametrize('block_rows', [1, 7, 50, 1000])
+    def test_matches_a_full_scan(self, block_rows):
+        df = index()
+        vector = np.random.default_rng(2).standard_normal(8)
+        positions, scores = blocked_top_k(df, vector, 5, block_rows=block_rows)
+        expected, all_scores = full_scan(df, vector)
+        np.testing.assert_array_equal(positions, expected[:5])
+        np.testing.assert_allclose(scores, all_scores[expected[:5]], rtol=1e-5)
+
+    def test_row_mask(self):
+        df = index()
+        vector = np.random.default_rng(3).standard_normal(8)
+        rows = np.zeros(len(df), dtype=bool)
+        rows[::4] = True
+        positions, _ = blocked_top_k(df, vector, 3, rows, block_rows=6)
+        expected, _ = full_scan(df, vector, rows)
+        np.testing.assert_array_equal(positions, expected[:3])
+
+    def test_k_beyond_the_rows(self):
+        df = index(n_rows=4)
+        positions, scores = blocked_top_k(df, np.ones(8), 10, block_rows=3)
+        assert sorted(positions) == [0, 1, 2, 3]
+        assert np.all(np.diff(scores) <= 0)
+
+    def test_row_range(self):
+        df = index()
+        vector = np.random.default_rng(4).standard_normal(8)
+        positions, _ = blocked_top_k(df, vector, 50, start=10, stop=20, block_rows=3)
+        assert sorted(positions) == list(range(10, 20))
+
+    def test_float16_index(self):
+        df = index(dtype='float16')
+        vector = np.random.default_rng(5).standard_normal(8)
+        positions, _ = blocked_top_k(df, vector, 5, block_rows=16)
+        expected, _ = full_scan(df, vector)
+        assert set(positions) == set(expected[:5])
+
+    def test_memory_mapped_index(self, tmp_path):
+        df = index()
+        path = tmp_path / 'embeddings.pkl'
+        with open(path, 'wb') as f:
+            wire_format.write(df, f)
+        vector = np.random.default_rng(6).standard_normal(8)
+        positions, _ = blocked_top_k(wire_format.load(str(path)), vector, 5, block_rows=8)
+        np.testing.assert_array_equal(positions, full_scan(df, vector)[0][:5])
+
+    def test_invalid_block_rows(self):
+        with pytest.raises(ValueError):
+            blocked_top_k(index(), np.ones(8), 3, block_rows=0)
+
+
+class TestMergeTopK:
+
+    def test_keeps_the_best(self):
+        scores, positions = merge_top_k(np.array([0.1, 0.9, 0.5, 0.7]), np.arange(4), 2)
+        assert sorted(positions) == [1, 3]
+
+
+class TestParallelTopK:
+
+    @pytest.mark.parametrize('workers', [1, 3, 8, 100])
+    def test_matches_a_single_scan(self, workers):
+        df = index()
+        vector = np.random.default_rng(7).standard_normal(8)
+        expected = blocked_top_k(df, vector, 6, block_rows=5)
+        positions, scores = parallel_top_k(df, vector, 6, workers=workers, block_rows=5)
+        np.testing.assert_array_equal(positions, expected[0])
+        np.testing.assert_allclose(scores, expected[1], rtol=1e-6)
+
+    def test_row_mask_and_shared_pool(self):
+        df = index()
+        vector = np.random.default_rng(8).standard_normal(8)
+        rows = np.arange(len(df)) % 3 == 0
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            positions, _ = parallel_top_k(df, vector, 4, rows, workers=4, block_rows=4,
+                                          pool=pool)
+        np.testing.assert_array_equal(positions, full_scan(df, vector, rows)[0][:4])
+
+    def test_blas_threads_are_restored(self):
+        threadpoolctl = pytest.importorskip('threadpoolctl')
+        before = [info['num_threads'] for info in threadpoolctl.threadpool_info()]
+        parallel_top_k(index(), np.ones(8), 3, workers=2, blas_threads=1)
+        assert [info['num_threads'] for info in threadpoolctl.threadpool_info()] == before
+
+
+class TestRowRanges:
+
+    def test_ranges_tile_the_rows(self):
+        assert row_ranges(10, 3) == [(0, 3), (3, 6), (6, 10)]
+        assert row_ranges(2, 5) == [(0, 1), (1, 2)]
+        assert row_ranges(0, 4) == [(0, 0)]
+
+
+class TestWiden:
+
+    def experiment(self, n_rows=300, duplicates=150):
+        from .sota_search import MIN_CANDIDATES, Experiment
+        # Similarity falls with the row number; the best rows share a title
+        df = pd.DataFrame({'F0': np.ones(n_rows), 'F1': np.arange(n_rows) / 100})
+        titles = ['A' if i < duplicates else f'T{i}' for i in range(n_rows)]
+        experiment = Experiment('p', 'unused.pkl', k=3, scan_block_rows=16)
+        experiment.embeddings = df
+        experiment.embedded_prompt = np.array([[1.0, 0.0]])
+        experiment.read_neighbor = lambda i: {'Title': titles[experiment.nearest_neighbors.index[i]]}
+        experiment.candidates = MIN_CANDIDATES
+        experiment.nearest_neighbors = experiment.candidate_search(MIN_CANDIDATES)
+        return experiment
+
+    def test_rescans_when_duplicates_use_up_the_candidates(self):
+        experiment = self.experiment()
+        titles = [r['Title'] for r in islice(experiment.iter_results(), 3)]
+        assert titles == ['A', 'T150', 'T151']
+        assert experiment.candidates == 200
+
+    def test_stops_once_every_row_is_ranked(self):
+        experiment = self.experiment(n_rows=120, duplicates=120)
+        assert [r['Title'] for r in experiment.iter_results()] == ['A']
+        assert experiment.candidates == 200
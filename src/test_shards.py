@@ -0,0 +1,179 @@
+"""Tests for sharded scatter-gather search."""
+
+import threading
+import time
+from itertools import islice
+from multiprocessing import Pipe
+
+import numpy as np
+import pandas as pd
+
+from . import shards
+
+
+def _index(n=40, dims=8, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame(rng.normal(size=(n, dims)), columns=[f'F{i}' for i in range(dims)])
+    df.insert(0, 'source', ['NSF' if i % 2 else 'SKOL' for i in range(n)])
+    df.insert(1, 'row', np.arange(n))
+    return df
+
+
+def _exact_top(df, vector, k):
+    matrix = df.filter(like='F').to_numpy()
+    scores = matrix @ vector / np.linalg.norm(matrix, axis=1) / np.linalg.norm(vector)
+    return list(df.index[np.argsort(-scores)[:k]])
+
+
+def _coordinator(parts, timeout=2.0, delay=None):
+    """Serve every shard from a thread over a pipe; ``delay`` slows one shard."""
+    workers = []
+    for shard, part in enumerate(parts):
+        parent, child = Pipe()
+        worker = shards.ShardWorker(shard, part)
+        if delay and shard == delay[0]:
+            original = worker.top_k
+
+            def slow(*args, original=original):
+                time.sleep(delay[1])
+                return original(*args)
+            worker.top_k = slow
+        threading.Thread(target=shards.serve, args=(child, worker), daemon=True).start()
+        workers.append((parent, *shards.handshake(parent)))
+    return shards.ShardCoordinator(workers, timeout)
+
+
+class PartialCoordinator:
+    """Stands in for a ShardCoordinator whose shard 1 misses the first query."""
+
+    def __init__(self, parts):
+        self.parts = parts
+        self.queries = 0
+        self.missing = []
+
+    def search(self, vector, k, filters=None):
+        self.queries += 1
+        self.missing = [1] if self.queries == 1 else []
+        answered = self.parts[:1] if self.missing else self.parts
+        merged = pd.concat(answered).sort_values('similarity', ascending=False, kind='stable')
+        return merged.head(k)
+
+    def close(self):
+        pass
+
+
+def _late_shard_experiment():
+    """The best 150 rows of shard 0 share a title; shard 1 holds better rows."""
+    from .sota_search import Experiment
+    first = pd.DataFrame({'Title': ['A' if i < 150 else f'S{i}' for i in range(200)],
+                          'similarity': 0.9 - np.arange(200) / 1000})
+    late = pd.DataFrame({'Title': [f'L{j}' for j in range(10)], 'similarity': 0.95},
+                        index=range(1000, 1010))
+    experiment = Experiment('p', 'unused.pkl', k=3, sharded=True)
+    experiment.coordinator = PartialCoordinator([first, late])
+    experiment.embedded_prompt = np.array([1.0, 0.0])
+    experiment.read_neighbor = lambda i: {'Title': experiment.nearest_neighbors.Title.iloc[i],
+                                          'CloseDate': None}
+    return experiment
+
+
+class TestSplit:
+
+    def test_contiguous_parts_keep_global_labels(self):
+        parts = shards.split_shards(_index(10), 3)
+        assert [len(p) for p in parts] == [4, 3, 3]
+        assert list(parts[1].index) == [4, 5, 6]
+
+
+class TestShardWorker:
+
+    def test_top_k_matches_exact_search(self):
+        df = _index()
+        vector = np.random.default_rng(1).normal(size=8)
+        labels, similarities, metadata = shards.ShardWorker(0, df).top_k(vector, 5)
+        assert list(labels) == _exact_top(df, vector, 5)
+        assert np.all(np.diff(similarities) <= 0)
+        assert list(metadata.columns) == ['source', 'row']
+
+    def test_filters_apply_within_the_shard(self):
+        labels, _, metadata = shards.ShardWorker(0, _index()).top_k(
+            np.ones(8), 50, {'source': (False, ['NSF'])})
+        assert len(labels) == 20
+        assert set(metadata.source) == {'NSF'}
+
+
+class TestCoordinator:
+
+    def test_merged_top_k_equals_global_top_k(self):
+        df = _index()
+        vector = np.random.default_rng(2).normal(size=8)
+        coordinator = _coordinator(shards.split_shards(df, 4))
+        result = coordinator.search(vector, 6)
+        assert list(result.index) == _exact_top(df, vector, 6)
+        assert coordinator.missing == []
+        assert len(coordinator) == 40
+        coordinator.close()
+
+    def test_slow_shard_gives_partial_results(self):
+        df = _index()
+        parts = shards.split_shards(df, 2)
+        coordinator = _coordinator(parts, timeout=0.3, delay=(1, 0.6))
+        vector = np.random.default_rng(3).normal(size=8)
+        partial = coordinator.search(vector, 5)
+        assert coordinator.missing == [1]
+        assert set(partial.index) <= set(parts[0].index)
+        time.sleep(0.5)
+        coordinator.timeout = 2.0
+        full = coordinator.search(vector, 5)  # the late answer is discarded
+        assert coordinator.missing == []
+        assert list(full.index) == _exact_top(df, vector, 5)
+        coordinator.close()
+
+    def test_experiment_widens_when_duplicates_use_up_the_candidates(self):
+        from .sota_search import MIN_CANDIDATES, Experiment
+        # Similarity falls with the row number; the best 150 rows share a title
+        n = 300
+        df = pd.DataFrame({'F0': np.ones(n), 'F1': np.arange(n) / 100})
+        df.insert(0, 'Title', ['A' if i < 150 else f'T{i}' for i in range(n)])
+        experiment = Experiment('p', 'unused.pkl', k=3, sharded=True)
+        experiment.coordinator = _coordinator(shards.split_shards(df, 3))
+        experiment.embedded_prompt = np.array([1.0, 0.0])
+        experiment.read_neighbor = lambda i: {'Title': experiment.nearest_neighbors.Title.iloc[i]}
+        experiment.candidates = MIN_CANDIDATES
+        experiment.nearest_neighbors = experiment.candidate_search(MIN_CANDIDATES)
+        titles = [result['Title'] for result in islice(experiment.iter_results(), 3)]
+        assert titles == ['A', 'T150', 'T151']
+        experiment.close()
+
+    def test_partial_first_query_is_not_cached(self):
+        from .result_cache import LocalResultCache
+        from .sota_search import MIN_CANDIDATES
+        experiment = _late_shard_experiment()
+        experiment.result_cache = LocalResultCache()
+        experiment.index_version = lambda: 'v1'
+
+        def run():
+            experiment.hydrated = {}
+            experiment.missing_shards = set()
+            experiment.candidates = MIN_CANDIDATES
+            experiment.nearest_neighbors = experiment.candidate_search(MIN_CANDIDATES)
+        experiment.run = run
+        experiment.search()
+        # The widened query reached every shard, the first one did not
+        assert experiment.coordinator.missing == []
+        assert experiment.missing_shards == {1}
+        assert len(experiment.result_cache) == 0
+
+    def test_late_shard_rows_follow_the_neighbors_already_ranked(self):
+        from .sota_search import MIN_CANDIDATES
+        experiment = _late_shard_experiment()
+        experiment.candidates = MIN_CANDIDATES
+        experiment.nearest_neighbors = experiment.candidate_search(MIN_CANDIDATES)
+        first = list(experiment.nearest_neighbors.index)
+        titles = [result['Title'] for result in islice(experiment.iter_results(), 3)]
+        # Rows 0-99 kept their positions; shard 1's better rows come next
+        assert titles == ['A', 'L0', 'L1']
+        labels = list(experiment.nearest_neighbors.index)
+        assert labels[:len(first)] == first
+        assert len(labels) == len(set(labels))
+        assert set(experiment.hydrated) <= set(labels)
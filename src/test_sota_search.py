@@ -0,0 +1,51 @@
+"""Tests for the Experiment's hydration caches."""
+
+from types import SimpleNamespace
+
+import pytest
+
+from . import sota_search
+from .docstore import DocStore
+
+
+class TestLoadSource:
+
+    def test_keeps_the_most_recently_used_sources(self, monkeypatch):
+        loads = []
+
+        def nsf(filename, description_attribute):
+            loads.append(filename)
+            return filename
+
+        monkeypatch.setattr(sota_search, 'DATA', SimpleNamespace(NSF=nsf))
+        monkeypatch.setattr(sota_search, 'SOURCE_CACHE_SIZE', 2)
+        experiment = sota_search.Experiment('p', 'unused.pkl')
+        for filename in ['NSF_S000', 'NSF_S001', 'NSF_S000', 'NSF_S002', 'NSF_S000']:
+            assert experiment.load_source('NSF', filename) == filename
+        assert loads == ['NSF_S000', 'NSF_S001', 'NSF_S002']
+        assert list(experiment.sources) == [('NSF', 'NSF_S002'), ('NSF', 'NSF_S000')]
+
+
+class TestOpenDocstore:
+
+    def store(self, tmp_path):
+        path = tmp_path / 'embeddings.docstore.sqlite'
+        DocStore.build(str(path), [(0, {'Title': 'old'})], metadata_hash='old')
+        return str(path)
+
+    def test_refuses_an_explicit_store_of_another_index(self, tmp_path):
+        experiment = sota_search.Experiment('p', 'unused.pkl', docstoreFN=self.store(tmp_path))
+        experiment.manifest = {'hashes': {'metadata': 'new'}}
+        with pytest.raises(ValueError, match='another index'):
+            experiment.open_docstore()
+
+    def test_ignores_a_stale_default_store(self, tmp_path):
+        self.store(tmp_path)
+        experiment = sota_search.Experiment('p', str(tmp_path / 'embeddings.pkl'))
+        experiment.manifest = {'hashes': {'metadata': 'new'}}
+        experiment.open_docstore()
+        assert experiment.docstore is None
+        experiment.manifest = {'hashes': {'metadata': 'old'}}
+        experiment.open_docstore()
+        assert experiment.docstore.get(0) == {'Title': 'old'}
+        experiment.close()
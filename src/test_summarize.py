@@ -0,0 +1,58 @@
+"""Tests for batched, cached result summaries."""
+
+from . import summarize
+from .summarize import Summarizer, SummaryCache, description_hash
+
+LONG = ' '.join(['Basidiospores ellipsoid, verrucose, with a plage.'] * 20)
+OTHER = ' '.join(['Ascomata discoid, sessile, yellow, on hardwood.'] * 20)
+
+
+class FakePipe:
+    """Records the batches a summarization pipeline is called with."""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, texts, **kwargs):
+        self.calls.append(list(texts))
+        return [{'summary_text': f'summary of {text[:11]}'} for text in texts]
+
+
+class TestSummaryCache:
+
+    def test_round_trip_per_model(self, tmp_path):
+        cache = SummaryCache(str(tmp_path / 'sub' / 'summaries.sqlite'))
+        cache.put_many('bart', [('h1', 'one'), ('h2', 'two')])
+        assert cache.get_many('bart', ['h1', 'h3']) == {'h1': 'one'}
+        assert cache.get_many('t5', ['h1']) == {}
+        assert len(cache) == 2
+        cache.close()
+
+
+class TestSummarizer:
+
+    def test_misses_are_summarized_in_one_batch(self, tmp_path):
+        summarizer = Summarizer('bart', SummaryCache(str(tmp_path / 's.sqlite')))
+        summarizer.pipe = FakePipe()
+        summaries = summarizer.summarize([LONG, 'Short abstract.', OTHER, LONG, None])
+        assert summaries == ['summary of Basidiospor', 'Short abstract.',
+                             'summary of Ascomata di', 'summary of Basidiospor', None]
+        assert summarizer.pipe.calls == [[LONG, OTHER]]
+
+    def test_cached_summaries_skip_the_model(self, tmp_path):
+        cache = SummaryCache(str(tmp_path / 's.sqlite'))
+        cache.put_many('bart', [(description_hash(LONG), 'cached')])
+        summarizer = Summarizer('bart', cache)
+        summarizer.pipe = FakePipe()
+        assert summarizer.summarize([LONG]) == ['cached']
+        assert summarizer.pipe.calls == []
+
+    def test_precompute_skips_cached_and_short_descriptions(self, tmp_path, monkeypatch):
+        cache = SummaryCache(str(tmp_path / 's.sqlite'))
+        cache.put_many('bart', [(description_hash(LONG), 'cached')])
+        pipe = FakePipe()
+        monkeypatch.setattr(summarize, 'load_pipeline', lambda model: pipe)
+        n = summarize.precompute([LONG, OTHER, OTHER, 'short'], cache, 'bart', processes=1)
+        assert n == 1
+        assert pipe.calls == [[OTHER]]
+        assert len(cache) == 2
@@ -0,0 +1,93 @@
+"""Tests for the binary wire format of embeddings indexes."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from . import wire_format
+
+
+def _index(rows=4, dims=3):
+    metadata = pd.DataFrame({'source': ['NSF', 'SAM', 'NSF', 'SKOL'][:rows],
+                             'row': np.arange(rows)})
+    matrix = np.arange(rows * dims, dtype=np.float32).reshape(rows, dims) / 10
+    embeddings = pd.DataFrame(matrix, columns=[f'F{i}' for i in range(dims)])
+    return pd.concat([metadata, embeddings], axis=1)
+
+
+class TestWireFormat:
+
+    def test_buffer_round_trip_shares_memory(self):
+        df = _index()
+        data = wire_format.dumps(df)
+        header = wire_format.read_header(data)
+        assert (header['rows'], header['dims'], header['dtype']) == (4, 3, '<f4')
+        assert header['matrix_offset'] % wire_format.ALIGNMENT == 0
+        loaded = wire_format.loads(data)
+        pd.testing.assert_frame_equal(loaded, df)
+        matrix = np.frombuffer(data, dtype='<f4', count=12, offset=header['matrix_offset'])
+        assert np.shares_memory(loaded[['F0', 'F1', 'F2']].to_numpy(), matrix)
+
+    def test_file_round_trip(self, tmp_path):
+        path = str(tmp_path / 'embeddings.pkl')
+        df = _index()
+        with open(path, 'wb') as f:
+            wire_format.write(df, f)
+        assert wire_format.sniff(path)
+        pd.testing.assert_frame_equal(wire_format.load(path), df)
+
+    def test_pickle_is_not_wire_format(self, tmp_path):
+        path = str(tmp_path / 'embeddings.pkl')
+        _index().to_pickle(path)
+        assert not wire_format.sniff(path)
+
+    def test_empty_index(self, tmp_path):
+        path = str(tmp_path / 'embeddings.pkl')
+        with open(path, 'wb') as f:
+            wire_format.write(_index(rows=0), f)
+        assert len(wire_format.load(path)) == 0
+
+    def test_corrupt_matrix_is_detected(self):
+        data = bytearray(wire_format.dumps(_index()))
+        data[wire_format.read_header(data)['matrix_offset']] ^= 0xFF
+        with pytest.raises(ValueError, match='checksum'):
+            wire_format.loads(data)
+        assert len(wire_format.loads(data, verify=False)) == 4
+
+    def test_unknown_codec_fails_clearly(self):
+        data = wire_format.dumps(_index()).replace(b'"codec": "raw"', b'"codec": "lz9"', 1)
+        with pytest.raises(ValueError, match="codec 'lz9'"):
+            wire_format.loads(data)
+
+    def test_newer_version_fails_clearly(self):
+        data = wire_format.dumps(_index()).replace(b'"version": 1', b'"version": 9', 1)
+        with pytest.raises(ValueError, match='version 9'):
+            wire_format.loads(data)
+
+
+@pytest.mark.skipif(wire_format.zstd is None, reason='needs compression.zstd')
+class TestZstdCodec:
+
+    def test_chunks_round_trip_as_float16(self, tmp_path):
+        path = str(tmp_path / 'embeddings.pkl')
+        df = _index()
+        with open(path, 'wb') as f:
+            wire_format.write(df, f, 'zstd', chunk_rows=3)
+        with open(path, 'rb') as f:
+            header = wire_format.read_header(f.read())
+        assert header['codec'] == 'zstd'
+        assert header['dtype'] == '<f2'
+        assert len(header['chunk_lengths']) == 2
+        loaded = wire_format.load(path)
+        assert loaded['F0'].dtype == np.float16
+        np.testing.assert_allclose(loaded[['F0', 'F1', 'F2']].to_numpy(dtype=np.float32),
+                                   df[['F0', 'F1', 'F2']].to_numpy(), rtol=1e-3)
+        pd.testing.assert_frame_equal(wire_format.loads(wire_format.dumps(df, 'zstd')), loaded)
+
+    def test_missing_chunk_is_detected(self):
+        data = wire_format.dumps(_index(), 'zstd')
+        header = wire_format.read_header(data)
+        lengths = b'"chunk_lengths": [%d]' % header['chunk_lengths'][0]
+        stripped = data.replace(lengths, b'"chunk_lengths": []'.ljust(len(lengths)), 1)
+        with pytest.raises(ValueError, match='0 of 4 rows'):
+            wire_format.loads(stripped)
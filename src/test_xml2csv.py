@@ -0,0 +1,87 @@
+"""Tests for the streaming grants.gov XML conversion."""
+
+import io
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+from .xml2csv import GRANTS_COLUMNS, iter_opportunities, main, write_splits
+
+EXTRACT = b'''<?xml version="1.0" encoding="UTF-8"?>
+<Grants xmlns="http://apply.grants.gov/system/OpportunityDetail-V1.0">
+  <OpportunitySynopsisDetail_1_0>
+    <OpportunityID>1</OpportunityID>
+    <Description>Mycorrhizal networks</Description>
+    <CloseDate>01152031</CloseDate>
+  </OpportunitySynopsisDetail_1_0>
+  <OpportunitySynopsisDetail_1_0>
+    <OpportunityID>2</OpportunityID>
+    <Description>Expired</Description>
+    <CloseDate>12312020</CloseDate>
+  </OpportunitySynopsisDetail_1_0>
+  <OpportunitySynopsisDetail_1_0>
+    <OpportunityID>3</OpportunityID>
+    <Description>Rolling</Description>
+  </OpportunitySynopsisDetail_1_0>
+  <OpportunityForecastDetail_1_0>
+    <OpportunityID>4</OpportunityID>
+    <Description>Lichen surveys</Description>
+    <CloseDate>06302031</CloseDate>
+    <AwardCeiling>50000</AwardCeiling>
+  </OpportunityForecastDetail_1_0>
+</Grants>
+'''
+NOW = datetime(2026, 1, 1)
+
+
+class TestIterOpportunities:
+
+    def test_expired_opportunities_are_dropped(self):
+        rows = list(iter_opportunities(io.BytesIO(EXTRACT), NOW))
+        assert [row['OpportunityID'] for row in rows] == ['1', '3', '4']
+
+    def test_fields_lose_their_namespace_and_dates_are_iso(self):
+        first = next(iter_opportunities(io.BytesIO(EXTRACT), NOW))
+        assert first == {'OpportunityID': '1', 'Description': 'Mycorrhizal networks',
+                         'CloseDate': '2031-01-15'}
+
+
+class TestWriteSplits:
+
+    def test_splits_of_maxlines_rows(self, tmp_path):
+        prefix = str(tmp_path / 'GRANTS')
+        rows = iter_opportunities(io.BytesIO(EXTRACT), NOW)
+        splits = write_splits(rows, prefix, maxlines=2)
+        assert splits == [f'{prefix}_S000', f'{prefix}_S001']
+        first, second = (pd.read_csv(path) for path in splits)
+        assert first.OpportunityID.tolist() == [1, 3]
+        assert second.AwardCeiling.tolist() == [50000]
+
+    def test_every_split_has_every_column(self, tmp_path):
+        prefix = str(tmp_path / 'GRANTS')
+        rows = [{'OpportunityID': 1, 'Description': 'Mycorrhizal networks'},
+                {'OpportunityID': 2, 'AwardCeiling': 50000, 'LastUpdatedDate': '01022026'}]
+        first, second = (pd.read_csv(path) for path in write_splits(rows, prefix, maxlines=1))
+        assert first.columns.tolist() == second.columns.tolist() == GRANTS_COLUMNS
+        assert first.AwardCeiling.isna().all()
+        assert second.Description.isna().all()
+
+    def test_stale_splits_are_removed(self, tmp_path):
+        prefix = str(tmp_path / 'GRANTS')
+        write_splits(({'OpportunityID': i} for i in range(5)), prefix, maxlines=1)
+        assert len(write_splits([{'OpportunityID': 0}], prefix, maxlines=1)) == 1
+        assert sorted(p.name for p in tmp_path.iterdir()) == ['GRANTS_S000']
+
+    def test_maxlines_must_be_positive(self, tmp_path):
+        with pytest.raises(ValueError):
+            write_splits([], str(tmp_path / 'GRANTS'), maxlines=0)
+
+
+class TestMain:
+
+    def test_prefix_defaults_to_the_xml_file(self, tmp_path):
+        xml = tmp_path / 'GRANTS.xml'
+        xml.write_bytes(EXTRACT)
+        assert main([str(xml), '10']) == 0
+        assert (tmp_path / 'GRANTS_S000').exists()
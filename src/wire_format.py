@@ -0,0 +1,286 @@
+"""
+Binary wire format of an embeddings index.
+
+A pickled DataFrame stores every embedding dimension as its own column, so
+reading one back means unpickling hundreds of float columns and copying
+them into a fresh block.  The binary format instead keeps the embeddings
+as one raw, C-ordered matrix that readers wrap with ``np.frombuffer`` (a
+Redis value) or ``np.memmap`` (a file) without copying.  The metadata
+columns travel as a separate payload after the matrix.
+
+Layout::
+
+    MAGIC | header length (uint32, little endian) | JSON header | padding
+    | matrix (rows x dims, header['dtype']) | metadata payload
+
+The matrix starts on an ``ALIGNMENT`` byte boundary.  The header records
+the version, codec, dtype, shape, the offsets and lengths of both
+payloads, and the CRC-32 of the matrix bytes.  Readers tell the format
+from a pickle by its first bytes, so both can sit under the same file
+name or Redis key.
+
+With the 'zstd' codec the matrix is stored as float16 in independently
+compressed chunks of ``chunk_rows`` rows, whose compressed lengths the
+header lists.  Readers decompress one chunk at a time into the float16
+search matrix; scoring upcasts it block by block.  Readers refuse an
+index whose codec they do not know with a clear error.  zstd comes from
+the standard library's ``compression.zstd``.
+"""
+import io
+import json
+import pickle
+import struct
+import zlib
+from typing import BinaryIO, Iterable, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+try:
+    from compression import zstd
+except ImportError:
+    # Python built without the zstd library
+    zstd = None
+
+MAGIC = b'DREMBED\x00'
+VERSION = 1
+ALIGNMENT = 64
+# Codec of each storage format other than pickle
+CODECS = {'binary': 'raw', 'compressed': 'zstd'}
+FORMATS = ('pickle',) + tuple(CODECS)
+CHUNK_ROWS = 4096
+ZSTD_LEVEL = 3
+_LENGTH = struct.Struct('<I')
+_PREFIX = len(MAGIC) + _LENGTH.size
+
+
+def embedding_columns(df: pd.DataFrame) -> List[str]:
+    """The embedding columns F0 ... Fn of an index, in order."""
+    return [col for col in df.columns if isinstance(col, str) and col.startswith('F')]
+
+
+def is_wire_format(prefix: bytes) -> bool:
+    """Whether a buffer (or its first bytes) holds the binary wire format."""
+    return bytes(prefix[:len(MAGIC)]) == MAGIC
+
+
+def sniff(path: str) -> bool:
+    """Whether a file holds the binary wire format rather than a pickle."""
+    with open(path, 'rb') as f:
+        return is_wire_format(f.read(len(MAGIC)))
+
+
+def _raw(matrix: np.ndarray) -> np.ndarray:
+    """The bytes of a C-ordered matrix, without copying."""
+    return matrix.reshape(-1).view(np.uint8)
+
+
+def _require_zstd():
+    if zstd is None:
+        raise ValueError("The 'zstd' codec needs a Python built with compression.zstd")
+
+
+def _layout(matrix: np.ndarray, stored: int, metadata: bytes,
+            codec_fields: dict) -> Tuple[bytes, int]:
+    """The encoded header, padded so the matrix that follows is aligned.
+
+    Args:
+        matrix (np.ndarray): The matrix before compression
+        stored (int): Bytes the stored matrix takes
+        metadata (bytes): The metadata payload
+        codec_fields (dict): 'codec' and the fields that codec needs
+    """
+    header = {'version': VERSION, 'codec': 'raw', 'dtype': matrix.dtype.str,
+              'rows': matrix.shape[0], 'dims': matrix.shape[1],
+              'checksum': zlib.crc32(_raw(matrix)),
+              'metadata_format': 'pickle', **codec_fields}
+    # The offsets are part of the header, so its length is fixed first with
+    # placeholders as wide as any real offset.
+    header.update(matrix_offset=2 ** 62, matrix_length=stored,
+                  metadata_offset=2 ** 62, metadata_length=len(metadata))
+    size = _PREFIX + len(json.dumps(header))
+    matrix_offset = -(-size // ALIGNMENT) * ALIGNMENT
+    header.update(matrix_offset=matrix_offset,
+                  metadata_offset=matrix_offset + stored)
+    encoded = json.dumps(header).encode()
+    encoded += b' ' * (matrix_offset - _PREFIX - len(encoded))
+    return MAGIC + _LENGTH.pack(len(encoded)) + encoded, matrix_offset
+
+
+def write(df: pd.DataFrame, f: BinaryIO, codec: str = 'raw',
+          chunk_rows: int = CHUNK_ROWS) -> int:
+    """Write an embeddings index in the binary wire format.
+
+    Args:
+        df (pd.DataFrame): Metadata columns followed by F0 ... Fn
+        f (BinaryIO): File opened for binary writing
+        codec (str): 'raw' keeps the embeddings' dtype; 'zstd' stores them
+            as float16 in compressed chunks
+        chunk_rows (int): Rows per compressed chunk
+
+    Returns:
+        int: Bytes written
+    """
+    columns = embedding_columns(df)
+    metadata = pickle.dumps(df.drop(columns=columns), protocol=pickle.HIGHEST_PROTOCOL)
+    if codec == 'raw':
+        matrix = np.ascontiguousarray(df[columns].to_numpy())
+        chunks = [_raw(matrix)]
+        codec_fields = {}
+    elif codec == 'zstd':
+        _require_zstd()
+        matrix = np.ascontiguousarray(df[columns].to_numpy(dtype=np.float16))
+        chunks = [zstd.compress(_raw(matrix[start:start + chunk_rows]), level=ZSTD_LEVEL)
+                  for start in range(0, len(matrix), chunk_rows)]
+        codec_fields = {'codec': codec, 'chunk_rows': chunk_rows,
+                        'chunk_lengths': [len(chunk) for chunk in chunks]}
+    else:
+        raise ValueError(f"Unknown codec '{codec}'")
+    stored = sum(len(chunk) for chunk in chunks)
+    header, matrix_offset = _layout(matrix, stored, metadata, codec_fields)
+    f.write(header)
+    for chunk in chunks:
+        f.write(chunk)
+    f.write(metadata)
+    return matrix_offset + stored + len(metadata)
+
+
+def dumps(df: pd.DataFrame, codec: str = 'raw') -> bytes:
+    """An embeddings index in the binary wire format, e.g. for a Redis value."""
+    buffer = io.BytesIO()
+    write(df, buffer, codec)
+    return buffer.getvalue()
+
+
+def read_header(buffer) -> dict:
+    """Parse and check the header at the start of a wire format buffer.
+
+    Raises:
+        ValueError: If the buffer is not in the wire format, or was written
+            by a newer version or with a codec this reader cannot decode
+    """
+    buffer = memoryview(buffer)
+    if not is_wire_format(buffer):
+        raise ValueError("Not a binary embeddings index (bad magic bytes)")
+    (length,) = _LENGTH.unpack(buffer[len(MAGIC):_PREFIX])
+    header = json.loads(bytes(buffer[_PREFIX:_PREFIX + length]))
+    if header['version'] > VERSION:
+        raise ValueError(f"Embeddings index has wire format version {header['version']}; "
+                         f"this reader supports up to {VERSION}")
+    if header['codec'] not in CODECS.values():
+        raise ValueError(f"Embeddings index uses codec '{header['codec']}', "
+                         f"which this reader does not support")
+    if header['codec'] == 'zstd':
+        _require_zstd()
+    return header
+
+
+def _check(header: dict, matrix: np.ndarray):
+    if zlib.crc32(_raw(matrix)) != header['checksum']:
+        raise ValueError("Embeddings index is corrupt: matrix checksum mismatch")
+
+
+def _chunk_spans(header: dict) -> Iterable[Tuple[int, int]]:
+    """Offset and length of each compressed chunk."""
+    start = header['matrix_offset']
+    for length in header['chunk_lengths']:
+        yield start, length
+        start += length
+
+
+def _decompress(header: dict, chunks: Iterable) -> np.ndarray:
+    """Decompress 'zstd' chunks, one at a time, into the float16 matrix.
+
+    Args:
+        header (dict): The index header
+        chunks (Iterable[bytes-like]): The compressed chunks, in order
+    """
+    matrix = np.empty((header['rows'], header['dims']), dtype=np.dtype(header['dtype']))
+    start = 0
+    for chunk in chunks:
+        block = np.frombuffer(zstd.decompress(chunk), dtype=matrix.dtype)
+        block = block.reshape(-1, header['dims'])
+        matrix[start:start + len(block)] = block
+        start += len(block)
+    if start != header['rows']:
+        raise ValueError(f"Embeddings index is corrupt: its chunks hold {start} "
+                         f"of {header['rows']} rows")
+    return matrix
+
+
+def to_frame(matrix: np.ndarray, metadata: pd.DataFrame) -> pd.DataFrame:
+    """Join the metadata and the matrix into the index DataFrame.
+
+    The embedding columns stay a view of ``matrix``.
+    """
+    columns = [f'F{i}' for i in range(matrix.shape[1])]
+    frame = pd.DataFrame(matrix, index=metadata.index, columns=columns, copy=False)
+    for position, column in enumerate(metadata.columns):
+        frame.insert(position, column, metadata[column].array)
+    return frame
+
+
+def loads(buffer, verify: bool = True) -> pd.DataFrame:
+    """Read an embeddings index from a wire format buffer.
+
+    A raw matrix is not copied.
+
+    Args:
+        buffer (bytes-like): e.g. a Redis value
+        verify (bool): Check the matrix checksum (default: True)
+
+    Returns:
+        pd.DataFrame: The index; with the 'raw' codec its embedding columns
+            are backed by ``buffer``
+    """
+    buffer = memoryview(buffer)
+    header = read_header(buffer)
+    if header['codec'] == 'zstd':
+        matrix = _decompress(header, (buffer[start:start + length]
+                                      for start, length in _chunk_spans(header)))
+    else:
+        matrix = np.frombuffer(buffer, dtype=np.dtype(header['dtype']),
+                               count=header['rows'] * header['dims'],
+                               offset=header['matrix_offset'])
+        matrix = matrix.reshape(header['rows'], header['dims'])
+    if verify:
+        _check(header, matrix)
+    start = header['metadata_offset']
+    metadata = pickle.loads(buffer[start:start + header['metadata_length']])
+    return to_frame(matrix, metadata)
+
+
+def load(path: str, verify: bool = True) -> pd.DataFrame:
+    """Read an embeddings index file.
+
+    A raw matrix is memory-mapped; compressed chunks are read and
+    decompressed one at a time.
+
+    Args:
+        path (str): File written by ``write``
+        verify (bool): Check the matrix checksum (default: True)
+
+    Returns:
+        pd.DataFrame: The index; with the 'raw' codec its embedding columns
+            are backed by the mapped file
+    """
+    with open(path, 'rb') as f:
+        prefix = f.read(_PREFIX)
+        if not is_wire_format(prefix):
+            raise ValueError(f"'{path}' is not a binary embeddings index (bad magic bytes)")
+        (length,) = _LENGTH.unpack(prefix[len(MAGIC):])
+        header = read_header(prefix + f.read(length))
+        f.seek(header['metadata_offset'])
+        metadata = pickle.loads(f.read(header['metadata_length']))
+        if header['codec'] == 'zstd':
+            f.seek(header['matrix_offset'])
+            matrix = _decompress(header, (f.read(length) for _, length in _chunk_spans(header)))
+        elif header['rows'] == 0:
+            matrix = np.empty((0, header['dims']), dtype=np.dtype(header['dtype']))
+        else:
+            matrix = np.memmap(path, dtype=np.dtype(header['dtype']), mode='r',
+                               offset=header['matrix_offset'],
+                               shape=(header['rows'], header['dims']))
+    if verify:
+        _check(header, matrix)
+    return to_frame(matrix, metadata)
@@ -1,31 +1,170 @@
-from sys import argv
-from pandas import read_xml, DataFrame, to_datetime
+"""
+Convert the grants.gov XML extract into GRANTS split files.
+
+The extract is several gigabytes, so it is parsed incrementally: each
+opportunity element is turned into a row and cleared as soon as it ends,
+and opportunities whose CloseDate has passed are dropped on the way.
+Rows are written to ``<prefix>_S000``, ``<prefix>_S001``, ... of at most
+``maxlines`` rows each, so memory holds one split at a time whatever the
+size of the input.  Every split has the same columns, ``GRANTS_COLUMNS``,
+whichever fields its own opportunities happen to carry, so ``data.GRANTS``
+finds each field it reads in every split.
+
+Usage::
+
+    python xml2csv.py GRANTS.xml [MAXLINES] [PREFIX]
+
+PREFIX defaults to the XML file name without its extension.
+"""
+import os
+import re
+import sys
+from argparse import ArgumentParser
 from datetime import datetime
-from numpy import array_split
-from re import split
-
-args = argv[1:]
-df = read_xml(args[0],encoding='utf-8')
-df.CloseDate = to_datetime(df.CloseDate.astype(str),errors='coerce',format='%m%d%Y.0')
-df=df.drop(df[(df['CloseDate']<datetime.now())].index)
-
-
-#print('GRANT',df)
-df.to_csv(f'{args[0][:-4]}.csv',index=False)
-
-#cdf=DataFrame(columns=df.columns)
-#for idx in df.index:# <- increases hits with GFORWARD which i am testing downweighting
-    #print(idx,len(cdf))
-    #description=df.loc[idx].Description
-    #if isinstance(description,float):
-        #continue
-    #for c in split(r'(.*)',description):
-        #if c.strip():
-            #row=DataFrame(df.loc[idx])
-            #row['Description']=c
-            #cdf.loc[len(cdf)]=row.iloc[0]
-#print(cdf)
-#[print('\n',_,'\n') for _ in df.iloc[:100].Description]
-#for idx, chunk in enumerate(array_split(df,10*len(df)/int(args[1]))):
-    #i=str(idx).zfill(3)
-    #chunk.to_csv(f'{args[0][:-4]}_S{i}',index=False)
+from glob import escape as glob_escape, glob
+from typing import IO, Iterable, Iterator, List, Optional, Sequence, Union
+from xml.etree.ElementTree import iterparse
+
+import pandas as pd
+
+MAXLINES = 10000
+CLOSE_DATE = 'CloseDate'
+CLOSE_DATE_FORMAT = '%m%d%Y'
+SPLIT = re.compile(r'_S\d{3,}$')
+# Fields of an opportunity in the grants.gov XML extract, in extract order
+GRANTS_COLUMNS = [
+    'OpportunityID', 'OpportunityTitle', 'OpportunityNumber', 'OpportunityCategory',
+    'OpportunityCategoryExplanation', 'FundingInstrumentType', 'CategoryOfFundingActivity',
+    'CategoryExplanation', 'CFDANumbers', 'EligibleApplicants',
+    'AdditionalInformationOnEligibility', 'AgencyCode', 'AgencyName', 'PostDate',
+    'CloseDate', 'CloseDateExplanation', 'LastUpdatedDate', 'AwardCeiling', 'AwardFloor',
+    'EstimatedTotalProgramFunding', 'ExpectedNumberOfAwards', 'Description', 'Version',
+    'CostSharingOrMatchingRequirement', 'ArchiveDate', 'GrantorContactEmail',
+    'GrantorContactEmailDescription', 'GrantorContactText', 'GrantorContactName',
+    'GrantorContactPhoneNumber', 'AdditionalInformationURL', 'AdditionalInformationText',
+    'EstimatedSynopsisPostDate', 'FiscalYear', 'EstimatedSynopsisCloseDate',
+    'EstimatedSynopsisCloseDateExplanation', 'EstimatedAwardDate',
+    'EstimatedProjectStartDate',
+]
+
+
+def local_name(tag: str) -> str:
+    """An element tag without its namespace."""
+    return tag.rsplit('}', 1)[-1]
+
+
+def close_date(text: Optional[str]) -> Optional[datetime]:
+    """An opportunity's MMDDYYYY CloseDate, or None if missing or malformed."""
+    if not text:
+        return None
+    try:
+        return datetime.strptime(text.strip(), CLOSE_DATE_FORMAT)
+    except ValueError:
+        return None
+
+
+def iter_opportunities(source: Union[str, IO[bytes]],
+                       now: Optional[datetime] = None) -> Iterator[dict]:
+    """The open opportunities of a grants.gov extract, one row at a time.
+
+    Every child of the root element is an opportunity; its child elements
+    are the fields.  Opportunities without a valid CloseDate are kept, as
+    they were when the extract was read whole.
+
+    Args:
+        source (str or binary file): The XML extract
+        now (datetime, optional): Opportunities closing before this are
+            dropped (default: the current time)
+
+    Yields:
+        dict: Field name to text; CloseDate as YYYY-MM-DD when valid
+    """
+    now = now or datetime.now()
+    depth = 0
+    root = None
+    for event, elem in iterparse(source, events=('start', 'end')):
+        if event == 'start':
+            if root is None:
+                root = elem
+            depth += 1
+            continue
+        depth -= 1
+        if depth != 1:
+            continue
+        row = {local_name(child.tag): child.text for child in elem}
+        # Drop the parsed opportunity, and the root's reference to it
+        elem.clear()
+        root.clear()
+        closes = close_date(row.get(CLOSE_DATE))
+        if closes is not None:
+            if closes < now:
+                continue
+            row[CLOSE_DATE] = closes.strftime('%Y-%m-%d')
+        yield row
+
+
+def split_path(prefix: str, index: int) -> str:
+    """The path of a split file."""
+    return f'{prefix}_S{str(index).zfill(3)}'
+
+
+def write_splits(rows: Iterable[dict], prefix: str, maxlines: int = MAXLINES,
+                 columns: Sequence[str] = GRANTS_COLUMNS) -> List[str]:
+    """Write rows to split CSV files of at most ``maxlines`` rows.
+
+    Only one split's rows are held at a time.  Splits of an earlier run
+    beyond the last one written are removed.
+
+    Args:
+        rows (Iterable[dict]): The rows
+        prefix (str): Split files are named ``<prefix>_S000`` etc.
+        maxlines (int): Rows per split
+        columns (Sequence[str]): Columns of every split, in order; fields
+            missing from a row are empty and other fields are dropped
+
+    Returns:
+        List[str]: The split files written
+    """
+    if maxlines < 1:
+        raise ValueError(f'maxlines must be positive, not {maxlines}')
+    written = []
+    chunk = []
+
+    def flush():
+        path = split_path(prefix, len(written))
+        pd.DataFrame(chunk).reindex(columns=list(columns)).to_csv(path, index=False)
+        written.append(path)
+        chunk.clear()
+
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == maxlines:
+            flush()
+    if chunk:
+        flush()
+    for stale in glob(f'{glob_escape(prefix)}_S*'):
+        if SPLIT.search(stale) and stale not in written:
+            os.remove(stale)
+    return written
+
+
+def main(argv: Optional[List[str]] = None):
+    """Convert a grants.gov XML extract into split CSV files."""
+    parser = ArgumentParser(description='Convert the grants.gov XML extract into '
+                                        'split CSV files of open opportunities')
+    parser.add_argument('xml_file', help='The grants.gov XML extract')
+    parser.add_argument('maxlines', type=int, nargs='?', default=MAXLINES,
+                        help=f'Rows per split file (default: {MAXLINES})')
+    parser.add_argument('prefix', nargs='?', default=None,
+                        help='Split files are PREFIX_S000 etc. '
+                             '(default: the XML file without its extension)')
+    args = parser.parse_args(argv)
+
+    prefix = args.prefix or os.path.splitext(args.xml_file)[0]
+    splits = write_splits(iter_opportunities(args.xml_file), prefix, args.maxlines)
+    print(f'{len(splits)} split files written: {prefix}_S*')
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())